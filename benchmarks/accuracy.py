@@ -0,0 +1,288 @@
+"""
+Accuracy-versus-time benchmark.
+
+Generates small random instances, computes their exact WMI (utils.exact_wmi)
+and runs the solver on them in every sampling mode at several epsilons,
+reading the anytime estimate after a fraction ("budget") of the required
+trials as well as at the end. Every configuration gets its runtime and
+relative error over all instances and repeats, and the table marks the
+Pareto-optimal ones (no other configuration is both faster and more
+accurate) and picks the fastest one that meets a target epsilon in
+practice:
+
+    python -m benchmarks.accuracy results.json [--quick] [--target-eps 0.2]
+
+Clause weights come from the exact integration too, so the runs measure
+the sampling error alone and need no LattE.
+"""
+
+import argparse
+import time
+import numpy as np
+from benchmarks.common import write_results
+from benchmarks.scaling import BASE_CASE, build_case, case_seed
+
+# Small enough for exact inclusion-exclusion
+INSTANCE = dict(BASE_CASE, nbClauses=4, nbBools=4, nbReals=2)
+
+GRID = {
+    "instances": [
+        dict(INSTANCE, nbReals=1),
+        dict(INSTANCE, nbReals=2),
+        dict(INSTANCE, nbReals=3),
+        dict(INSTANCE, nbClauses=8, nbReals=2),
+    ],
+    "modes": ["random", "stratified", "sobol", "halton"],
+    "epsilons": [0.8, 0.5, 0.3],
+    "budgets": [0.25, 0.5, 1.0],
+    "repeats": 3,
+}
+
+QUICK_GRID = {
+    "instances": [
+        dict(INSTANCE, nbReals=1),
+        dict(INSTANCE, nbReals=2),
+    ],
+    "modes": ["random", "stratified", "sobol", "halton"],
+    "epsilons": [0.8, 0.5],
+    "budgets": [0.5, 1.0],
+    "repeats": 2,
+}
+
+
+def config_name(mode, epsilon, budget):
+    return "mode={},eps={},budget={}".format(mode, epsilon, budget)
+
+
+def make_instance(params, seed):
+    """
+    Generate an instance with a non-zero exact WMI (later seeds are tried
+    if the first one has none).
+
+    Returns:
+        (clauseList, nbBools, universeReals, weightFunction, exact WMI,
+        exact clause weights)
+    """
+    from utils.exact_wmi import exact_clause_weights, exact_wmi
+
+    for attempt in range(10):
+        clauseList, nbBools, universe, wf = build_case(params, seed + attempt)
+        exact = exact_wmi(clauseList, nbBools, universe, wf)
+        if exact > 0:
+            weights = exact_clause_weights(clauseList, nbBools, universe, wf)
+            return clauseList, nbBools, universe, wf, exact, weights
+    raise RuntimeError("No instance with a non-zero WMI")
+
+
+def run_config(instance, mode, epsilon, delta, budgets, seed):
+    """
+    One solver run, read after every budget fraction of its trials.
+
+    Returns:
+        A dict budget -> (seconds, relative error).
+    """
+    from simple_wmi_solver import SimpleWMISolver
+
+    clauseList, nbBools, universe, wf, exact, weights = instance
+    start = time.perf_counter()
+    solver = SimpleWMISolver(
+        clauseList, nbBools, universe, wf, clauseWeights=weights, seed=seed
+    )
+    setup = time.perf_counter() - start
+
+    _, _, T = solver.coverageParameters(epsilon, delta)
+    stops = {max(1, int(np.ceil(budget * T))): budget for budget in budgets}
+    # Updates come every `interval` trials, so every stop gets one
+    interval = int(np.gcd.reduce(list(stops)))
+    readings = {}
+    for update in solver.coverageStream(
+        epsilon, delta, interval=interval, mode=mode
+    ):
+        if update["trials"] in stops:
+            estimate = update["estimate"] or 0.0
+            readings[stops[update["trials"]]] = (
+                setup + update["elapsed"],
+                abs(estimate - exact) / exact,
+            )
+        if update["trials"] >= max(stops):
+            break
+    return readings
+
+
+def summarize(runs, epsilon, targetEps):
+    """Flat metrics of the runs of one configuration."""
+    seconds = np.array([run["seconds"] for run in runs])
+    errors = np.array([run["rel_error"] for run in runs])
+    return {
+        "runs": len(runs),
+        "mean_seconds": float(seconds.mean()),
+        "max_seconds": float(seconds.max()),
+        "mean_rel_error": float(errors.mean()),
+        "p90_rel_error": float(np.percentile(errors, 90)),
+        "max_rel_error": float(errors.max()),
+        # Share of runs within the configuration's own epsilon, and within
+        # the target epsilon
+        "within_eps": float((errors <= epsilon).mean()),
+        "within_target": float((errors <= targetEps).mean()),
+    }
+
+
+def pareto_front(cases):
+    """
+    Configurations that no other configuration beats on both mean time
+    and 90th percentile error.
+
+    Args:
+        cases: dict configuration -> {"metrics": ...}
+
+    Returns:
+        The set of Pareto-optimal configuration names.
+    """
+    points = {
+        name: (
+            case["metrics"]["mean_seconds"],
+            case["metrics"]["p90_rel_error"],
+        )
+        for name, case in cases.items()
+    }
+    front = set()
+    for name, (t, e) in points.items():
+        dominated = any(
+            t2 <= t and e2 <= e and (t2, e2) != (t, e)
+            for other, (t2, e2) in points.items()
+            if other != name
+        )
+        if not dominated:
+            front.add(name)
+    return front
+
+
+def fastest_meeting(cases, delta):
+    """
+    The fastest configuration whose error was within the target epsilon in
+    at least a 1 - delta share of its runs, or None.
+    """
+    meeting = [
+        name
+        for name, case in cases.items()
+        if case["metrics"]["within_target"] >= 1 - delta
+    ]
+    if not meeting:
+        return None
+    return min(
+        meeting, key=lambda name: cases[name]["metrics"]["mean_seconds"]
+    )
+
+
+def run_suite(grid, delta, targetEps, seed=0):
+    """
+    Run every configuration of the grid on every instance, grid["repeats"]
+    times with different seeds.
+
+    Returns:
+        A dict configuration -> {"params", "metrics", "runs"}, with
+        metrics["pareto"] set on the Pareto-optimal configurations.
+    """
+    runs = {}
+    for i, params in enumerate(grid["instances"]):
+        instance = make_instance(params, case_seed("instance" + str(i), seed))
+        for mode in grid["modes"]:
+            for epsilon in grid["epsilons"]:
+                for repeat in range(grid["repeats"]):
+                    readings = run_config(
+                        instance,
+                        mode,
+                        epsilon,
+                        delta,
+                        grid["budgets"],
+                        seed + repeat,
+                    )
+                    for budget, (seconds, error) in readings.items():
+                        runs.setdefault((mode, epsilon, budget), []).append(
+                            {
+                                "instance": i,
+                                "repeat": repeat,
+                                "seconds": seconds,
+                                "rel_error": error,
+                            }
+                        )
+
+    cases = {}
+    for (mode, epsilon, budget), configRuns in sorted(runs.items()):
+        cases[config_name(mode, epsilon, budget)] = {
+            "params": {"mode": mode, "epsilon": epsilon, "budget": budget},
+            "metrics": summarize(configRuns, epsilon, targetEps),
+            "runs": configRuns,
+        }
+    front = pareto_front(cases)
+    for name, case in cases.items():
+        case["metrics"]["pareto"] = name in front
+    return cases
+
+
+def format_pareto_table(cases, best=None):
+    """Text table of the configurations by mean time, Pareto ones starred."""
+    lines = [
+        "{:<2} {:<40} {:>10} {:>10} {:>10} {:>8} {:>8}".format(
+            "",
+            "configuration",
+            "mean s",
+            "mean err",
+            "p90 err",
+            "in eps",
+            "target",
+        )
+    ]
+    row = "{:<2} {:<40} {:>10.3f} {:>10.4f} {:>10.4f} {:>8.2f} {:>8.2f}"
+    for name in sorted(
+        cases, key=lambda name: cases[name]["metrics"]["mean_seconds"]
+    ):
+        metrics = cases[name]["metrics"]
+        lines.append(
+            row.format(
+                "*" if metrics["pareto"] else "",
+                name,
+                metrics["mean_seconds"],
+                metrics["mean_rel_error"],
+                metrics["p90_rel_error"],
+                metrics["within_eps"],
+                metrics["within_target"],
+            )
+        )
+    if best is not None:
+        lines.append("Fastest configuration meeting the target: " + best)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy vs time benchmark")
+    parser.add_argument("output", help="JSON result file")
+    parser.add_argument(
+        "--quick", action="store_true", help="fewer instances and settings"
+    )
+    parser.add_argument("--delta", type=float, default=0.2)
+    parser.add_argument(
+        "--target-eps",
+        type=float,
+        default=0.2,
+        help="relative error the chosen configuration must meet",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    grid = QUICK_GRID if args.quick else GRID
+    cases = run_suite(grid, args.delta, args.target_eps, args.seed)
+    best = fastest_meeting(cases, args.delta)
+    print(format_pareto_table(cases, best))
+    write_results(
+        args.output,
+        "accuracy",
+        {
+            "delta": args.delta,
+            "targetEps": args.target_eps,
+            "seed": args.seed,
+            "instances": grid["instances"],
+            "repeats": grid["repeats"],
+        },
+        cases,
+    )
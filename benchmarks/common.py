@@ -0,0 +1,130 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import numpy as np
+import scipy
+from utils.run_latte import latte_binary
+
+# Version of the result files written by write_results
+RESULTS_VERSION = 1
+
+
+def environment():
+    """
+    Where the results come from, recorded with every result file. Runs
+    without LattE time only its failures, and parallel runs depend on the
+    CPU count, so both are recorded (see benchmarks.compare).
+    """
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "latte": os.access(latte_binary(), os.X_OK),
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size reported by phase_peak_rss_bytes, so
+    that it covers what runs next. Linux only (through clear_refs);
+    returns False where the peak cannot be reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def phase_peak_rss_bytes():
+    """
+    Peak resident set size since the last reset_peak_rss (since the start
+    of the process where it cannot be reset).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_rss_bytes()
+
+
+def _call(conn, func, args):
+    with open(os.devnull, "w") as devnull:
+        # Solver progress bars and LattE messages go nowhere
+        sys.stdout = sys.stderr = devnull
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, repr(e)))
+    conn.close()
+
+
+def run_isolated(func, *args):
+    """
+    Run func(*args) in a fresh interpreter and return its result, so that
+    every benchmark case starts from the same state and its peak RSS is
+    its own. func must be importable (a module-level function).
+    """
+    context = multiprocessing.get_context("spawn")
+    recvConn, sendConn = context.Pipe(duplex=False)
+    process = context.Process(target=_call, args=(sendConn, func, args))
+    process.start()
+    sendConn.close()
+    try:
+        ok, result = recvConn.recv()
+    except EOFError:
+        ok, result = False, "the benchmark process died"
+    process.join()
+    if not ok:
+        raise RuntimeError(func.__name__ + " failed: " + result)
+    return result
+
+
+def write_results(path, suite, config, cases):
+    """
+    Write a result file: the suite name, the environment, the run
+    configuration and, per case, its parameters and flat metrics.
+
+    Args:
+        path: JSON file to write.
+        suite: name of the benchmark suite.
+        config: dict of the settings shared by all cases.
+        cases: dict case name -> {"params": ..., "metrics": ...}.
+    """
+    results = {
+        "version": RESULTS_VERSION,
+        "suite": suite,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "config": config,
+        "cases": cases,
+    }
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def read_results(path):
+    with open(path, "r") as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError("Unsupported result file version: " + path)
+    return results
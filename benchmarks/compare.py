@@ -0,0 +1,185 @@
+"""
+Compare two benchmark result files and flag regressions:
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.2
+
+Metrics ending in "_seconds" or "_bytes" are lower-is-better, metrics
+ending in "_per_second" higher-is-better; other metrics (trial counts,
+call counts) are reported when they change but never flagged. Changes
+below an absolute floor (--min-seconds, --min-bytes) are ignored, so noise
+on tiny timings does not count as a regression. Exits with status 1 if
+any metric regressed.
+
+Results from environments with a different CPU count or with and without
+LattE are not comparable: the comparison is refused unless
+--ignore-environment is given, and then comes with a warning.
+"""
+
+import argparse
+import sys
+from benchmarks.common import read_results
+
+# Environment entries that must match for timings to be comparable
+ENVIRONMENT_KEYS = ["cpus", "latte"]
+
+
+def direction(metric):
+    """1 if lower is better, -1 if higher is better, 0 if neither."""
+    if metric.endswith("_per_second"):
+        return -1
+    if metric.endswith("_seconds") or metric.endswith("_bytes"):
+        return 1
+    return 0
+
+
+def compare_results(
+    base, new, threshold=0.2, minSeconds=0.05, minBytes=1 << 20
+):
+    """
+    Compare the metrics of the cases found in both result files.
+
+    Args:
+        base, new: result dicts (see benchmarks.common.read_results).
+        threshold: relative change that counts as a regression.
+        minSeconds: absolute change in seconds below which timings are
+            never flagged.
+        minBytes: same for byte counts.
+
+    Returns:
+        A list of rows {"case", "metric", "base", "new", "change",
+        "regression"}, one per changed metric, regressions first.
+    """
+    rows = []
+    for case in sorted(set(base["cases"]) & set(new["cases"])):
+        baseMetrics = base["cases"][case]["metrics"]
+        newMetrics = new["cases"][case]["metrics"]
+        for metric in sorted(set(baseMetrics) & set(newMetrics)):
+            old, cur = baseMetrics[metric], newMetrics[metric]
+            if not isinstance(old, (int, float)) or old == cur:
+                continue
+            change = (cur - old) / abs(old) if old else float("inf")
+            sign = direction(metric)
+            floor = 0.0
+            if metric.endswith("_bytes"):
+                floor = minBytes
+            elif sign == 1:
+                floor = minSeconds
+            regression = (
+                sign != 0
+                and sign * change > threshold
+                and abs(cur - old) >= floor
+            )
+            rows.append(
+                {
+                    "case": case,
+                    "metric": metric,
+                    "base": old,
+                    "new": cur,
+                    "change": change,
+                    "regression": regression,
+                }
+            )
+    rows.sort(key=lambda row: not row["regression"])
+    return rows
+
+
+def environment_mismatches(base, new):
+    """
+    Entries of ENVIRONMENT_KEYS that differ between two result files, as
+    (key, base value, new value). An entry missing from a file (result
+    files older than the entry) is None, so it never matches.
+    """
+    mismatches = []
+    for key in ENVIRONMENT_KEYS:
+        old = base["environment"].get(key)
+        cur = new["environment"].get(key)
+        if old is None or old != cur:
+            mismatches.append((key, old, cur))
+    return mismatches
+
+
+def missing_cases(base, new):
+    """Cases of the baseline that the new results lack."""
+    return sorted(set(base["cases"]) - set(new["cases"]))
+
+
+def format_comparison(rows, showAll=False):
+    """
+    Text table of compare_results rows.
+
+    Args:
+        rows: rows from compare_results.
+        showAll: also list changes that are not regressions.
+
+    Returns:
+        The table as a string.
+    """
+    lines = [
+        "{:<3} {:<24} {:<36} {:>14} {:>14} {:>8}".format(
+            "", "case", "metric", "base", "new", "change"
+        )
+    ]
+    for row in rows:
+        if not (showAll or row["regression"]):
+            continue
+        lines.append(
+            "{:<3} {:<24} {:<36} {:>14.6g} {:>14.6g} {:>+7.1f}%".format(
+                "!!" if row["regression"] else "",
+                row["case"],
+                row["metric"],
+                row["base"],
+                row["new"],
+                100 * row["change"],
+            )
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Flag regressions between two benchmark result files"
+    )
+    parser.add_argument("baseline", help="baseline result file")
+    parser.add_argument("results", help="new result file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative change flagged as a regression (default: 0.2)",
+    )
+    parser.add_argument("--min-seconds", type=float, default=0.05)
+    parser.add_argument("--min-bytes", type=int, default=1 << 20)
+    parser.add_argument(
+        "--all", action="store_true", help="also list improvements"
+    )
+    parser.add_argument(
+        "--ignore-environment",
+        action="store_true",
+        help="compare results from different environments (with a warning)",
+    )
+    args = parser.parse_args()
+
+    base = read_results(args.baseline)
+    new = read_results(args.results)
+    if base["suite"] != new["suite"]:
+        sys.exit("Results of different suites")
+    if base["config"] != new["config"]:
+        print("Warning: the runs used different settings")
+    mismatches = environment_mismatches(base, new)
+    if mismatches:
+        message = "the runs used different environments: " + ", ".join(
+            "{} {} vs {}".format(key, old, cur) for key, old, cur in mismatches
+        )
+        if not args.ignore_environment:
+            sys.exit("Not compared, " + message)
+        print("Warning: " + message)
+    rows = compare_results(
+        base, new, args.threshold, args.min_seconds, args.min_bytes
+    )
+    print(format_comparison(rows, args.all))
+    for case in missing_cases(base, new):
+        print("Missing case: " + case)
+
+    regressions = sum(row["regression"] for row in rows)
+    print(str(regressions) + " regressions")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,254 @@
+"""
+Load test of the WMI service (run_service.py).
+
+Sends generator-driven queries to a service over HTTP from a number of
+concurrent clients, each sending its next request as soon as it has the
+answer to the previous one, and records the client-side latency
+distribution and the throughput per concurrency level, together with the
+service's own metrics. The queries cycle over a few formulas with a new
+seed per query, so after the first query of every formula (the "cold"
+case) they hit warm solvers. Without --url a service is started in this
+process on a free local port, so the test runs fully offline:
+
+    python -m benchmarks.load_test results.json [--quick]
+    python -m benchmarks.load_test results.json --url http://127.0.0.1:8765
+    python -m benchmarks.compare baseline.json results.json
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import threading
+import time
+import urllib.request
+from benchmarks.common import write_results
+from benchmarks.scaling import BASE_CASE, build_case, case_seed
+from utils.service import WMIService, latency_summary, make_server
+
+INSTANCE = dict(BASE_CASE, nbClauses=8, nbReals=2, nbBools=4)
+
+SETTINGS = {
+    "formulas": 8,
+    "concurrency": [1, 4, 16, 64],
+    "requests": 400,
+}
+
+QUICK_SETTINGS = {
+    "formulas": 2,
+    "concurrency": [1, 8],
+    "requests": 40,
+}
+
+
+def _plain(x):
+    # numpy scalars are not JSON serializable
+    return x.item() if hasattr(x, "item") else x
+
+
+def make_request(params, seed):
+    """A service request for the generated instance of a case."""
+    clauseList, nbBools, universe, wf = build_case(params, seed)
+    request = {
+        "formula": clauseList,
+        "nbBools": nbBools,
+        "nbReals": universe.nbReals,
+        "lowerBound": universe.lowerBound,
+        "upperBound": universe.upperBound,
+        "weightFunction": {
+            "monomials": wf.f,
+            "boolWeights": list(wf.boolWeights),
+        },
+    }
+    return json.loads(json.dumps(request, default=_plain))
+
+
+def post(url, body, timeout=600):
+    request = urllib.request.Request(
+        url + "/solve",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def get(url, path, timeout=60):
+    with urllib.request.urlopen(url + path, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def run_load(url, requests, concurrency):
+    """
+    Send the requests from concurrency clients (closed loop).
+
+    Returns:
+        (the results, their client-side latencies, wall seconds)
+    """
+    nextRequest = iter(requests)
+    lock = threading.Lock()
+    results = []
+    latencies = []
+
+    def client():
+        while True:
+            with lock:
+                request = next(nextRequest, None)
+            if request is None:
+                return
+            start = time.perf_counter()
+            try:
+                result = post(url, request)
+            except OSError as e:
+                result = {"status": "error", "error": str(e)}
+            latency = time.perf_counter() - start
+            with lock:
+                results.append(result)
+                latencies.append(latency)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return results, latencies, time.perf_counter() - start
+
+
+def load_metrics(results, latencies, seconds, before, after):
+    """
+    Flat metrics of one load run: client latency distribution,
+    throughput, error count, the routes taken and the service's mean
+    batch size and solver cache counters over the run.
+    """
+    metrics = {
+        "requests": len(results),
+        "errors": sum(result.get("status") != "ok" for result in results),
+        "wall_seconds": seconds,
+        "throughput_per_second": len(results) / seconds,
+    }
+    for name, value in latency_summary(latencies).items():
+        if name != "count":
+            metrics["latency." + name] = value
+    for result in results:
+        route = "route." + str(result.get("route"))
+        metrics[route] = metrics.get(route, 0) + 1
+
+    counters = [s["metrics"]["counters"] for s in (before, after)]
+    for name in counters[1]:
+        if name.startswith("cache.") or name == "coalesced":
+            metrics["service." + name] = counters[1][name] - counters[0].get(
+                name, 0
+            )
+    batches = counters[1].get("batches", 0) - counters[0].get("batches", 0)
+    if batches:
+        metrics["service.mean_batch_size"] = (
+            counters[1]["batched_requests"]
+            - counters[0].get("batched_requests", 0)
+        ) / batches
+    return metrics
+
+
+def run_suite(url, settings, params, seed=0, exact="auto"):
+    """
+    One cold run (the first query of every formula, one at a time), then
+    one run per concurrency level over the warm formulas. exact is the
+    route choice of every query (see SimpleWMISolver.solve).
+
+    Returns:
+        A dict case name -> {"params", "metrics"}.
+    """
+    formulas = [
+        dict(
+            make_request(params, case_seed("formula" + str(i), seed)),
+            exact=exact,
+        )
+        for i in range(settings["formulas"])
+    ]
+    seeds = itertools.count(seed)
+    cases = {}
+    runs = [("cold", 1, formulas)] + [
+        (
+            "c" + str(concurrency),
+            concurrency,
+            [
+                dict(formulas[i % len(formulas)], seed=next(seeds))
+                for i in range(settings["requests"])
+            ],
+        )
+        for concurrency in settings["concurrency"]
+    ]
+    for name, concurrency, requests in runs:
+        before = get(url, "/metrics")
+        results, latencies, seconds = run_load(url, requests, concurrency)
+        after = get(url, "/metrics")
+        metrics = load_metrics(results, latencies, seconds, before, after)
+        cases[name] = {
+            "params": {"concurrency": concurrency, "instance": params},
+            "metrics": metrics,
+        }
+        print(
+            "{:<6} {:>5} requests  {:>8.1f} req/s  p50 {:>8.1f}ms"
+            "  p99 {:>8.1f}ms  errors {}".format(
+                name,
+                metrics["requests"],
+                metrics["throughput_per_second"],
+                1e3 * metrics["latency.p50_seconds"],
+                1e3 * metrics["latency.p99_seconds"],
+                metrics["errors"],
+            )
+        )
+    return cases
+
+
+@contextlib.contextmanager
+def local_service(**kwargs):
+    """A service on a free local port, for the block; yields its URL."""
+    with WMIService(**kwargs) as service:
+        server = make_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield "http://{}:{}".format(*server.server_address)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WMI service load test")
+    parser.add_argument("output", help="JSON result file")
+    parser.add_argument(
+        "--quick", action="store_true", help="fewer formulas and requests"
+    )
+    parser.add_argument(
+        "--url",
+        default=None,
+        help="service to test (default: start one in this process)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="workers of the started service (default: CPU count)",
+    )
+    parser.add_argument(
+        "--exact",
+        choices=["auto", "always", "never"],
+        default="auto",
+        help="route of the queries: exact when it is estimated to be"
+        " cheaper (auto), always or never (sampling only)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    exact = {"auto": "auto", "always": True, "never": False}[args.exact]
+
+    settings = QUICK_SETTINGS if args.quick else SETTINGS
+    config = dict(settings, seed=args.seed, url=args.url, exact=args.exact)
+    if args.url is None:
+        with local_service(nbWorkers=args.workers) as url:
+            config["workers"] = get(url, "/health")["workers"]
+            cases = run_suite(url, settings, INSTANCE, args.seed, exact)
+    else:
+        cases = run_suite(args.url, settings, INSTANCE, args.seed, exact)
+    write_results(args.output, "load_test", config, cases)
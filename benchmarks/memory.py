@@ -0,0 +1,268 @@
+"""
+Memory benchmark.
+
+Runs the solver phase by phase (generating the instance, compiling the
+formula, setting up the solver, sampling) on generator-driven cases of
+growing size and records, per phase, the Python allocations (tracemalloc)
+and the peak resident set size, then the bytes held by every solver
+attribute:
+
+    python -m benchmarks.memory results.json [--quick]
+    python -m benchmarks.compare baseline.json results.json --min-bytes 65536
+"""
+
+import argparse
+import contextlib
+import sys
+import tracemalloc
+import types
+import numpy as np
+from benchmarks.common import (
+    peak_rss_bytes,
+    phase_peak_rss_bytes,
+    read_results,
+    reset_peak_rss,
+    run_isolated,
+    write_results,
+)
+from benchmarks.scaling import build_case, case_seed, scaling_cases
+
+# Memory grows with the number of clauses and reals, so the sweeps go
+# further along these than the scaling sweeps
+SWEEPS = {
+    "nbClauses": [10, 50, 200, 800],
+    "nbReals": [2, 5, 10, 20],
+    "nbBools": [8, 32, 128],
+}
+
+QUICK_SWEEPS = {
+    "nbClauses": [50, 200],
+    "nbReals": [2, 10],
+}
+
+PHASES = ["generate", "compile", "setup", "sampling"]
+
+# Objects that are not data held by the solver
+_SKIPPED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def deep_sizeof(obj, seen):
+    """
+    Bytes of obj and everything it references (containers, attributes,
+    numpy buffers), skipping the objects whose id is in seen and adding
+    the ones counted here.
+
+    Args:
+        obj: any object.
+        seen: set of ids of the objects already counted.
+
+    Returns:
+        The size in bytes.
+    """
+    if id(obj) in seen or isinstance(obj, _SKIPPED_TYPES):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        # A view does not own its buffer: count the array it comes from
+        if obj.base is not None:
+            size += deep_sizeof(obj.base, seen)
+        if obj.dtype == object:
+            size += sum(deep_sizeof(item, seen) for item in obj.flat)
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    for name in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, name):
+            size += deep_sizeof(getattr(obj, name), seen)
+    return size
+
+
+def attribute_bytes(obj):
+    """
+    Bytes held by every attribute of obj. An object shared by several
+    attributes is counted once, for the first of them.
+
+    Returns:
+        A dict attribute name -> bytes.
+    """
+    seen = {id(obj), id(vars(obj))}
+    return {
+        name: deep_sizeof(value, seen) for name, value in vars(obj).items()
+    }
+
+
+@contextlib.contextmanager
+def measure_phase(name, result):
+    """
+    Record the memory of the code run inside the block into result, as
+    "phase.<name>.traced_peak_bytes" (peak Python allocations above those
+    at the start of the phase), "phase.<name>.traced_retained_bytes"
+    (allocations still held at its end) and "phase.<name>.rss_peak_bytes"
+    (peak resident set size during the phase, or so far where it cannot be
+    reset). tracemalloc must be tracing.
+    """
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    reset_peak_rss()
+    yield
+    current, peak = tracemalloc.get_traced_memory()
+    prefix = "phase." + name + "."
+    result[prefix + "traced_peak_bytes"] = peak - before
+    result[prefix + "traced_retained_bytes"] = current - before
+    result[prefix + "rss_peak_bytes"] = phase_peak_rss_bytes()
+
+
+def run_case(params, seed, epsilon, delta, maxTrials):
+    """
+    Build and run the solver on one case phase by phase, stopping the
+    sampling after maxTrials trials (None: the full run).
+
+    Returns:
+        The flat metrics of the case.
+    """
+    from simple_wmi_solver import SimpleWMISolver
+    from utils.compiled_formula import CompiledFormula
+
+    result = {}
+    tracemalloc.start()
+    try:
+        with measure_phase("generate", result):
+            clauseList, nbBools, universe, wf = build_case(params, seed)
+        with measure_phase("compile", result):
+            formula = CompiledFormula.fromClauseList(
+                clauseList, nbBools, universe.nbReals
+            )
+        with measure_phase("setup", result):
+            solver = SimpleWMISolver(formula, nbBools, universe, wf, seed=seed)
+        with measure_phase("sampling", result):
+            _, _, T = solver.coverageParameters(epsilon, delta)
+            interval = T if maxTrials is None else min(T, maxTrials)
+            update = None
+            for update in solver.coverageStream(
+                epsilon, delta, interval=interval
+            ):
+                break
+    finally:
+        tracemalloc.stop()
+
+    attributes = attribute_bytes(solver)
+    for name, size in attributes.items():
+        result["attr." + name + "_bytes"] = size
+    result["solver_bytes"] = sum(attributes.values())
+    result["clause_list_bytes"] = deep_sizeof(clauseList, set())
+    result["peak_rss_bytes"] = peak_rss_bytes()
+    result["trials"] = update["trials"]
+    return result
+
+
+def largest_attributes(metrics, top=5):
+    """The top attributes of a case's metrics, as (name, bytes) pairs."""
+    attributes = [
+        (name[len("attr.") : -len("_bytes")], size)
+        for name, size in metrics.items()
+        if name.startswith("attr.")
+    ]
+    attributes.sort(key=lambda item: -item[1])
+    return attributes[:top]
+
+
+def run_suite(cases, epsilon, delta, maxTrials, seed=0, isolated=True):
+    """
+    Run every case (each in a fresh process if isolated, so that its peak
+    RSS is its own).
+
+    Args:
+        cases: dict case name -> parameters (see scaling_cases).
+        epsilon, delta: solver accuracy parameters.
+        maxTrials: trial cap per case, or None.
+        seed: base seed (see case_seed).
+        isolated: run each case in a fresh interpreter.
+
+    Returns:
+        A dict case name -> {"params", "seed", "metrics"}.
+    """
+    results = {}
+    for name, params in sorted(cases.items()):
+        caseSeed = case_seed(name, seed)
+        args = (params, caseSeed, epsilon, delta, maxTrials)
+        if isolated:
+            metrics = run_isolated(run_case, *args)
+        else:
+            metrics = run_case(*args)
+        results[name] = {
+            "params": params,
+            "seed": caseSeed,
+            "metrics": metrics,
+        }
+        print(
+            "{:<16} solver {:>9.1f}KiB  peak RSS {:>7.1f}MiB  {}".format(
+                name,
+                metrics["solver_bytes"] / 1024,
+                metrics["peak_rss_bytes"] / 2**20,
+                ", ".join(
+                    "{} {:.1f}KiB".format(attr, size / 1024)
+                    for attr, size in largest_attributes(metrics, 3)
+                ),
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory benchmark")
+    parser.add_argument("output", help="JSON result file")
+    parser.add_argument(
+        "--quick", action="store_true", help="a smaller sweep (for CI)"
+    )
+    parser.add_argument(
+        "--cases", nargs="*", default=None, help="only these case names"
+    )
+    parser.add_argument("--eps", type=float, default=0.5)
+    parser.add_argument("--delta", type=float, default=0.2)
+    parser.add_argument(
+        "--trials",
+        type=int,
+        default=200,
+        help="trial cap per case (0: full runs)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--merge",
+        default=None,
+        help="start from the cases of this result file (e.g. to rerun a few)",
+    )
+    args = parser.parse_args()
+
+    cases = scaling_cases(QUICK_SWEEPS if args.quick else SWEEPS)
+    if args.cases:
+        cases = {name: cases[name] for name in args.cases}
+    maxTrials = args.trials or None
+
+    results = {}
+    if args.merge is not None:
+        results = read_results(args.merge)["cases"]
+    results.update(
+        run_suite(cases, args.eps, args.delta, maxTrials, args.seed)
+    )
+    write_results(
+        args.output,
+        "memory",
+        {
+            "epsilon": args.eps,
+            "delta": args.delta,
+            "trials": maxTrials,
+            "seed": args.seed,
+        },
+        results,
+    )
@@ -0,0 +1,298 @@
+"""
+Microbenchmarks of the sampling and checking hot paths.
+
+Every benchmark runs one function over synthetic polytopes and weight
+functions of a given size (dimension, facets, monomial count and degree)
+and times each call separately, so the results are per-call latency
+distributions:
+
+    python -m benchmarks.micro results.json [--quick] [--only hit_and_run]
+    python -m benchmarks.compare baseline.json results.json --min-seconds 0
+"""
+
+import argparse
+import itertools
+import time
+import numpy as np
+from benchmarks.common import write_results
+from simple_wmi_solver import SimpleWMISolver
+from utils.compiled_formula import FormulaBuilder
+from utils.polytope_sampling import hit_and_run, sample
+from utils.polytope_utils import find_interior_point_active_vars
+from utils.random_streams import BufferedRandom
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+
+# Parameter grids per benchmark: full and --quick
+GRIDS = {
+    "hit_and_run": {"dim": [2, 4, 8, 16], "facets": [4, 16, 64]},
+    "sample": {"dim": [2, 4, 8, 16], "facets": [4, 16, 64]},
+    "WeightFunction.eval": {
+        "dim": [2, 8, 32],
+        "monomials": [1, 4, 16],
+        "degree": [1, 3, 5],
+    },
+    "WeightFunction.filter_vars": {"dim": [2, 8, 32], "monomials": [1, 4, 16]},
+    "checkClauseSAT": {"dim": [2, 8, 16], "facets": [1, 4, 16]},
+    "generateHrep": {"dim": [2, 8, 16], "facets": [1, 4, 16]},
+    "find_interior_point_active_vars": {
+        "dim": [2, 4, 8, 16],
+        "facets": [4, 16, 64],
+    },
+}
+
+QUICK_GRIDS = {
+    "hit_and_run": {"dim": [2, 8], "facets": [4, 16]},
+    "sample": {"dim": [2, 8], "facets": [4, 16]},
+    "WeightFunction.eval": {"dim": [2, 8], "monomials": [4], "degree": [3]},
+    "WeightFunction.filter_vars": {"dim": [2, 8], "monomials": [4]},
+    "checkClauseSAT": {"dim": [2, 8], "facets": [4]},
+    "generateHrep": {"dim": [2, 8], "facets": [4]},
+    "find_interior_point_active_vars": {"dim": [2, 8], "facets": [4, 16]},
+}
+
+# Monomials and degree of the weight function where the grid has none
+DEFAULT_MONOMIALS = 4
+DEFAULT_DEGREE = 3
+
+
+def synthetic_polytope(dim, nbFacets, universe, rng):
+    """
+    A random polytope inside the universe box with nbFacets facets, in the
+    Ax <= b form of generateHrep (facet rows, then the 2 * dim universe
+    bounds), and a point well inside it.
+
+    Returns:
+        (A, b, interior point)
+    """
+    center = rng.uniform(
+        universe.lowerBound + 2, universe.upperBound - 2, size=dim
+    )
+    facets = rng.normal(size=(nbFacets, dim))
+    facets /= np.linalg.norm(facets, axis=1)[:, None]
+    # Every facet between 1 and 2 away from the center
+    offsets = facets @ center + rng.uniform(1, 2, size=nbFacets)
+    A = np.vstack([facets, -universe.A.astype(float)])
+    b = np.concatenate([offsets, -universe.b.astype(float)])
+    return A, b, center
+
+
+def synthetic_weight_function(dim, nbMonomials, degree, rng):
+    """
+    A polynomial with nbMonomials monomials of the given degree over dim
+    variables, plus a constant term that keeps it positive on the universe.
+    """
+    monomials = []
+    for _ in range(nbMonomials):
+        powers = np.bincount(rng.randint(dim, size=degree), minlength=dim)
+        monomials.append([-1 - rng.randint(10), [int(p) for p in powers]])
+    constant = 1 + sum(-coef for coef, _ in monomials) * 10**degree
+    monomials.append([constant, [0] * dim])
+    return WeightFunction(monomials, np.zeros(0))
+
+
+def synthetic_solver(dim, nbFacets, rng, nbClauses=8, nbBools=8):
+    """
+    A solver over nbClauses random polytope clauses (with two Boolean
+    literals each), with unit clause weights so that no LattE call is
+    made.
+    """
+    universe = RealsUniverse(dim)
+    builder = FormulaBuilder(nbBools, dim)
+    for _ in range(nbClauses):
+        A, b, _ = synthetic_polytope(dim, nbFacets, universe, rng)
+        clause = [int(v) for v in rng.choice(nbBools, 2, replace=False)]
+        for row, const in zip(A[:nbFacets], b[:nbFacets]):
+            terms = [(nbBools + i, float(c)) for i, c in enumerate(row)]
+            clause.append(terms + [("<=", float(const))])
+        builder.addClause(clause)
+    wf = WeightFunction(
+        [[1, [0] * dim]], rng.uniform(0.2, 0.8, size=nbBools)
+    )
+    return SimpleWMISolver(
+        builder.build(),
+        nbBools,
+        universe,
+        wf,
+        clauseWeights=np.ones(nbClauses),
+        seed=0,
+    )
+
+
+def measure(call, minTime=0.2, minCalls=20, maxCalls=100000, warmup=3):
+    """
+    Time call() repeatedly, one call at a time.
+
+    Args:
+        call: function of no arguments.
+        minTime: keep calling for at least this many seconds...
+        minCalls: ...and at least this many times...
+        maxCalls: ...but no more than this many times.
+        warmup: untimed calls first (caches, lazy imports).
+
+    Returns:
+        Flat metrics of the per-call latency distribution.
+    """
+    for _ in range(warmup):
+        call()
+    times = []
+    clock = time.perf_counter
+    end = clock() + minTime
+    while len(times) < maxCalls and (len(times) < minCalls or clock() < end):
+        start = clock()
+        call()
+        times.append(clock() - start)
+    times = np.array(times)
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {
+        "calls": len(times),
+        "mean_seconds": float(times.mean()),
+        "min_seconds": float(times.min()),
+        "p50_seconds": float(p50),
+        "p90_seconds": float(p90),
+        "p99_seconds": float(p99),
+        "max_seconds": float(times.max()),
+    }
+
+
+def make_call(name, params, seed=0):
+    """
+    The function of no arguments timed by benchmark name at params.
+    Inputs are generated from seed, so a case always times the same work.
+    """
+    rng = np.random.RandomState(seed)
+    dim = params["dim"]
+    universe = RealsUniverse(dim)
+    wf = synthetic_weight_function(
+        dim,
+        params.get("monomials", DEFAULT_MONOMIALS),
+        params.get("degree", DEFAULT_DEGREE),
+        rng,
+    )
+
+    if name in ["hit_and_run", "sample"]:
+        A, b, x0 = synthetic_polytope(dim, params["facets"], universe, rng)
+        walkRng = BufferedRandom(seed)
+        if name == "sample":
+            return lambda: sample(
+                A, b, wf, x0, 0.1, 0.1, universe, rng=walkRng
+            )
+        # The walk state carries over from call to call, as in the solver
+        x = np.append(x0, walkRng.uniform(0, wf.eval(x0)))
+        return lambda: hit_and_run(A, b, x, wf, 0.1, rng=walkRng)
+
+    if name == "WeightFunction.eval":
+        points = rng.uniform(0, 10, size=(64, dim))
+        counter = itertools.count()
+        return lambda: wf.eval(points[next(counter) % 64])
+
+    if name == "WeightFunction.filter_vars":
+        important = np.sort(rng.choice(dim, max(1, dim // 2), replace=False))
+        return lambda: wf.filter_vars(important)
+
+    if name in ["checkClauseSAT", "generateHrep"]:
+        solver = synthetic_solver(dim, params["facets"], rng)
+        counter = itertools.count()
+        if name == "generateHrep":
+            return lambda: solver.generateHrep(
+                next(counter) % solver.nbClauses
+            )
+        # Half of the points come from inside a clause, so that checks
+        # run past the Boolean and bounding-box tests
+        bools = rng.randint(2**solver.nbBools, size=64).astype(np.uint64)
+        points = [
+            (
+                bools[k : k + 1],
+                solver.lastSampled[k % solver.nbClauses]
+                if k % 2
+                else rng.uniform(0, 10, size=dim),
+            )
+            for k in range(64)
+        ]
+
+        def check():
+            k = next(counter)
+            solver.checkClauseSAT(points[k % 64], k % solver.nbClauses)
+
+        return check
+
+    if name == "find_interior_point_active_vars":
+        A, b, _ = synthetic_polytope(dim, params["facets"], universe, rng)
+        atoms = [
+            [(i, float(c)) for i, c in enumerate(row)] + [("<=", float(const))]
+            for row, const in zip(A[: params["facets"]], b[: params["facets"]])
+        ]
+        return lambda: find_interior_point_active_vars(atoms, dim, 0, universe)
+
+    raise ValueError("Unknown benchmark: " + name)
+
+
+def micro_cases(grids=GRIDS, only=None):
+    """
+    Every (benchmark, parameters) pair of the grids.
+
+    Returns:
+        A dict case name (e.g. "sample[dim=4,facets=16]") -> (benchmark,
+        parameters).
+    """
+    cases = {}
+    for name, grid in grids.items():
+        if only and name not in only:
+            continue
+        keys = sorted(grid)
+        for values in itertools.product(*[grid[key] for key in keys]):
+            params = dict(zip(keys, values))
+            caseName = (
+                name
+                + "["
+                + ",".join(key + "=" + str(params[key]) for key in keys)
+                + "]"
+            )
+            cases[caseName] = (name, params)
+    return cases
+
+
+def format_distribution(name, metrics):
+    return (
+        "{:<58} {:>8} calls  p50 {:>9.1f}us  p90 {:>9.1f}us  p99 {:>9.1f}us"
+    ).format(
+        name,
+        metrics["calls"],
+        1e6 * metrics["p50_seconds"],
+        1e6 * metrics["p90_seconds"],
+        1e6 * metrics["p99_seconds"],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot path microbenchmarks")
+    parser.add_argument("output", help="JSON result file")
+    parser.add_argument(
+        "--quick", action="store_true", help="smaller parameter grids"
+    )
+    parser.add_argument(
+        "--only", nargs="*", default=None, help="only these benchmarks"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="seconds of timed calls per case",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cases = micro_cases(QUICK_GRIDS if args.quick else GRIDS, args.only)
+    results = {}
+    for caseName, (name, params) in cases.items():
+        call = make_call(name, params, args.seed)
+        metrics = measure(call, minTime=args.min_time)
+        results[caseName] = {"params": params, "metrics": metrics}
+        print(format_distribution(caseName, metrics))
+
+    write_results(
+        args.output,
+        "micro",
+        {"minTime": args.min_time, "seed": args.seed},
+        results,
+    )
@@ -0,0 +1,255 @@
+"""
+End-to-end scaling benchmark.
+
+Sweeps one generator parameter at a time around a base case (number of
+clauses, reals and Booleans, clause width, LRA atom length), with a fixed
+seed per case, and records per-phase times, trials, peak memory and LattE
+calls of a full solver run:
+
+    python -m benchmarks.scaling results.json [--quick]
+    python -m benchmarks.compare baseline.json results.json
+"""
+
+import argparse
+import time
+import zlib
+import numpy as np
+from benchmarks.common import (
+    peak_rss_bytes,
+    read_results,
+    run_isolated,
+    write_results,
+)
+
+BASE_CASE = {
+    "nbClauses": 20,
+    "nbReals": 3,
+    "nbBools": 8,
+    "minCWidth": 2,
+    "maxCWidth": 3,
+    "avgLRAAtomLength": 1,
+}
+
+# Values swept per parameter; width is swept as (minCWidth, maxCWidth)
+SWEEPS = {
+    "nbClauses": [10, 20, 40, 80, 160],
+    "nbReals": [2, 3, 5, 8],
+    "nbBools": [4, 8, 16, 32],
+    "width": [(1, 2), (2, 3), (3, 5)],
+    "avgLRAAtomLength": [1, 2, 3],
+}
+
+QUICK_SWEEPS = {
+    "nbClauses": [10, 40],
+    "nbReals": [2, 5],
+    "nbBools": [4, 16],
+    "width": [(1, 2), (3, 5)],
+    "avgLRAAtomLength": [1, 3],
+}
+
+
+def scaling_cases(sweeps=SWEEPS):
+    """
+    The cases of a sweep, one parameter changed at a time.
+
+    Args:
+        sweeps: dict parameter -> values, as SWEEPS.
+
+    Returns:
+        A dict case name (e.g. "nbClauses=40") -> generator parameters.
+    """
+    cases = {"base": dict(BASE_CASE)}
+    for name, values in sweeps.items():
+        for value in values:
+            params = dict(BASE_CASE)
+            if name == "width":
+                params["minCWidth"], params["maxCWidth"] = value
+                caseName = "width={}-{}".format(*value)
+            else:
+                params[name] = value
+                caseName = name + "=" + str(value)
+            if params != BASE_CASE:
+                cases[caseName] = params
+    return cases
+
+
+def case_seed(name, seed=0):
+    """Seed of a case, fixed by its name (so subsets rerun identically)."""
+    return seed + zlib.crc32(name.encode()) % 2**20
+
+
+def build_case(params, seed):
+    """
+    Generate the instance of a case.
+
+    Returns:
+        (clauseList, nbBools, universeReals, weightFunction)
+    """
+    from generators.lra_gen import generateLRA
+    from utils.reals_universe import RealsUniverse
+    from utils.weight_function import random_weight_function
+
+    np.random.seed(seed)
+    universe = RealsUniverse(params["nbReals"])
+    for attempt in range(10):
+        try:
+            clauseList = generateLRA(
+                params["nbBools"],
+                universe,
+                params["nbClauses"],
+                params["minCWidth"],
+                params["maxCWidth"],
+                avgLRAAtomLength=params["avgLRAAtomLength"],
+            )
+            break
+        except TypeError:
+            # The generator gives up on unlucky draws and asks to try
+            # again; later attempts continue the same seeded stream
+            if attempt == 9:
+                raise
+    wf = random_weight_function(
+        params["nbReals"], params["nbBools"], np.random.RandomState(seed)
+    )
+    return clauseList, params["nbBools"], universe, wf
+
+
+def solver_metrics(metrics):
+    """Flat "phase.<timer>_seconds" and "count.<counter>" entries."""
+    snapshot = metrics.snapshot()
+    flat = {}
+    for name, timer in snapshot["timers"].items():
+        flat["phase." + name + "_seconds"] = timer["seconds"]
+        flat["count." + name] = timer["count"]
+    for name, value in snapshot["counters"].items():
+        flat["count." + name] = value
+    return flat
+
+
+def run_case(params, seed, epsilon, delta, maxTrials):
+    """
+    Build and run the solver on one case, stopping the sampling after
+    maxTrials trials (None: the full run).
+
+    Returns:
+        The flat metrics of the case.
+    """
+    from simple_wmi_solver import SimpleWMISolver
+    from utils.metrics import Metrics
+
+    clauseList, nbBools, universe, wf = build_case(params, seed)
+    metrics = Metrics()
+    start = time.perf_counter()
+    solver = SimpleWMISolver(
+        clauseList, nbBools, universe, wf, seed=seed, metrics=metrics
+    )
+    setup = time.perf_counter() - start
+
+    _, _, T = solver.coverageParameters(epsilon, delta)
+    interval = T if maxTrials is None else min(T, maxTrials)
+    update = None
+    for update in solver.coverageStream(epsilon, delta, interval=interval):
+        break
+    sampling = time.perf_counter() - start - setup
+
+    result = {
+        "setup_seconds": setup,
+        "sampling_seconds": sampling,
+        "total_seconds": setup + sampling,
+        "trials": update["trials"],
+        "successes": update["successes"],
+        "trials_per_second": (
+            update["trials"] / sampling if sampling > 0 else 0.0
+        ),
+        "required_trials": T,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    result.update(solver_metrics(metrics))
+    result["latte_calls"] = result.get("count.latte", 0)
+    return result
+
+
+def run_suite(cases, epsilon, delta, maxTrials, seed=0, isolated=True):
+    """
+    Run every case (each in a fresh process if isolated).
+
+    Args:
+        cases: dict case name -> parameters (see scaling_cases).
+        epsilon, delta: solver accuracy parameters.
+        maxTrials: trial cap per case, or None.
+        seed: base seed (see case_seed).
+        isolated: run each case in a fresh interpreter.
+
+    Returns:
+        A dict case name -> {"params", "seed", "metrics"}.
+    """
+    results = {}
+    for name, params in sorted(cases.items()):
+        caseSeed = case_seed(name, seed)
+        args = (params, caseSeed, epsilon, delta, maxTrials)
+        if isolated:
+            metrics = run_isolated(run_case, *args)
+        else:
+            metrics = run_case(*args)
+        results[name] = {
+            "params": params,
+            "seed": caseSeed,
+            "metrics": metrics,
+        }
+        print(
+            "{:<24} setup {:8.3f}s  sampling {:8.3f}s  {:>8} trials".format(
+                name,
+                metrics["setup_seconds"],
+                metrics["sampling_seconds"],
+                metrics["trials"],
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark")
+    parser.add_argument("output", help="JSON result file")
+    parser.add_argument(
+        "--quick", action="store_true", help="a smaller sweep (for CI)"
+    )
+    parser.add_argument(
+        "--cases", nargs="*", default=None, help="only these case names"
+    )
+    parser.add_argument("--eps", type=float, default=0.5)
+    parser.add_argument("--delta", type=float, default=0.2)
+    parser.add_argument(
+        "--trials",
+        type=int,
+        default=2000,
+        help="trial cap per case (0: full runs)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--merge",
+        default=None,
+        help="start from the cases of this result file (e.g. to rerun a few)",
+    )
+    args = parser.parse_args()
+
+    cases = scaling_cases(QUICK_SWEEPS if args.quick else SWEEPS)
+    if args.cases:
+        cases = {name: cases[name] for name in args.cases}
+    maxTrials = args.trials or None
+
+    results = {}
+    if args.merge is not None:
+        results = read_results(args.merge)["cases"]
+    results.update(
+        run_suite(cases, args.eps, args.delta, maxTrials, args.seed)
+    )
+    write_results(
+        args.output,
+        "scaling",
+        {
+            "epsilon": args.eps,
+            "delta": args.delta,
+            "trials": maxTrials,
+            "seed": args.seed,
+        },
+        results,
+    )
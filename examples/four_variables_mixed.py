@@ -99,7 +99,7 @@ def run_example(eps=0.2, delta=0.1, verbose=False):
 
     # Debug the active/free variable separation
     task = SimpleWMISolver(expr, cntBools, uni, poly_wf)
-    lraAtoms = list(filter(lambda x: type(x) == list, task.clauseList[0]))
+    lraAtoms = task.formula.clauseAtoms(0)
 
     appearing, active_vars, free_vars = separate_active_variables(
         lraAtoms, cntReals, cntBools
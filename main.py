@@ -1,72 +1,152 @@
 from simple_wmi_solver import SimpleWMISolver
-from utils.reals_universe import RealsUniverse
-from utils.weight_function import WeightFunction
+from utils.instance_io import Instance, load_instance
+from utils.metrics import Metrics, NullMetrics
+from utils.profiling import make_profiler, format_hot_table
+from utils.weight_function import random_weight_function
 import numpy as np
-import sys, time
+import argparse, contextlib, os, time
 
 if __name__ == "__main__":
-    np.random.seed(42)
-    with open(sys.argv[1], "r") as f:
-        test = eval(f.readline())
-
-        expr = eval(test[0])
-        cntReals = int(test[1])
-        cntBools = int(test[2])
-        cntClauses = int(test[3])
-        width = int(test[4])
-        avgLraLen = int(test[5])
-
-        uni = RealsUniverse(cntReals)
-
-        cntTerms = np.random.choice([1, 2, 3, 4])
-        monomials = []
-
-        C = 2
-        for i in range(cntTerms):
-            curr = [0] * cntReals
-
-            deg = min(np.random.geometric(0.6), 5)
-
-            currC = 1
-            for i in range(deg):
-                xi = np.random.choice(cntReals)
-                curr[xi] += 1
-                currC *= 10
-
-            cnst = 1 + np.random.choice(10)
-            currC *= cnst
-
-            C += currC
-            if deg >= 2:
-                cnst *= -1
-
-            monomials.append([-cnst, curr])
-
-        monomials.append([C, [0] * cntReals])
-        poly_wf = WeightFunction(
-            monomials, np.random.uniform(0, 1, size=cntBools)
+    parser = argparse.ArgumentParser(description="Solve one WMI instance")
+    parser.add_argument("instance", help="instance file (any encoding)")
+    parser.add_argument(
+        "--metrics", default=None, help="write the phase metrics (JSON) here"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["run", "setup", "sampling"],
+        default=None,
+        help="profile the whole run, the setup (clause weights, start"
+        " points, bounding boxes) or the sampling",
+    )
+    parser.add_argument(
+        "--profiler",
+        choices=["sample", "trace"],
+        default="sample",
+        help="sampling profiler (low overhead) or cProfile",
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=0.005,
+        help="seconds between samples of the sampling profiler",
+    )
+    parser.add_argument(
+        "--profile-clock", choices=["wall", "cpu"], default="wall"
+    )
+    parser.add_argument(
+        "--profile-out",
+        default="profile",
+        help="output prefix: <prefix>.collapsed (flamegraph input) for the"
+        " sampling profiler, <prefix>.prof for cProfile",
+    )
+    parser.add_argument(
+        "--exact",
+        choices=["auto", "always", "never"],
+        default="auto",
+        help="exact inclusion-exclusion instead of sampling: when it is"
+        " estimated to be cheaper (auto), always or never",
+    )
+    parser.add_argument(
+        "--solver-cache",
+        default=None,
+        help="compiled solver file: loaded instead of building the solver"
+        " if it exists, written (with the warmed-up chains) after the run",
+    )
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile is not None:
+        profiler = make_profiler(
+            args.profiler, args.profile_interval, args.profile_clock
         )
 
-        eps = 0.25
-        delta = 0.15
-
-        timestamp_start = time.time()
-
-        task = SimpleWMISolver(expr, cntBools, uni, poly_wf)
-        result = task.simpleCoverage(eps, delta)
-
-        timestamp_end = time.time()
-        execution_time = timestamp_end - timestamp_start
+    def phase(name):
+        if profiler is not None and args.profile in ["run", name]:
+            return profiler
+        return contextlib.nullcontext()
 
-        print("Report for  " + str(sys.argv[1]) + ": ")
-        print()
-        print("Eps: " + str(eps))
-        print("Delta: " + str(delta))
-        print("List form of the test (+ generation parameters): " + str(test))
-        print("WF (as list of monomials): " + str(monomials))
+    np.random.seed(42)
+    instance = load_instance(args.instance)
+
+    cntReals = instance.formula.nbReals
+    cntBools = instance.formula.nbBools
+
+    poly_wf = instance.weightFunction
+    if poly_wf is None:
+        poly_wf = random_weight_function(cntReals, cntBools)
+
+    eps = 0.25
+    delta = 0.15
+
+    timestamp_start = time.time()
+
+    # Timers and counters cost time in the sampling loop, so only with
+    # --metrics
+    metrics = NullMetrics() if args.metrics is None else Metrics()
+    with phase("setup"):
+        if args.solver_cache is not None and os.path.exists(
+            args.solver_cache
+        ):
+            fingerprint = Instance(
+                instance.formula, instance.universeReals, poly_wf
+            ).fingerprint()
+            try:
+                task = SimpleWMISolver.load(
+                    args.solver_cache, metrics=metrics, fingerprint=fingerprint
+                )
+            except ValueError as e:
+                parser.error("--solver-cache: " + str(e))
+        else:
+            task = SimpleWMISolver(
+                instance.formula,
+                cntBools,
+                instance.universeReals,
+                poly_wf,
+                metrics=metrics,
+            )
+    with phase("sampling"):
+        result = task.solve(
+            eps,
+            delta,
+            exact={"auto": "auto", "always": True, "never": False}[
+                args.exact
+            ],
+        )
 
+    timestamp_end = time.time()
+    if args.solver_cache is not None:
+        task.save(args.solver_cache)
+    execution_time = timestamp_end - timestamp_start
+
+    print("Report for  " + str(args.instance) + ": ")
+    print()
+    print("Eps: " + str(eps))
+    print("Delta: " + str(delta))
+    print(
+        "Instance: "
+        + str(instance.formula.nbClauses)
+        + " clauses, "
+        + str(cntBools)
+        + " Booleans, "
+        + str(cntReals)
+        + " reals, metadata "
+        + str(instance.meta)
+    )
+    print("WF (as list of monomials): " + str(poly_wf.f))
+
+    print()
+    print("Result: " + str(result) + " (" + task.lastRoute + ")")
+    print("Execution time: " + str("{0:.2f}".format(execution_time)) + " sec")
+
+    if args.metrics is not None:
+        metrics.writeJSON(args.metrics)
+
+    if profiler is not None:
         print()
-        print("Result: " + str(result))
-        print(
-            "Execution time: " + str("{0:.2f}".format(execution_time)) + " sec"
-        )
+        print("Hot functions (" + args.profile + "):")
+        print(format_hot_table(profiler.hotTable()))
+        if args.profiler == "sample":
+            profiler.writeCollapsed(args.profile_out + ".collapsed")
+        else:
+            profiler.writeStats(args.profile_out + ".prof")
@@ -0,0 +1,52 @@
+from utils.batch import run_batch
+import argparse
+import time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Solve the instances of a JSONL file in parallel"
+    )
+    parser.add_argument("instances", help="JSONL file of instances")
+    parser.add_argument("results", help="JSONL file results are appended to")
+    parser.add_argument("--eps", type=float, default=0.25)
+    parser.add_argument("--delta", type=float, default=0.15)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="default: CPU count"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="seconds per instance"
+    )
+    parser.add_argument(
+        "--latte-budget",
+        type=float,
+        default=None,
+        help="LattE seconds per clause before a Monte Carlo fallback",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="record the solver's phase metrics in every result",
+    )
+    args = parser.parse_args()
+
+    start = time.time()
+    counts = run_batch(
+        args.instances,
+        args.results,
+        args.eps,
+        args.delta,
+        nbWorkers=args.workers,
+        timeout=args.timeout,
+        seed=args.seed,
+        latteBudget=args.latte_budget,
+        metrics=args.metrics,
+    )
+    print(
+        "Solved "
+        + str(sum(counts.values()))
+        + " instances in "
+        + "{0:.2f}".format(time.time() - start)
+        + " sec: "
+        + str(counts)
+    )
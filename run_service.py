@@ -0,0 +1,68 @@
+from utils.service import WMIService, make_server
+import argparse
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Answer WMI queries over HTTP on this machine"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="default: CPU count"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=32,
+        help="compiled solvers kept in memory per worker",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="also save compiled solvers here, and load them on a restart",
+    )
+    parser.add_argument("--eps", type=float, default=0.25)
+    parser.add_argument("--delta", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--latte-budget",
+        type=float,
+        default=None,
+        help="LattE seconds per clause before a Monte Carlo fallback",
+    )
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.002,
+        help="seconds to wait for more requests before sending a batch",
+    )
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument(
+        "--verbose", action="store_true", help="log every HTTP request"
+    )
+    args = parser.parse_args()
+
+    service = WMIService(
+        nbWorkers=args.workers,
+        cacheSize=args.cache_size,
+        cacheDir=args.cache_dir,
+        epsilon=args.eps,
+        delta=args.delta,
+        seed=args.seed,
+        latteBudget=args.latte_budget,
+        batchWindow=args.batch_window,
+        maxBatch=args.max_batch,
+    ).start()
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(
+        "Serving on http://{}:{} with {} workers".format(
+            *server.server_address, service.nbWorkers
+        )
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -1,172 +1,566 @@
+import json
 import numpy as np
-from utils.run_latte import integrate
+import time
+from utils.run_latte import integrate, LatteTimeout
 from utils.polytope_sampling import sample
-from utils.polytope_utils import find_interior_point_active_vars
+from utils.polytope_utils import (
+    interior_point,
+    bounding_box,
+    monte_carlo_integral,
+)
+from utils.spatial_index import BoxIndex
+from utils.clause_checker import ClauseChecker
+from utils.clause_selection import (
+    AliasTable,
+    FenwickTree,
+    StratifiedSelector,
+)
+from utils.quasi_random import QuasiRandomStream, QuasiRandomDirections
+from utils.compiled_formula import CompiledFormula, OP_IGNORE
+from utils.exact_wmi import MIN_RADIUS, chebyshev_ball, inclusion_exclusion
+from utils.checkpoint import write_checkpoint, read_checkpoint, write_npz
+from utils.instance_io import (
+    Instance,
+    instance_arrays,
+    instance_from_arrays,
+    read_npz,
+)
+from utils.metrics import NULL_METRICS
+from utils.random_streams import (
+    BufferedRandom,
+    spawn_streams,
+    pack_streams,
+    restore_streams,
+)
+from utils.bool_masks import (
+    nb_words,
+    pack_bools,
+    pack_bool_rows,
+    bool_part_sat,
+)
 from tqdm import tqdm
+from scipy.special import ndtri
+from concurrent.futures import ProcessPoolExecutor
+
+# Variance reduction modes: (stratified clause selection, quasi-random
+# sequence for Boolean assignments and hit-and-run directions)
+SAMPLING_MODES = {
+    "random": (False, None),
+    "stratified": (True, None),
+    "sobol": (True, "sobol"),
+    "halton": (True, "halton"),
+}
+
+# solve never takes the exact route for formulas with more live clauses
+EXACT_MAX_CLAUSES = 64
+# Hit-and-run samples timed to price the sampling route
+EXACT_SAMPLE_PROBES = 3
+
+# Version of the solver files written by save
+SOLVER_VERSION = 2
+
+# Points drawn per batch by the Boolean coverage loop, clause checks first
+# drawn per point, and the most (point, check, word) cells checked at once
+BOOLEAN_BATCH = 4096
+BOOLEAN_CHECKS = 4
+BOOLEAN_BATCH_CELLS = 1 << 21
 
 
 class SimpleWMISolver:
-    def __init__(self, clauseList, nbBools, universeReals, weightFunction):
+    def __init__(
+        self,
+        clauseList,
+        nbBools,
+        universeReals,
+        weightFunction,
+        clauseWeights=None,
+        seed=None,
+        latteBudget=None,
+        fallbackSamples=100000,
+        metrics=None,
+    ):
         self.nbBools = nbBools
+        # Phase timers and counters (see utils.metrics); nothing is
+        # recorded unless a Metrics object is passed
+        self.metrics = NULL_METRICS if metrics is None else metrics
 
         self.universeReals = universeReals
         self.nbReals = self.universeReals.nbReals
 
         self.nbVariables = self.nbBools + self.nbReals
         self.weightFunction = weightFunction
+        self.reseed(seed)
+
+        if isinstance(clauseList, CompiledFormula):
+            self.formula = clauseList
+            if (self.formula.nbBools, self.formula.nbReals) != (
+                self.nbBools,
+                self.nbReals,
+            ):
+                raise ValueError("Formula does not match the variable counts")
+        else:
+            self.formula = CompiledFormula.fromClauseList(
+                clauseList, self.nbBools, self.nbReals
+            )
+        self.nbClauses = self.formula.nbClauses
+        self.compileClauses()
+
+        # Removed clauses keep their index (with weight 0); activeClauses
+        # holds the live ones in its first nbClauses entries, activePos the
+        # position of every clause there (-1 once removed)
+        self.activeClauses = np.arange(self.nbClauses)
+        self.activePos = np.arange(self.nbClauses)
+        self.edited = False
+
+        self.samplingMode = "random"
+        self.boolStream = None
+        self.directions = None
+
+        # Seconds of LattE time allowed per clause (None: unlimited); a
+        # clause over the budget gets a Monte Carlo weight from
+        # fallbackSamples points, recorded in latteFallbacks by index
+        self.latteBudget = latteBudget
+        self.fallbackSamples = fallbackSamples
+        self.latteFallbacks = {}
+
+        self.clauseWeightSeconds = None
+        self.universeWeightValue = None
+        self.lastRoute = None
+        if clauseWeights is None:
+            self.computeClauseWeights()
+        else:
+            # Weights known from an earlier run (e.g. a checkpoint)
+            self.setClauseWeights(np.asarray(clauseWeights))
+        self.generateStartPoints()
+        self.generateClauseBoxes()
+
+    def reseed(self, seed=None):
+        """
+        Reset the random streams. Every randomized component (clause
+        selection, clause checks, Boolean sampling, the hit-and-run walk and
+        the quasi-random scrambles) gets its own stream spawned from `seed`,
+        which may be an int or a np.random.SeedSequence. Without a seed one
+        is drawn from the global np.random state, so np.random.seed still
+        makes runs reproducible.
+        """
+        if seed is None:
+            seed = np.random.randint(2**31)
+        if isinstance(seed, np.random.SeedSequence):
+            self.seedSequence = seed
+        else:
+            self.seedSequence = np.random.SeedSequence(seed)
+        self.rngs = spawn_streams(self.seedSequence)
 
-        # Normalize constraints to eliminate <= and < operators
-        self.clauseList = self.normalizeConstraints(clauseList)
-        self.nbClauses = len(self.clauseList)
-
-        self.computeClauseWeights()
-        self.generateClauseHrep()
-
-    def normalizeConstraints(self, clauseList):
-        """Keep constraints in original form for direct conversion to Ax <= b"""
-        return clauseList
-
-    def generateHrep(self, clause):
-        lines = []
-        for atom in clause:
-            if type(atom) == list:
-                operator = atom[-1][0]
-                constant = atom[-1][1]
-                if operator == "!":
-                    continue
-
-                # Build constraint vector for Ax <= b format
-                vec = [0] * (1 + self.nbReals)
-
-                if operator in [">=", ">"]:
-                    # ax + by >= c becomes -ax - by <= -c
-                    vec[0] = -constant  # -c (right-hand side)
-                    for i, v in atom[:-1]:
-                        vec[i - self.nbBools + 1] = (
-                            -v
-                        )  # -variable coefficients
-                elif operator in ["<=", "<"]:
-                    # ax + by <= c stays as ax + by <= c
-                    vec[0] = constant  # c (right-hand side)
-                    for i, v in atom[:-1]:
-                        vec[i - self.nbBools + 1] = v  # variable coefficients
-                elif operator == "=":
-                    # ax + by = c becomes two constraints
-                    # First: ax + by <= c
-                    vec[0] = constant
-                    for i, v in atom[:-1]:
-                        vec[i - self.nbBools + 1] = v
-                    lines.append(vec)
-                    # Second: -ax - by <= -c
-                    vec2 = [0] * (1 + self.nbReals)
-                    vec2[0] = -constant
-                    for i, v in atom[:-1]:
-                        vec2[i - self.nbBools + 1] = -v
-                    lines.append(vec2)
-                    continue
-
-                lines.append(vec)
-
-        universeConstraints = np.zeros(
-            (self.universeReals.A.shape[0], self.universeReals.A.shape[1] + 1)
+    def compileClauses(self):
+        # Boolean literals become packed positive/negative masks, so the
+        # Boolean half of a clause check is two word-wise mask tests
+        self.nbBoolWords = nb_words(self.nbBools)
+        self.boolPos, self.boolNeg = self.formula.boolMasks()
+
+        # Universe bounds in Ax <= b form: x <= upperBound, -x <= -lowerBound
+        # (from the universe's Ax >= b form), shared by all clauses
+        self.universeA = -self.universeReals.A.astype(float).reshape(
+            2 * self.nbReals, self.nbReals
         )
-        # Convert universe constraints from Ax >= b to Ax <= b format: -Ax <= -b
-        universeConstraints[:, 1:] = -self.universeReals.A
-        universeConstraints[:, 0] = -self.universeReals.b
+        self.universeB = -self.universeReals.b.astype(float)
+
+        # Formulas without LRA atoms take the pure-Boolean path: no LPs,
+        # LattE calls or hit-and-run (see booleanCoverage)
+        self.booleanOnly = bool(np.all(self.formula.atomOps == OP_IGNORE))
 
-        if lines == []:
-            return universeConstraints
+    def generateHrep(self, idx):
+        """
+        Constraints of clause idx in Ax <= b form, the clause rows followed
+        by the universe bounds, as (b, A). Built on demand from the compiled
+        formula, so no per-clause matrices are kept.
+        """
+        with self.metrics.timer("hrep"):
+            A, b = self.formula.clauseRows(idx)
+            return (
+                np.concatenate([b, self.universeB]),
+                np.concatenate([A, self.universeA]),
+            )
 
-        return np.append(np.array(lines), universeConstraints, axis=0)
+    def startPoint(self, idx):
+        # Interior point computed using LP for active variables, falling
+        # back to the center point if no interior point is found
+        A, b = self.formula.clauseRows(idx)
+        with self.metrics.timer("chebyshev_lp"):
+            interior = interior_point(A, b, self.universeReals)
+        if interior is None:
+            center_point = (
+                self.universeReals.lowerBound + self.universeReals.upperBound
+            ) / 2.0
+            return np.full(self.nbReals, center_point)
+        return interior
 
-    def generateClauseHrep(self):
-        # Generate constraints in Ax <= b format for sampling
-        self.hrep = [
-            (A[:, 0], A[:, 1:])
-            for A in [self.generateHrep(clause) for clause in self.clauseList]
-        ]
-        # Initialize lastSampled with interior points computed using LP for active variables
-        self.lastSampled = []
-        for clause in self.clauseList:
-            lraAtoms = list(filter(lambda x: type(x) == list, clause))
-            interior_point = find_interior_point_active_vars(
-                lraAtoms, self.nbReals, self.nbBools, self.universeReals
+    def clauseBox(self, idx):
+        # Bounding box of the clause polytope, empty if it is infeasible
+        A, b = self.formula.clauseRows(idx)
+        with self.metrics.timer("bounding_box_lp"):
+            box = bounding_box(A, b, self.universeReals)
+        if box is None:
+            empty = np.full(self.nbReals, np.inf)
+            return empty, -empty
+        return box
+
+    def generateStartPoints(self):
+        if self.booleanOnly:
+            # Every clause polytope is the universe: start at its center
+            self.lastSampled = np.full(
+                (self.nbClauses, self.nbReals),
+                (self.universeReals.lowerBound + self.universeReals.upperBound)
+                / 2.0,
             )
-            if interior_point is not None:
-                self.lastSampled.append(interior_point)
-            else:
-                # Fallback to center point if no interior point found
-                center_point = (
-                    self.universeReals.lowerBound
-                    + self.universeReals.upperBound
-                ) / 2.0
-                self.lastSampled.append(np.full(self.nbReals, center_point))
-
-    def computeWeightOfClause(self, clause):
-        boolLits = np.array(
-            [x for x in filter(lambda x: type(x) != list, clause)]
-        ).astype(int)
+            return
+        # Initialize lastSampled with the interior points of the clauses
+        self.lastSampled = np.array(
+            [self.startPoint(idx) for idx in range(self.nbClauses)],
+            dtype=float,
+        ).reshape(self.nbClauses, self.nbReals)
+
+    def generateClauseBoxes(self):
+        # Bounding boxes of the clause polytopes, used to reject points
+        # before evaluating any constraint row
+        if self.booleanOnly:
+            lower = np.full(
+                (self.nbClauses, self.nbReals), self.universeReals.lowerBound
+            )
+            upper = np.full(
+                (self.nbClauses, self.nbReals), self.universeReals.upperBound
+            )
+        else:
+            boxes = [self.clauseBox(idx) for idx in range(self.nbClauses)]
+            lower = np.array([box[0] for box in boxes], dtype=float)
+            upper = np.array([box[1] for box in boxes], dtype=float)
+        self.clauseBoxes = BoxIndex(
+            lower.reshape(self.nbClauses, self.nbReals),
+            upper.reshape(self.nbClauses, self.nbReals),
+        )
+        self.clauseChecker = ClauseChecker(
+            self.formula,
+            self.boolPos,
+            self.boolNeg,
+            self.clauseBoxes,
+        )
+
+    def addClauses(self, clauseList):
+        """
+        Append clauses (a clause list or a CompiledFormula) to the formula.
+        Only the new clauses get weights, start points and bounding boxes;
+        the weight sum, the clause selector and the clause checker are
+        updated in place and the hit-and-run states of the existing clauses
+        are kept.
+
+        Returns:
+            The indices of the new clauses.
+        """
+        if not isinstance(clauseList, CompiledFormula):
+            clauseList = CompiledFormula.fromClauseList(
+                clauseList, self.nbBools, self.nbReals
+            )
+        first = self.formula.nbClauses
+        self.formula = self.formula.concatenate(clauseList)
+        newClauses = np.arange(first, self.formula.nbClauses)
+
+        pos, neg = clauseList.boolMasks()
+        self.boolPos = np.concatenate([self.boolPos, pos])
+        self.boolNeg = np.concatenate([self.boolNeg, neg])
+
+        self.booleanOnly = self.booleanOnly and bool(
+            np.all(clauseList.atomOps == OP_IGNORE)
+        )
+        if self.booleanOnly:
+            weights = self.booleanClauseWeights(clauseList, pos, neg)
+        else:
+            weights = np.array(
+                [self.computeWeightOfClause(idx) for idx in newClauses]
+            )
+        shape = (len(newClauses), self.nbReals)
+        if self.booleanOnly:
+            # As in generateStartPoints and generateClauseBoxes, no LPs
+            lowerBound = self.universeReals.lowerBound
+            upperBound = self.universeReals.upperBound
+            starts = np.full(shape, (lowerBound + upperBound) / 2.0)
+            lower = np.full(shape, lowerBound)
+            upper = np.full(shape, upperBound)
+        else:
+            starts = np.array(
+                [self.startPoint(idx) for idx in newClauses], dtype=float
+            ).reshape(shape)
+            boxes = [self.clauseBox(idx) for idx in newClauses]
+            lower = np.array([box[0] for box in boxes]).reshape(shape)
+            upper = np.array([box[1] for box in boxes]).reshape(shape)
+        self.lastSampled = np.concatenate([self.lastSampled, starts])
+        self.clauseBoxes.append(lower, upper)
+        self.clauseChecker.addClauses(self.formula, self.boolPos, self.boolNeg)
+
+        self.activeClauses = np.concatenate(
+            [self.activeClauses[: self.nbClauses], newClauses]
+        )
+        self.activePos = np.concatenate(
+            [self.activePos, self.nbClauses + np.arange(len(newClauses))]
+        )
+        self.nbClauses += len(newClauses)
+
+        self.clauseWeights = np.concatenate([self.clauseWeights, weights])
+        self.universeDisjointWeightSum += weights.sum()
+        self.updateClauseSelector(newClauses)
+        return newClauses
+
+    def removeClauses(self, indices):
+        """
+        Remove clauses by index. A removed clause keeps its index but gets
+        weight 0 and an empty bounding box, so it is never drawn, checked
+        or reported as satisfied; the other indices stay valid.
+        """
+        indices = np.atleast_1d(np.asarray(indices, dtype=int))
+        for idx in indices:
+            pos = self.activePos[idx]
+            if pos < 0:
+                raise ValueError("Clause " + str(idx) + " was already removed")
+            # Swap the last live clause into the freed position
+            last = self.activeClauses[self.nbClauses - 1]
+            self.activeClauses[pos] = last
+            self.activePos[last] = pos
+            self.activePos[idx] = -1
+            self.nbClauses -= 1
+
+            self.universeDisjointWeightSum -= self.clauseWeights[idx]
+            self.clauseWeights[idx] = 0
+            self.clauseBoxes.remove(idx)
+
+        if self.nbClauses == 0:
+            # Keep rounding residue from looking like a nonempty formula
+            self.universeDisjointWeightSum = 0.0
+        self.updateClauseSelector(indices)
+
+    def computeWeightOfClause(self, idx):
+        boolLits = self.formula.clauseLits(idx)
+        negated = boolLits >= self.nbVariables
         negWeight = (
             1
             - self.weightFunction.boolWeights[
-                (
-                    boolLits[boolLits >= self.nbVariables] - self.nbVariables
-                ).astype(int)
+                boolLits[negated] - self.nbVariables
             ]
         ).prod()
-        normWeight = self.weightFunction.boolWeights[
-            boolLits[boolLits < self.nbVariables]
-        ].prod()
+        normWeight = self.weightFunction.boolWeights[boolLits[~negated]].prod()
 
         booleanWeight = negWeight * normWeight
+        lraAtoms = self.formula.clauseAtoms(idx)
         try:
-            lraWeight = sum(
-                [
-                    integrate(
-                        filter(lambda x: type(x) == list, clause),
-                        [one_monomial],
-                        self.nbBools,
-                        self.universeReals,
-                    )
-                    for one_monomial in self.weightFunction.f
-                ]
-            )
+            lraWeight = self.lraWeight(lraAtoms)
+        except LatteTimeout:
+            self.metrics.count("latte_fallbacks")
+            lraWeight = self.approximateLRAWeight(idx)
         except FileNotFoundError:
             lraWeight = 0.0 # LattE not found, assume 0 LRA weight for this clause
 
         return booleanWeight * lraWeight
 
+    def lraWeight(self, lraAtoms):
+        """
+        Integral of the weight function over the polytope of lraAtoms (in
+        the universe), one LattE call per monomial. Raises LatteTimeout
+        past latteBudget seconds.
+        """
+        if self.latteBudget is not None:
+            deadline = time.time() + self.latteBudget
+        weight = 0
+        for one_monomial in self.weightFunction.f:
+            timeout = None
+            if self.latteBudget is not None:
+                timeout = deadline - time.time()
+            weight += integrate(
+                lraAtoms,
+                [one_monomial],
+                self.nbBools,
+                self.universeReals,
+                timeout,
+                self.metrics,
+            )
+        return weight
+
+    def approximateLRAWeight(self, idx):
+        """
+        Monte Carlo estimate of the LRA weight of clause idx, for clauses
+        whose LattE integration ran past the budget. The estimate and its
+        standard error are recorded in latteFallbacks.
+        """
+        A, b = self.formula.clauseRows(idx)
+        lower, upper = self.clauseBox(idx)
+        # A stream of its own per clause, so that fallbacks neither shift
+        # the sampling streams nor depend on the order clauses come in
+        key = list(self.seedSequence.generate_state(4)) + [int(idx)]
+        estimate, stdError = monte_carlo_integral(
+            A,
+            b,
+            self.weightFunction.f,
+            lower,
+            upper,
+            self.fallbackSamples,
+            BufferedRandom(np.random.SeedSequence(key)),
+        )
+        self.latteFallbacks[int(idx)] = {
+            "estimate": estimate,
+            "stdError": stdError,
+        }
+        return estimate
+
+    def latteBudgetSummary(self):
+        """The clauses that hit the LattE budget, as a JSON-friendly dict."""
+        return {
+            "budget": self.latteBudget,
+            "clauses": sorted(self.latteFallbacks),
+            "fallbacks": {
+                str(idx): fallback
+                for idx, fallback in sorted(self.latteFallbacks.items())
+            },
+        }
+
+    def universeWeight(self):
+        """Integral of the weight function over the whole universe."""
+        if self.universeWeightValue is None:
+            try:
+                self.universeWeightValue = self.lraWeight([])
+            except FileNotFoundError:
+                self.universeWeightValue = 0.0  # As for the clause weights
+        return self.universeWeightValue
+
+    def booleanClauseWeights(self, formula=None, boolPos=None, boolNeg=None):
+        """
+        Weights of the clauses of an atom-free formula (default: all
+        clauses of the solver's formula, with boolPos and boolNeg their
+        masks), in one vectorized pass: the product of the literal weights
+        (summed as logs over the literal arrays) times the universe weight.
+        A clause with a literal and its negation cannot hold and gets
+        weight 0.
+        """
+        if formula is None:
+            formula = self.formula
+            boolPos, boolNeg = self.boolPos, self.boolNeg
+        lits = np.asarray(formula.lits, dtype=np.int64)
+        clauseIdx = np.repeat(
+            np.arange(formula.nbClauses), np.diff(formula.litOffsets)
+        )
+        negated = lits >= self.nbVariables
+        p = self.weightFunction.boolWeights[
+            np.where(negated, lits - self.nbVariables, lits)
+        ]
+        with np.errstate(divide="ignore"):
+            logs = np.log(np.where(negated, 1 - p, p))
+        logWeights = np.bincount(
+            clauseIdx, weights=logs, minlength=formula.nbClauses
+        )
+        clash = (boolPos & boolNeg).any(axis=1)
+        weights = np.where(clash, 0.0, np.exp(logWeights))
+        return weights * self.universeWeight()
+
     def computeClauseWeights(self):
-        self.clauseWeights = np.array(
-            [
-                self.computeWeightOfClause(clause)
-                for clause in tqdm(
-                    self.clauseList,
-                    desc="Computing clause weights",
-                    unit="clause",
-                )
-            ]
+        start = time.perf_counter()
+        if self.booleanOnly:
+            with self.metrics.timer("clause_weights"):
+                weights = self.booleanClauseWeights()
+            self.clauseWeightSeconds = (time.perf_counter() - start) / max(
+                self.nbClauses, 1
+            )
+            self.setClauseWeights(weights)
+            return
+        with self.metrics.timer("clause_weights"):
+            weights = np.array(
+                [
+                    self.computeWeightOfClause(idx)
+                    for idx in tqdm(
+                        range(self.nbClauses),
+                        desc="Computing clause weights",
+                        unit="clause",
+                    )
+                ]
+            )
+        # Cost of one exact term, for the choice of route in solve
+        self.clauseWeightSeconds = (time.perf_counter() - start) / max(
+            self.nbClauses, 1
         )
+        self.setClauseWeights(weights)
+        if self.latteFallbacks:
+            print(
+                str(len(self.latteFallbacks))
+                + " clauses hit the LattE budget of "
+                + str(self.latteBudget)
+                + " sec and use Monte Carlo weights: "
+                + str(sorted(self.latteFallbacks))
+            )
+
+    def setClauseWeights(self, clauseWeights):
+        self.clauseWeights = clauseWeights
         self.universeDisjointWeightSum = self.clauseWeights.sum()
+        self.buildClauseSelector()
+
+    @property
+    def clauseProbs(self):
         if self.universeDisjointWeightSum == 0:
-            self.clauseProbs = np.zeros(self.nbClauses)
+            return np.zeros(len(self.clauseWeights))
+        return (self.clauseWeights / self.universeDisjointWeightSum).astype(
+            float
+        )
+
+    def buildClauseSelector(self):
+        if SAMPLING_MODES[self.samplingMode][0]:
+            self.clauseSelector = StratifiedSelector(self.clauseWeights)
+        elif self.edited:
+            # Edited formulas draw from a Fenwick tree, which takes weight
+            # changes and new clauses in O(log m)
+            self.clauseSelector = FenwickTree(self.clauseWeights)
         else:
-            self.clauseProbs = (
-                self.clauseWeights / self.universeDisjointWeightSum
-            ).astype(float)
-
-    def sampleSolution(self, clause, hrep, idx, epsilon, delta):
-        sampledBools = list(
-            np.random.uniform(0, 1, size=self.nbBools)
-            < self.weightFunction.boolWeights
+            # Built once, so that every clause draw in the sampling loop
+            # is O(1)
+            self.clauseSelector = AliasTable(self.clauseWeights)
+
+    def updateClauseSelector(self, clauses):
+        """Bring the clause selector up to date after an edit."""
+        if not self.edited or SAMPLING_MODES[self.samplingMode][0]:
+            # The first edit switches to the Fenwick tree; the stratified
+            # selector is a cumulative sum, rebuilt in one vectorized pass
+            self.edited = True
+            self.buildClauseSelector()
+            return
+        for idx in clauses:
+            if idx < self.clauseSelector.size:
+                self.clauseSelector.update(idx, self.clauseWeights[idx])
+            else:
+                self.clauseSelector.append(self.clauseWeights[idx])
+
+    def setSamplingMode(self, mode):
+        if mode not in SAMPLING_MODES:
+            raise ValueError("Unknown sampling mode: " + str(mode))
+        if mode != self.samplingMode:
+            self.samplingMode = mode
+            self.buildClauseSelector()
+
+        # Fresh scrambles on every run, so that runs stay independent
+        qmcMethod = SAMPLING_MODES[mode][1]
+        self.boolStream = None
+        self.directions = None
+        if qmcMethod is not None:
+            seed = self.rngs["qmc"].randint(2**31)
+            if self.nbBools > 0:
+                self.boolStream = QuasiRandomStream(
+                    self.nbBools, qmcMethod, np.random.default_rng(seed)
+                )
+            self.directions = QuasiRandomDirections(qmcMethod, seed + 1)
+
+    def sampleSolution(self, idx, epsilon, delta):
+        if self.boolStream is not None:
+            uniforms = self.boolStream.next()
+        else:
+            uniforms = self.rngs["bools"].uniform(0, 1, size=self.nbBools)
+        sampledBools = pack_bools(
+            uniforms < self.weightFunction.boolWeights, self.nbBoolWords
         )
-        for lit in clause:
-            if type(lit) == int:
-                if lit < self.nbVariables:
-                    sampledBools[lit] = True
-                else:
-                    sampledBools[lit - self.nbVariables] = False
+        # Force the literals of the chosen clause
+        sampledBools = (sampledBools | self.boolPos[idx]) & ~self.boolNeg[idx]
 
+        hrep = self.generateHrep(idx)
         sampledReals = sample(
             hrep[1],
             hrep[0],
@@ -175,37 +569,37 @@ class SimpleWMISolver:
             epsilon,
             delta,
             self.universeReals,
+            self.directions,
+            self.rngs["walk"],
+            self.metrics,
         )[:-1]
         self.lastSampled[idx] = sampledReals
-        return sampledBools + list(sampledReals)
-
-    def checkClauseSAT(self, sol, clause):
-        for lit in clause:
-            if type(lit) == int:
-                if (lit >= self.nbVariables) and sol[lit - self.nbVariables]:
-                    return False
-                if (lit < self.nbVariables) and not sol[lit]:
-                    return False
-
-            elif type(lit) == list:
-                # Check original constraint format
-                operator = lit[-1][0]
-                constant = lit[-1][1]
-                var_sum = sum([sol[idx] * coef for idx, coef in lit[:-1]])
-
-                if operator in [">=", ">"]:
-                    if var_sum < constant:
-                        return False
-                elif operator in ["<=", "<"]:
-                    if var_sum > constant:
-                        return False
-                elif operator == "=":
-                    if abs(var_sum - constant) > 1e-9:
-                        return False
-
-        return True
-
-    def simpleCoverage(self, epsilon, delta):
+        return sampledBools, sampledReals
+
+    def checkClauseSAT(self, sol, clauseIdx):
+        return self.clauseChecker.check(sol, clauseIdx)
+
+    def boolSatisfiedClauses(self, sampledBools):
+        """Mask over all clauses whose Boolean half holds for sampledBools."""
+        return bool_part_sat(sampledBools, self.boolPos, self.boolNeg)
+
+    def satisfiedClauses(self, sol):
+        """Indices of all clauses satisfied by sol."""
+        sampledBools, sampledReals = sol
+        candidates = self.clauseBoxes.query(sampledReals)
+        candidates = candidates[
+            self.boolSatisfiedClauses(sampledBools)[candidates]
+        ]
+        return np.array(
+            [
+                idx
+                for idx in candidates
+                if self.clauseChecker.checkAtoms(sampledReals, idx)
+            ],
+            dtype=int,
+        )
+
+    def coverageParameters(self, epsilon, delta):
         # If you have a procedure that can sample within some
         # epsilon and delta, you can use that instead of the
         # hit and run sampling.
@@ -225,35 +619,913 @@ class SimpleWMISolver:
                 / ((epsilon**2) - 8 * (C - 1) * self.nbClauses)
             )
         )
+        return SampleEps, SampleDelta, T
+
+    def simpleCoverage(self, epsilon, delta, progress=True, mode="random"):
+        SampleEps, SampleDelta, T = self.coverageParameters(epsilon, delta)
+        update = None
+        for update in self.coverageStream(
+            epsilon, delta, interval=T, progress=progress, mode=mode
+        ):
+            pass
+        return update["estimate"]
+
+    def solve(
+        self, epsilon, delta, progress=True, mode="random", exact="auto"
+    ):
+        """
+        WMI of the formula, exact or by sampling.
+
+        With exact="auto" the route is picked by routeCosts: the exact
+        inclusion-exclusion of exactWMI when it is estimated to cost less
+        than the simpleCoverage run, sampling otherwise (and whenever an
+        exact term runs past the LattE budget). exact=True and exact=False
+        force either route. The route taken is left in lastRoute.
+        """
+        if exact == "auto":
+            route = self.routeCosts(epsilon, delta)["route"]
+        else:
+            route = "exact" if exact else "sampling"
+        if route == "exact":
+            try:
+                estimate = self.exactWMI()
+                self.lastRoute = "exact"
+                return estimate
+            except LatteTimeout:
+                if exact is True:
+                    raise
+        self.lastRoute = "sampling"
+        return self.simpleCoverage(epsilon, delta, progress, mode)
+
+    def liveClauses(self):
+        """Active clauses with a non-zero weight, the only ones that count."""
+        active = self.activeClauses[: self.nbClauses]
+        return active[self.clauseWeights[active] > 0]
+
+    def clauseCompatibility(self, clauses):
+        """
+        Clauses that may hold together: no literal of one is negated in the
+        other and their bounding boxes overlap. Every non-empty
+        intersection of clauses is a clique of this graph.
+
+        Args:
+            clauses: Clause indices
+
+        Returns:
+            For the k-th clause, a bitmask (int) of the positions in
+            clauses of the clauses compatible with it
+        """
+        pos, neg = self.boolPos[clauses], self.boolNeg[clauses]
+        clash = (
+            (pos[:, None, :] & neg[None, :, :])
+            | (neg[:, None, :] & pos[None, :, :])
+        ).any(axis=2)
+        lower = self.clauseBoxes.lower[clauses]
+        upper = self.clauseBoxes.upper[clauses]
+        overlap = (lower[:, None, :] <= upper[None, :, :]).all(axis=2) & (
+            lower[None, :, :] <= upper[:, None, :]
+        ).all(axis=2)
+        compatible = ~clash & overlap
+        np.fill_diagonal(compatible, False)
+        return [
+            sum(1 << int(j) for j in np.flatnonzero(row)) for row in compatible
+        ]
+
+    def routeCosts(self, epsilon, delta):
+        """
+        Estimated seconds of the exact and sampling routes of solve.
+
+        The exact route costs one LP and one LattE integration per
+        non-empty clause intersection, priced at the measured cost of a
+        clause weight. The number of intersections is bounded by the
+        number of cliques of the compatibility graph, counted only up to
+        what sampling would cost. The sampling route costs T trials, each
+        drawing a new point with probability at least 1 / (1 + mean
+        number of compatible clauses), priced at the time of a few
+        hit-and-run samples drawn with a separate random stream (for
+        atom-free formulas, at the time of a batch of booleanCoverage).
+
+        Returns:
+            dict with "route" ("exact" or "sampling"), "exactTerms" (None
+            past the count limit), "exactSeconds", "samplingTrials" and
+            "samplingSeconds"
+        """
+        _, _, T = self.coverageParameters(epsilon, delta)
+        costs = {
+            "route": "sampling",
+            "exactTerms": None,
+            "exactSeconds": float("inf"),
+            "samplingTrials": T,
+            "samplingSeconds": 0.0,
+        }
+        clauses = self.liveClauses()
+        if len(clauses) == 0:
+            # The answer is 0 either way
+            costs.update(route="exact", exactTerms=0, exactSeconds=0.0)
+            return costs
+        if len(clauses) > EXACT_MAX_CLAUSES or self.latteFallbacks:
+            # Too large, or LattE is already too slow for single clauses
+            return costs
+
+        neighbours = self.clauseCompatibility(clauses)
+        meanDegree = np.mean([bin(mask).count("1") for mask in neighbours])
+        points = T / (1 + meanDegree)
+        if self.booleanOnly:
+            batch = int(min(self.booleanBatchSize(), np.ceil(points)))
+            costs["samplingSeconds"] = float(
+                np.ceil(points / batch) * self.booleanBatchSeconds(batch)
+            )
+        else:
+            costs["samplingSeconds"] = float(
+                points * self.sampleSeconds(clauses)
+            )
+
+        termSeconds = self.exactTermSeconds(clauses[0])
+        limit = int(costs["samplingSeconds"] / max(termSeconds, 1e-9)) + 1
+        terms = _count_cliques(neighbours, limit)
+        if terms <= limit:
+            costs["exactTerms"] = terms
+            costs["exactSeconds"] = terms * termSeconds
+            if costs["exactSeconds"] < costs["samplingSeconds"]:
+                costs["route"] = "exact"
+        return costs
+
+    def booleanBatchSeconds(self, count):
+        """
+        Seconds of a batch of count points of booleanCoverage, with one
+        block of clause checks each. A separate random stream is used, so
+        the sampling run is not affected.
+        """
+        rng = BufferedRandom(0)
+        start = time.perf_counter()
+        clauses = self.clauseSelector.sample_many(count, rng)
+        bits = pack_bool_rows(
+            rng.uniform(size=(count, self.nbBools))
+            < self.weightFunction.boolWeights,
+            self.nbBoolWords,
+        )
+        bits = (bits | self.boolPos[clauses]) & ~self.boolNeg[clauses]
+        checks = self.activeClauses[
+            rng.randint(self.nbClauses, size=(count, BOOLEAN_CHECKS))
+        ]
+        bool_part_sat(
+            bits[:, None, :], self.boolPos[checks], self.boolNeg[checks]
+        )
+        return time.perf_counter() - start
+
+    def exactTermSeconds(self, idx):
+        """
+        Seconds per exact term: a clause weight and an LP, or for
+        atom-free formulas only a product of literal weights.
+        """
+        if self.booleanOnly:
+            boolWeights = self.weightFunction.boolWeights
+            lits = self.formula.clauseLits(idx) % self.nbVariables
+            start = time.perf_counter()
+            np.prod([boolWeights[v] for v in lits])
+            return time.perf_counter() - start
+        if self.clauseWeightSeconds is None:
+            start = time.perf_counter()
+            self.computeWeightOfClause(idx)
+            self.clauseWeightSeconds = time.perf_counter() - start
+        start = time.perf_counter()
+        self.startPoint(idx)
+        return self.clauseWeightSeconds + time.perf_counter() - start
+
+    def sampleSeconds(self, clauses, nbProbes=EXACT_SAMPLE_PROBES):
+        """
+        Seconds per hit-and-run sample, from a few samples of the heaviest
+        clause. A separate random stream is used and lastSampled is left
+        alone, so the sampling run is not affected.
+        """
+        idx = clauses[np.argmax(self.clauseWeights[clauses])]
+        b, A = self.generateHrep(idx)
+        rng = BufferedRandom(0)
+        start = time.perf_counter()
+        for _ in range(nbProbes):
+            sample(
+                A,
+                b,
+                self.weightFunction,
+                self.lastSampled[idx],
+                0,
+                0,
+                self.universeReals,
+                rng=rng,
+            )
+        return (time.perf_counter() - start) / nbProbes
+
+    def exactWMI(self):
+        """
+        Exact WMI by inclusion-exclusion: the sum over every non-empty set
+        S of clauses of (-1)^(|S|+1) * WMI(conjunction of S). A
+        conjunction is the union of the literals and of the LRA atoms of
+        its clauses. Sets are grown clause by clause along the
+        compatibility graph (see clauseCompatibility), and a set whose
+        polytope has no volume is never grown (see
+        utils.exact_wmi.inclusion_exclusion). Single clauses reuse their
+        clause weights; every other set costs an LP and a LattE call.
+
+        Raises LatteTimeout if an integration runs past latteBudget.
+        """
+        clauses = self.liveClauses()
+        neighbours = self.clauseCompatibility(clauses)
+        boolWeights = self.weightFunction.boolWeights
+        parts = []
+        for idx in clauses:
+            lits = self.formula.clauseLits(idx)
+            negated = lits >= self.nbVariables
+            A, b = self.formula.clauseRows(idx)
+            parts.append(
+                (
+                    set(int(v) for v in lits[~negated]),
+                    set(int(v) - self.nbVariables for v in lits[negated]),
+                    self.formula.clauseAtoms(idx),
+                    A,
+                    b,
+                )
+            )
+
+        # Atom-free intersections are all the whole universe
+        universeWeight = self.universeWeight() if self.booleanOnly else None
+
+        def join(state, k):
+            if state is None:
+                return self.clauseWeights[clauses[k]], parts[k]
+            pos, neg, atoms, A, b = state
+            kPos, kNeg, kAtoms, kA, kB = parts[k]
+            newA = np.vstack([A, kA])
+            newB = np.concatenate([b, kB])
+            if not self.booleanOnly:
+                with self.metrics.timer("exact_lp"):
+                    _, radius = chebyshev_ball(
+                        np.vstack([newA, self.universeA]),
+                        np.concatenate([newB, self.universeB]),
+                    )
+                if radius <= MIN_RADIUS:
+                    return None
+            newPos, newNeg = pos | kPos, neg | kNeg
+            boolWeight = np.prod([boolWeights[v] for v in newPos]) * np.prod(
+                [1 - boolWeights[v] for v in newNeg]
+            )
+            if self.booleanOnly:
+                lraWeight = universeWeight
+            else:
+                try:
+                    lraWeight = self.lraWeight(atoms + kAtoms)
+                except FileNotFoundError:
+                    lraWeight = 0.0  # As for the clause weights
+            self.metrics.count("exact_terms")
+            return (
+                boolWeight * lraWeight,
+                (newPos, newNeg, atoms + kAtoms, newA, newB),
+            )
+
+        # The empty set is None, so that single clauses skip the LP
+        return inclusion_exclusion(len(clauses), join, None, neighbours)
+
+    def coverageStream(
+        self,
+        epsilon,
+        delta,
+        interval=1000,
+        timeInterval=None,
+        progress=False,
+        checkpointPath=None,
+        checkpointInterval=5.0,
+        resume=False,
+        mode="random",
+    ):
+        """
+        Anytime version of simpleCoverage.
+
+        Runs the same trials as simpleCoverage, but yields the running state
+        every `interval` trials and/or every `timeInterval` seconds, and once
+        more after the last trial. The caller can stop iterating at any point
+        and use the last update as its answer.
+
+        Every update is a dict with the running estimate (None until the
+        first success), the trials consumed, the successes, the elapsed time
+        in seconds and a (1 - delta) confidence interval. The interval is a
+        Wilson score interval on the per-trial success rate, mapped through
+        estimate = universeDisjointWeightSum / (nbClauses * rate); it treats
+        trials as independent, so it is an approximation.
+
+        If checkpointPath is given, the full run state is written there every
+        checkpointInterval seconds (and after the last trial). With
+        resume=True the run continues from that checkpoint instead of
+        starting over, producing exactly the trials the interrupted run
+        would have produced. Checkpoints only cover the "random" sampling
+        mode, whose state is entirely in the RNG.
+
+        `mode` selects a variance reduction mode from SAMPLING_MODES.
+        """
+        if checkpointPath is not None and mode != "random":
+            raise ValueError("Checkpoints require the random sampling mode")
+        self.setSamplingMode(mode)
+
+        SampleEps, SampleDelta, T = self.coverageParameters(epsilon, delta)
+        z = ndtri(1 - delta / 2)
+
         numberSuccesses = 0
         point = None
+        startTrial = 0
+        elapsedBefore = 0.0
+        if resume:
+            startTrial, numberSuccesses, point, elapsedBefore = (
+                self.restoreCheckpoint(checkpointPath, epsilon, delta)
+            )
+
+        start = time.time() - elapsedBefore
+        lastYield = time.time()
+        lastCheckpoint = lastYield
 
         if self.universeDisjointWeightSum == 0:
-            return 0.0
+            yield {
+                "estimate": 0.0,
+                "trials": 0,
+                "successes": 0,
+                "elapsed": time.time() - start,
+                "interval": (0.0, 0.0),
+            }
+            return
 
-        for i in tqdm(range(T), desc="WMI Sampling", unit="samples"):
-            if point is None:
-                clauseIdx = np.random.choice(
-                    self.nbClauses, p=self.clauseProbs
-                )
-                point = self.sampleSolution(
-                    self.clauseList[clauseIdx],
-                    self.hrep[clauseIdx],
-                    clauseIdx,
-                    SampleEps,
-                    SampleDelta,
-                )
+        if startTrial >= T:
+            # Resumed from the checkpoint of a finished run
+            yield self.coverageUpdate(T, numberSuccesses, elapsedBefore, z)
+            return
 
-            checkClauseIdx = np.random.randint(self.nbClauses)
-            sat_result = self.checkClauseSAT(
-                point, self.clauseList[checkClauseIdx]
+        if (
+            self.booleanOnly
+            and checkpointPath is None
+            and SAMPLING_MODES[mode][1] is None
+        ):
+            yield from self.booleanCoverage(
+                T, interval, timeInterval, z, start
             )
+            return
+
+        # Checks are too cheap to time unconditionally
+        timed = self.metrics.enabled
+        for i in tqdm(
+            range(startTrial, T),
+            desc="WMI Sampling",
+            unit="samples",
+            disable=not progress,
+        ):
+            if point is None:
+                clauseIdx = self.clauseSelector.sample(self.rngs["clauses"])
+                with self.metrics.timer("sampling"):
+                    point = self.sampleSolution(
+                        clauseIdx, SampleEps, SampleDelta
+                    )
+
+            checkClauseIdx = self.activeClauses[
+                self.rngs["checks"].randint(self.nbClauses)
+            ]
+            if timed:
+                checkStart = time.perf_counter()
+                sat_result = self.checkClauseSAT(point, checkClauseIdx)
+                self.metrics.add(
+                    "clause_checks", time.perf_counter() - checkStart
+                )
+                self.metrics.count("trials")
+            else:
+                sat_result = self.checkClauseSAT(point, checkClauseIdx)
             if sat_result:
                 numberSuccesses += 1
+                self.metrics.count("successes")
                 point = None
 
+            trials = i + 1
+            if checkpointPath is not None:
+                now = time.time()
+                if trials == T or now - lastCheckpoint >= checkpointInterval:
+                    lastCheckpoint = now
+                    self.writeCheckpoint(
+                        checkpointPath,
+                        epsilon,
+                        delta,
+                        trials,
+                        numberSuccesses,
+                        point,
+                        now - start,
+                    )
+
+            if trials == T or (interval and trials % interval == 0):
+                lastYield = time.time()
+                yield self.coverageUpdate(
+                    trials, numberSuccesses, lastYield - start, z
+                )
+            elif timeInterval is not None:
+                now = time.time()
+                if now - lastYield >= timeInterval:
+                    lastYield = now
+                    yield self.coverageUpdate(
+                        trials, numberSuccesses, now - start, z
+                    )
+
+    def booleanCoverage(self, T, interval, timeInterval, z, start):
+        """
+        The trials of coverageStream for an atom-free formula, vectorized.
+
+        A point of clause i is a Boolean assignment drawn from the literal
+        weights with the literals of i forced; the reals never matter, so
+        none are drawn. Points are drawn in batches as packed bit rows, and
+        the clause checks of every point (see booleanTrials) are run on the
+        whole batch at once. The run has the same distribution as the
+        trial-by-trial loop, but not the same random draws. Updates come at
+        the same trial counts as there.
+        """
+        batchSize = self.booleanBatchSize()
+        boolWeights = self.weightFunction.boolWeights
+
+        trials = 0
+        successes = 0
+        nextUpdate = min(interval, T) if interval else T
+        lastYield = time.time()
+        while trials < T:
+            count = min(batchSize, T - trials)
+            with self.metrics.timer("boolean_batches"):
+                clauses = self.clauseSelector.sample_many(
+                    count, self.rngs["clauses"]
+                )
+                bits = pack_bool_rows(
+                    self.rngs["bools"].uniform(size=(count, self.nbBools))
+                    < boolWeights,
+                    self.nbBoolWords,
+                )
+                bits = (bits | self.boolPos[clauses]) & ~self.boolNeg[clauses]
+                # Trial at which every point gets its success
+                ends = trials + np.cumsum(self.booleanTrials(bits))
+
+            while nextUpdate is not None and nextUpdate <= min(ends[-1], T):
+                lastYield = time.time()
+                yield self.coverageUpdate(
+                    nextUpdate,
+                    successes
+                    + int(np.searchsorted(ends, nextUpdate, side="right")),
+                    lastYield - start,
+                    z,
+                )
+                nextUpdate = (
+                    min(nextUpdate + interval, T)
+                    if interval and nextUpdate < T
+                    else None
+                )
+
+            done = int(np.searchsorted(ends, T, side="right"))
+            successes += done
+            previous = trials
+            trials = int(min(ends[-1], T))
+            self.metrics.count("trials", trials - previous)
+            self.metrics.count("successes", done)
+            if timeInterval is not None and trials < T:
+                now = time.time()
+                if now - lastYield >= timeInterval:
+                    lastYield = now
+                    yield self.coverageUpdate(
+                        trials, successes, now - start, z
+                    )
+
+    def booleanBatchSize(self):
+        """Points per batch of booleanCoverage."""
+        return max(
+            1,
+            min(
+                BOOLEAN_BATCH,
+                BOOLEAN_BATCH_CELLS // (BOOLEAN_CHECKS * self.nbBoolWords),
+            ),
+        )
+
+    def booleanTrials(self, bits):
+        """
+        Trials spent on every point of a batch of packed assignments: the
+        uniformly drawn clause checks up to and including its first
+        success. Checks are drawn in blocks per point, the blocks doubling
+        in width for the points still without a success.
+
+        Returns:
+            The trial counts, one per row of bits
+        """
+        spent = np.zeros(len(bits), dtype=np.int64)
+        pending = np.arange(len(bits))
+        width = BOOLEAN_CHECKS
+        while len(pending):
+            checks = self.activeClauses[
+                self.rngs["checks"].randint(
+                    self.nbClauses, size=(len(pending), width)
+                )
+            ]
+            ok = bool_part_sat(
+                bits[pending][:, None, :],
+                self.boolPos[checks],
+                self.boolNeg[checks],
+            )
+            hit = ok.any(axis=1)
+            spent[pending[hit]] += ok[hit].argmax(axis=1) + 1
+            spent[pending[~hit]] += width
+            pending = pending[~hit]
+            width = max(
+                1,
+                min(
+                    2 * width,
+                    BOOLEAN_BATCH_CELLS
+                    // (max(len(pending), 1) * self.nbBoolWords),
+                ),
+            )
+        return spent
+
+    def writeCheckpoint(
+        self, path, epsilon, delta, trials, successes, point, elapsed
+    ):
+        arrays = {
+            "epsilon": epsilon,
+            "delta": delta,
+            "trials": trials,
+            "successes": successes,
+            "elapsed": elapsed,
+            "has_point": point is not None,
+            "point_bools": (
+                point[0] if point is not None else np.zeros(0, np.uint64)
+            ),
+            "point_reals": point[1] if point is not None else np.zeros(0),
+            "last_sampled": self.lastSampled,
+            "clause_weights": self.clauseWeights,
+            # The clauses the run samples from, after any edits
+            "formula_fingerprint": np.array(self.formula.fingerprint()),
+            "active_clauses": self.activeClauses[: self.nbClauses],
+        }
+        arrays.update(pack_streams(self.rngs))
+        write_checkpoint(path, arrays)
+
+    def restoreCheckpoint(self, path, epsilon, delta):
+        arrays = read_checkpoint(path)
+        if float(arrays["epsilon"]) != epsilon or float(
+            arrays["delta"]
+        ) != delta:
+            raise ValueError(
+                "Checkpoint was taken with epsilon={}, delta={}".format(
+                    float(arrays["epsilon"]), float(arrays["delta"])
+                )
+            )
+        if str(arrays["formula_fingerprint"]) != self.formula.fingerprint():
+            raise ValueError("Checkpoint does not match this formula")
+        active = arrays["active_clauses"]
+        live = self.activeClauses[: self.nbClauses]
+        if not np.array_equal(np.sort(active), np.sort(live)):
+            raise ValueError("Checkpoint was taken with other live clauses")
+
+        # The live clauses in the order of the run, so that clause draws
+        # continue as they would have
+        self.activeClauses[: self.nbClauses] = active
+        self.activePos[active] = np.arange(self.nbClauses)
+        self.lastSampled = arrays["last_sampled"].copy()
+        point = None
+        if bool(arrays["has_point"]):
+            point = (arrays["point_bools"], arrays["point_reals"])
+        restore_streams(self.rngs, arrays)
+
         return (
-            T
-            * self.universeDisjointWeightSum
-            / (self.nbClauses * numberSuccesses)
+            int(arrays["trials"]),
+            int(arrays["successes"]),
+            point,
+            float(arrays["elapsed"]),
+        )
+
+    @classmethod
+    def fromCheckpoint(
+        cls, path, clauseList, nbBools, universeReals, weightFunction
+    ):
+        """Rebuild a solver, reusing the clause weights stored in path."""
+        arrays = read_checkpoint(path)
+        return cls(
+            clauseList,
+            nbBools,
+            universeReals,
+            weightFunction,
+            clauseWeights=arrays["clause_weights"],
+        )
+
+    def resumeCoverage(self, path, epsilon, delta, progress=True):
+        """Finish a checkpointed simpleCoverage run and return its estimate."""
+        update = None
+        for update in self.coverageStream(
+            epsilon,
+            delta,
+            interval=0,
+            progress=progress,
+            checkpointPath=path,
+            resume=True,
+        ):
+            pass
+        return update["estimate"]
+
+    def save(self, path):
+        """
+        Write the compiled solver to path, so that load can skip the clause
+        weights, start points and bounding boxes. The file is a binary
+        instance (see utils.instance_io) with the solver state added: the
+        clause weights, the hit-and-run chain states (lastSampled), the
+        bounding boxes, the learned clause check statistics, the live
+        clauses after edits and the random streams. Constraint matrices
+        are built on demand from the formula, so none are stored, but the
+        fingerprint of the instance is (see load). Written atomically as an
+        uncompressed npz, which load can memory-map.
+        """
+        instance = Instance(
+            self.formula, self.universeReals, self.weightFunction
+        )
+        arrays = instance_arrays(instance)
+        state = {
+            "version": SOLVER_VERSION,
+            "fingerprint": instance.fingerprint(),
+            "nbClauses": self.nbClauses,
+            "edited": self.edited,
+            "samplingMode": self.samplingMode,
+            "latteBudget": self.latteBudget,
+            "fallbackSamples": self.fallbackSamples,
+            "latteFallbacks": {
+                str(idx): {key: float(x) for key, x in fallback.items()}
+                for idx, fallback in self.latteFallbacks.items()
+            },
+            "clauseWeightSeconds": self.clauseWeightSeconds,
+            "seed": {
+                "entropy": self.seedSequence.entropy,
+                "spawnKey": list(self.seedSequence.spawn_key),
+                "poolSize": self.seedSequence.pool_size,
+                "children": self.seedSequence.n_children_spawned,
+            },
+        }
+        arrays["solver"] = np.array(json.dumps(state))
+        arrays["clause_weights"] = self.clauseWeights
+        arrays["weight_sum"] = np.asarray(self.universeDisjointWeightSum)
+        arrays["last_sampled"] = self.lastSampled
+        arrays["active_clauses"] = self.activeClauses
+        arrays["active_pos"] = self.activePos
+        for key, value in self.clauseBoxes.toArrays().items():
+            arrays["box_" + key] = value
+        for key, value in self.clauseChecker.getState().items():
+            arrays["checker_" + key] = value
+        arrays.update(pack_streams(self.rngs))
+        write_npz(path, arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True, metrics=None, fingerprint=None):
+        """
+        Rebuild a solver written by save without computing anything again,
+        so that sampling can start right away. The random streams and the
+        hit-and-run chains continue where the saved solver left them.
+
+        Args:
+            path: File written by save
+            mmap: Map the arrays instead of reading them. The maps are
+                copy-on-write: the solver may change them (sampling,
+                edits), the file never changes.
+            metrics: As for the constructor
+            fingerprint: Fingerprint of the instance the solver is meant
+                for (utils.instance_io.Instance.fingerprint), or None; a
+                solver saved for another instance raises ValueError
+
+        Returns:
+            The solver.
+        """
+        arrays = read_npz(path, mmap, writable=True)
+        if "solver" not in arrays:
+            raise ValueError("Not a saved solver: " + path)
+        state = json.loads(str(arrays["solver"]))
+        if state.get("version") != SOLVER_VERSION:
+            raise ValueError("Unsupported solver version in " + path)
+        if fingerprint is not None and state["fingerprint"] != fingerprint:
+            raise ValueError("Saved solver is for another instance: " + path)
+        instance = instance_from_arrays(arrays)
+
+        solver = cls.__new__(cls)
+        solver.metrics = NULL_METRICS if metrics is None else metrics
+        solver.nbBools = instance.formula.nbBools
+        solver.universeReals = instance.universeReals
+        solver.nbReals = instance.universeReals.nbReals
+        solver.nbVariables = solver.nbBools + solver.nbReals
+        solver.weightFunction = instance.weightFunction
+
+        seed = state["seed"]
+        solver.seedSequence = np.random.SeedSequence(
+            seed["entropy"],
+            spawn_key=tuple(seed["spawnKey"]),
+            pool_size=seed["poolSize"],
+            n_children_spawned=seed["children"],
+        )
+        # Placeholder streams, set to the saved states
+        solver.rngs = spawn_streams(np.random.SeedSequence(0))
+        restore_streams(solver.rngs, arrays)
+
+        solver.formula = instance.formula
+        solver.nbClauses = state["nbClauses"]
+        solver.compileClauses()
+        solver.activeClauses = arrays["active_clauses"]
+        solver.activePos = arrays["active_pos"]
+        solver.edited = state["edited"]
+
+        solver.samplingMode = state["samplingMode"]
+        solver.boolStream = None
+        solver.directions = None
+
+        solver.latteBudget = state["latteBudget"]
+        solver.fallbackSamples = state["fallbackSamples"]
+        solver.latteFallbacks = {
+            int(idx): fallback
+            for idx, fallback in state["latteFallbacks"].items()
+        }
+        solver.clauseWeightSeconds = state["clauseWeightSeconds"]
+        solver.universeWeightValue = None
+        solver.lastRoute = None
+
+        solver.setClauseWeights(arrays["clause_weights"])
+        # The running sum of an edited solver, not a fresh one
+        solver.universeDisjointWeightSum = arrays["weight_sum"][()]
+        solver.lastSampled = arrays["last_sampled"]
+        solver.clauseBoxes = BoxIndex.fromArrays(
+            {key: arrays["box_" + key] for key in ["lower", "upper", "tol"]}
+        )
+        solver.clauseChecker = ClauseChecker(
+            solver.formula, solver.boolPos, solver.boolNeg, solver.clauseBoxes
+        )
+        solver.clauseChecker.setState(
+            {
+                key: arrays["checker_" + key]
+                for key in ["attempts", "failures"]
+            }
+        )
+        return solver
+
+    def coverageUpdate(self, trials, successes, elapsed, z):
+        scale = self.universeDisjointWeightSum / self.nbClauses
+
+        # Wilson score interval for the success rate
+        rate = successes / trials
+        denom = 1 + z**2 / trials
+        center = (rate + z**2 / (2 * trials)) / denom
+        halfWidth = (
+            z
+            * np.sqrt(rate * (1 - rate) / trials + z**2 / (4 * trials**2))
+            / denom
+        )
+        rateLow = max(center - halfWidth, 0.0)
+        rateHigh = min(center + halfWidth, 1.0)
+
+        return {
+            "estimate": (
+                trials * scale / successes if successes > 0 else None
+            ),
+            "trials": trials,
+            "successes": successes,
+            "elapsed": elapsed,
+            "interval": (
+                scale / rateHigh,
+                scale / rateLow if rateLow > 0 else float("inf"),
+            ),
+        }
+
+    def medianCoverage(
+        self,
+        epsilon,
+        delta,
+        nbWorkers=None,
+        replicaDelta=0.25,
+        mode="random",
+    ):
+        """
+        Median-of-estimates amplification of simpleCoverage.
+
+        Instead of paying log(8 / delta) inside one long run, k independent
+        replicas are run at the constant confidence level replicaDelta and
+        their median is returned. Each replica is within (1 +- epsilon) with
+        probability 1 - replicaDelta, so by Hoeffding the median fails with
+        probability at most exp(-2k(1/2 - replicaDelta)^2); k is picked to
+        make that at most delta. Replicas run in separate processes, each
+        from this solver's hit-and-run chains as they are, so the result
+        does not depend on nbWorkers and the solver is left unchanged.
+
+        Args:
+            epsilon: Approximation parameter
+            delta: Confidence parameter of the median
+            nbWorkers: Number of worker processes (None: one per CPU,
+                1: run the replicas in this process)
+            replicaDelta: Confidence parameter of every replica
+            mode: Sampling mode of the replicas (see SAMPLING_MODES)
+
+        Returns:
+            (estimate, replicaEstimates): The median and the estimate of
+            every replica, in replica order
+        """
+        k = int(
+            np.ceil(np.log(1 / delta) / (2 * (0.5 - replicaDelta) ** 2))
+        )
+        k += 1 - k % 2  # Odd, so that the median is one of the replicas
+
+        seeds = self.seedSequence.spawn(k)
+        estimates = self.runReplicas(
+            epsilon, replicaDelta, seeds, mode, nbWorkers
         )
+        return float(np.median(estimates)), estimates
+
+    def samplingModeVariance(
+        self,
+        epsilon,
+        delta,
+        modes=tuple(SAMPLING_MODES),
+        nbReplicas=16,
+        nbWorkers=None,
+    ):
+        """
+        Empirical mean and variance of simpleCoverage under every sampling
+        mode, from nbReplicas independent replicas per mode.
+
+        Returns:
+            dict: mode -> {"mean", "variance", "estimates"}
+        """
+        report = {}
+        for mode in modes:
+            seeds = self.seedSequence.spawn(nbReplicas)
+            estimates = self.runReplicas(
+                epsilon, delta, seeds, mode, nbWorkers
+            )
+            report[mode] = {
+                "mean": float(np.mean(estimates)),
+                "variance": float(np.var(estimates, ddof=1)),
+                "estimates": estimates,
+            }
+        return report
+
+    def runReplicas(self, epsilon, delta, seeds, mode, nbWorkers):
+        k = len(seeds)
+        if nbWorkers == 1:
+            estimates = [
+                _runReplica(self, epsilon, delta, seed, mode)
+                for seed in seeds
+            ]
+        else:
+            # The solver is shipped once per worker, not once per replica
+            with ProcessPoolExecutor(
+                max_workers=nbWorkers,
+                initializer=_initReplicaWorker,
+                initargs=(self,),
+            ) as pool:
+                estimates = list(
+                    pool.map(
+                        _runReplica,
+                        [None] * k,
+                        [epsilon] * k,
+                        [delta] * k,
+                        seeds,
+                        [mode] * k,
+                    )
+                )
+        return [float(x) for x in estimates]
+
+
+_workerSolver = None
+
+
+def _initReplicaWorker(solver):
+    global _workerSolver
+    _workerSolver = solver
+
+
+def _runReplica(solver, epsilon, delta, seed, mode="random"):
+    # Every replica starts from the solver's hit-and-run chains and check
+    # statistics as they were, whichever replicas ran before it in this
+    # process, and leaves them (and the random streams) as they were
+    if solver is None:
+        solver = _workerSolver
+    lastSampled = solver.lastSampled.copy()
+    checkerState = solver.clauseChecker.getState()
+    seedSequence, rngs = solver.seedSequence, solver.rngs
+    try:
+        solver.reseed(seed)
+        return solver.simpleCoverage(
+            epsilon, delta, progress=False, mode=mode
+        )
+    finally:
+        solver.lastSampled = lastSampled
+        solver.clauseChecker.setState(checkerState)
+        solver.seedSequence, solver.rngs = seedSequence, rngs
+
+
+def _count_cliques(neighbours, limit):
+    """
+    Number of non-empty cliques of a graph given as neighbour bitmasks,
+    counted up to just past limit.
+    """
+    stack = [
+        mask >> (k + 1) << (k + 1) for k, mask in enumerate(neighbours)
+    ]
+    count = len(stack)
+    while stack and count <= limit:
+        candidates = stack.pop()
+        while candidates and count <= limit:
+            j = candidates.bit_length() - 1
+            candidates &= ~(1 << j)
+            count += 1
+            stack.append(candidates & neighbours[j])
+    return count
@@ -0,0 +1,184 @@
+import unittest
+import json
+import os
+import stat
+import tempfile
+import time
+from unittest import mock
+from utils import run_latte
+from utils.batch import (
+    read_instances,
+    completed_ids,
+    run_batch,
+    solve_instance,
+)
+
+
+def boolean_instance(id):
+    """a OR b with P(a) = 0.6, P(b) = 0.8 and a dummy real; WMI is 0.92."""
+    return {
+        "id": id,
+        "formula": [[0], [1]],
+        "nbReals": 1,
+        "nbBools": 2,
+        "upperBound": 1,
+        "weightFunction": {"monomials": [[1, [0]]], "boolWeights": [0.6, 0.8]},
+    }
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.instances = os.path.join(self.dir.name, "instances.jsonl")
+        self.results = os.path.join(self.dir.name, "results.jsonl")
+        lines = [
+            boolean_instance("a"),
+            boolean_instance("b"),
+            {"id": "bad", "formula": "[[0]]", "nbReals": 1, "nbBools": 1},
+        ]
+        with open(self.instances, "w") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def read_results(self):
+        with open(self.results) as f:
+            return {r["id"]: r for r in map(json.loads, f)}
+
+    def test_list_form_instances(self):
+        with open(self.instances, "a") as f:
+            f.write("\n" + json.dumps([[[0]], 1, 1, 1, 1, 1]) + "\n")
+        instances = list(read_instances(self.instances))
+        self.assertEqual(len(instances), 4)
+        self.assertEqual(instances[-1]["id"], 4)
+        self.assertEqual(instances[-1]["nbBools"], 1)
+
+    def test_boolean_instance_without_weight_function(self):
+        instance = {
+            "id": "c",
+            "formula": [[0], [1]],
+            "nbReals": 0,
+            "nbBools": 2,
+        }
+        result = solve_instance(instance, 0.25, 0.15, seed=1)
+
+        self.assertEqual(result["status"], "ok")
+        self.assertGreater(result["estimate"], 0)
+
+    def test_metrics_only_when_asked(self):
+        instance = boolean_instance("a")
+        result = solve_instance(instance, 0.25, 0.15)
+        self.assertNotIn("metrics", result)
+
+        result = solve_instance(instance, 0.25, 0.15, metrics=True)
+        counters = result["metrics"]["counters"]
+        self.assertEqual(counters["trials"], result["trials"])
+
+    def test_batch_results(self):
+        counts = run_batch(
+            self.instances, self.results, 0.25, 0.15, nbWorkers=2
+        )
+        self.assertEqual(counts, {"ok": 2, "error": 1})
+
+        results = self.read_results()
+        for id in ["a", "b"]:
+            self.assertEqual(results[id]["status"], "ok")
+            self.assertAlmostEqual(results[id]["estimate"], 0.92, delta=0.1)
+            self.assertGreater(results[id]["trials"], 0)
+            self.assertIsNotNone(results[id]["total_time"])
+        self.assertIn("ValueError", results["bad"]["error"])
+
+    def test_restart_skips_completed(self):
+        run_batch(self.instances, self.results, 0.25, 0.15, nbWorkers=1)
+        with open(self.results) as f:
+            lines = f.readlines()
+        # Simulate a run interrupted while writing the last result
+        with open(self.results, "w") as f:
+            f.writelines(lines[:-1])
+            f.write(lines[-1][:10])
+        lost = json.loads(lines[-1])["id"]
+
+        self.assertEqual(len(completed_ids(self.results)), 2)
+        counts = run_batch(
+            self.instances, self.results, 0.25, 0.15, nbWorkers=1
+        )
+        self.assertEqual(sum(counts.values()), 1)
+        self.assertIn(lost, self.read_results())
+
+    def test_restart_retries_failed(self):
+        with open(self.results, "w") as f:
+            for id, status in [("a", "ok"), ("b", "killed")]:
+                f.write(json.dumps({"id": id, "status": status}) + "\n")
+
+        self.assertEqual(completed_ids(self.results), {"a"})
+        counts = run_batch(
+            self.instances, self.results, 0.25, 0.15, nbWorkers=1
+        )
+        self.assertEqual(counts, {"ok": 1, "error": 1})
+        self.assertEqual(self.read_results()["b"]["status"], "ok")
+
+    def test_timeout_keeps_partial_estimate(self):
+        instance = boolean_instance("slow")
+        instance["epsilon"] = instance["delta"] = 0.001
+        with open(self.instances, "w") as f:
+            f.write(json.dumps(instance) + "\n")
+
+        counts = run_batch(
+            self.instances, self.results, 0.25, 0.15, timeout=1.0
+        )
+        self.assertEqual(counts, {"timeout": 1})
+        result = self.read_results()["slow"]
+        self.assertGreater(result["trials"], 0)
+        self.assertLess(result["total_time"], 3.0)
+
+    def test_kill_takes_latte_down(self):
+        # A LattE that never finishes and records its pid
+        binary = os.path.join(self.dir.name, "integrate")
+        pidFile = os.path.join(self.dir.name, "latte.pid")
+        with open(binary, "w") as f:
+            f.write("#!/bin/sh\necho $$ > " + pidFile + "\nexec sleep 97\n")
+        os.chmod(binary, os.stat(binary).st_mode | stat.S_IEXEC)
+        scratch = os.path.join(self.dir.name, "scratch")
+        os.mkdir(scratch)
+
+        # Two reals linked by one constraint, so LattE is called
+        instance = {
+            "id": "stuck",
+            "formula": [[[[0, 1], [1, 1], ["<=", 1]]]],
+            "nbReals": 2,
+            "nbBools": 0,
+            "weightFunction": {"monomials": [[1, [0, 0]]], "boolWeights": []},
+        }
+        with open(self.instances, "w") as f:
+            f.write(json.dumps(instance) + "\n")
+        env = {
+            run_latte.LATTE_BINARY_ENV: binary,
+            run_latte.SCRATCH_DIR_ENV: scratch,
+        }
+        with mock.patch.dict(os.environ, env):
+            counts = run_batch(
+                self.instances,
+                self.results,
+                0.25,
+                0.15,
+                timeout=0.5,
+                killGrace=0.5,
+            )
+
+        self.assertEqual(counts, {"killed": 1})
+        self.assertEqual(os.listdir(scratch), [])
+        with open(pidFile) as f:
+            pid = f.read().strip()
+        # LattE is gone (or a zombie waiting for init to reap it)
+        time.sleep(0.2)
+        try:
+            with open("/proc/" + pid + "/stat") as f:
+                self.assertEqual(f.read().split()[2], "Z")
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
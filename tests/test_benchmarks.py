@@ -0,0 +1,289 @@
+import contextlib
+import io
+import unittest
+import numpy as np
+from benchmarks.accuracy import (
+    INSTANCE,
+    fastest_meeting,
+    make_instance,
+    pareto_front,
+    run_config,
+)
+from benchmarks.common import environment
+from benchmarks.compare import (
+    compare_results,
+    direction,
+    environment_mismatches,
+    missing_cases,
+)
+from benchmarks.load_test import load_metrics, make_request
+from benchmarks.memory import PHASES, attribute_bytes, deep_sizeof
+from benchmarks.memory import run_case as run_memory_case
+from benchmarks.micro import QUICK_GRIDS, make_call, measure, micro_cases
+from benchmarks.scaling import (
+    BASE_CASE,
+    QUICK_SWEEPS,
+    case_seed,
+    run_case,
+    scaling_cases,
+)
+
+
+def results(cases, **env):
+    return {
+        "suite": "scaling",
+        "environment": env,
+        "cases": {
+            name: {"params": {}, "metrics": metrics}
+            for name, metrics in cases.items()
+        },
+    }
+
+
+class TestScalingCases(unittest.TestCase):
+    def test_one_parameter_at_a_time(self):
+        cases = scaling_cases(QUICK_SWEEPS)
+        self.assertEqual(cases["base"], BASE_CASE)
+        self.assertEqual(cases["nbClauses=40"]["nbClauses"], 40)
+        width = cases["width=3-5"]
+        self.assertEqual((width["minCWidth"], width["maxCWidth"]), (3, 5))
+        for name, params in cases.items():
+            changed = [k for k in params if params[k] != BASE_CASE[k]]
+            self.assertLessEqual(len(changed), 2, name)
+
+    def test_seeds_depend_on_the_name_only(self):
+        self.assertEqual(case_seed("base"), case_seed("base"))
+        self.assertNotEqual(case_seed("base"), case_seed("nbReals=2"))
+        self.assertEqual(case_seed("base", 5), case_seed("base") + 5)
+
+    def test_run_case(self):
+        params = dict(BASE_CASE, nbClauses=6, nbReals=2, nbBools=4)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            metrics = run_case(params, 0, 0.5, 0.2, 50)
+        self.assertEqual(metrics["trials"], 50)
+        self.assertEqual(metrics["count.trials"], 50)
+        self.assertEqual(metrics["count.chebyshev_lp"], 6)
+        self.assertGreater(metrics["peak_rss_bytes"], 0)
+        self.assertIn("latte_calls", metrics)
+
+
+class TestCompare(unittest.TestCase):
+    def test_directions(self):
+        self.assertEqual(direction("setup_seconds"), 1)
+        self.assertEqual(direction("peak_rss_bytes"), 1)
+        self.assertEqual(direction("trials_per_second"), -1)
+        self.assertEqual(direction("trials"), 0)
+
+    def test_flags_regressions_only(self):
+        base = results(
+            {
+                "a": {
+                    "setup_seconds": 1.0,
+                    "hrep_seconds": 0.01,
+                    "trials_per_second": 100.0,
+                    "peak_rss_bytes": 100 << 20,
+                    "trials": 10,
+                },
+                "b": {"setup_seconds": 1.0},
+            }
+        )
+        new = results(
+            {
+                "a": {
+                    # Slower, but below the absolute floor
+                    "hrep_seconds": 0.03,
+                    "setup_seconds": 1.5,
+                    "trials_per_second": 70.0,
+                    "peak_rss_bytes": 90 << 20,
+                    "trials": 20,
+                }
+            }
+        )
+        rows = compare_results(base, new, threshold=0.2)
+        flagged = {row["metric"] for row in rows if row["regression"]}
+        self.assertEqual(flagged, {"setup_seconds", "trials_per_second"})
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(rows[0]["regression"])
+        self.assertEqual(missing_cases(base, new), ["b"])
+
+    def test_environment_mismatches(self):
+        self.assertIn("latte", environment())
+        base = results({}, cpus=8, latte=True, python="3.11")
+        self.assertEqual(
+            environment_mismatches(
+                base, results({}, cpus=8, latte=True, python="3.12")
+            ),
+            [],
+        )
+        self.assertEqual(
+            environment_mismatches(base, results({}, cpus=1, latte=False)),
+            [("cpus", 8, 1), ("latte", True, False)],
+        )
+        # Older result files did not record LattE
+        self.assertEqual(
+            environment_mismatches(results({}, cpus=8), base),
+            [("latte", None, True)],
+        )
+
+
+class TestMicro(unittest.TestCase):
+    def test_cases(self):
+        cases = micro_cases(QUICK_GRIDS, only=["sample"])
+        self.assertEqual(
+            sorted(cases),
+            [
+                "sample[dim=2,facets=16]",
+                "sample[dim=2,facets=4]",
+                "sample[dim=8,facets=16]",
+                "sample[dim=8,facets=4]",
+            ],
+        )
+        self.assertEqual(
+            cases["sample[dim=8,facets=4]"],
+            ("sample", {"dim": 8, "facets": 4}),
+        )
+
+    def test_every_benchmark_runs(self):
+        params = {"dim": 3, "facets": 4, "monomials": 2, "degree": 2}
+        for name in QUICK_GRIDS:
+            with self.subTest(benchmark=name):
+                metrics = measure(
+                    make_call(name, params), minTime=0, minCalls=5, warmup=1
+                )
+                self.assertEqual(metrics["calls"], 5)
+                self.assertLessEqual(
+                    metrics["p50_seconds"], metrics["p99_seconds"]
+                )
+
+
+class Holder:
+    pass
+
+
+class TestMemory(unittest.TestCase):
+    def test_deep_sizeof(self):
+        array = np.zeros(1000)
+        self.assertGreaterEqual(deep_sizeof(array, set()), 8000)
+        # A view is charged for the array it comes from, once
+        self.assertGreaterEqual(deep_sizeof([array[:10]], set()), 8000)
+        self.assertLess(deep_sizeof([array, array[:10]], set()), 16000)
+
+    def test_shared_attributes_counted_once(self):
+        holder = Holder()
+        holder.a = np.zeros(1000)
+        holder.b = holder.a
+        holder.c = [holder.a, np.zeros(10)]
+        sizes = attribute_bytes(holder)
+        self.assertGreaterEqual(sizes["a"], 8000)
+        self.assertEqual(sizes["b"], 0)
+        self.assertLess(sizes["c"], 8000)
+
+    def test_run_case(self):
+        params = dict(BASE_CASE, nbClauses=6, nbReals=2, nbBools=4)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            metrics = run_memory_case(params, 0, 0.5, 0.2, 20)
+        self.assertEqual(metrics["trials"], 20)
+        for phase in PHASES:
+            for metric in ["traced_peak", "traced_retained", "rss_peak"]:
+                name = "phase." + phase + "." + metric + "_bytes"
+                self.assertIn(name, metrics)
+            self.assertGreater(
+                metrics["phase." + phase + ".traced_peak_bytes"], 0
+            )
+        self.assertGreater(metrics["attr.formula_bytes"], 0)
+        self.assertGreater(metrics["attr.lastSampled_bytes"], 6 * 2 * 8)
+        self.assertEqual(
+            metrics["solver_bytes"],
+            sum(v for k, v in metrics.items() if k.startswith("attr.")),
+        )
+
+
+def accuracy_cases(points):
+    return {
+        name: {
+            "metrics": {
+                "mean_seconds": seconds,
+                "p90_rel_error": error,
+                "within_target": within,
+            }
+        }
+        for name, (seconds, error, within) in points.items()
+    }
+
+
+class TestAccuracy(unittest.TestCase):
+    def test_pareto_front(self):
+        cases = accuracy_cases(
+            {
+                "fast": (1.0, 0.3, 0.5),
+                "slow": (4.0, 0.05, 1.0),
+                "dominated": (3.0, 0.3, 0.9),
+                "middle": (2.0, 0.1, 0.9),
+            }
+        )
+        self.assertEqual(pareto_front(cases), {"fast", "slow", "middle"})
+        self.assertEqual(fastest_meeting(cases, 0.2), "middle")
+        self.assertEqual(fastest_meeting(cases, 0.05), "slow")
+        self.assertIsNone(fastest_meeting(accuracy_cases({}), 0.1))
+
+    def test_run_config(self):
+        instance = make_instance(dict(INSTANCE, nbClauses=2, nbReals=1), 0)
+        self.assertGreater(instance[4], 0)
+        with contextlib.redirect_stderr(io.StringIO()):
+            readings = run_config(instance, "random", 1.5, 0.5, [0.5, 1.0], 0)
+        self.assertEqual(sorted(readings), [0.5, 1.0])
+        self.assertLess(readings[0.5][0], readings[1.0][0])
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_make_request(self):
+        request = make_request(dict(BASE_CASE, nbClauses=4), 0)
+        self.assertEqual(len(request["formula"]), 4)
+        self.assertEqual(
+            len(request["weightFunction"]["boolWeights"]),
+            BASE_CASE["nbBools"],
+        )
+
+    def test_load_metrics(self):
+        def snapshot(built, memory, batches, batched):
+            return {
+                "metrics": {
+                    "counters": {
+                        "cache.built": built,
+                        "cache.memory": memory,
+                        "batches": batches,
+                        "batched_requests": batched,
+                    }
+                }
+            }
+
+        results = [
+            {"status": "ok", "route": "exact"},
+            {"status": "ok", "route": "sampling"},
+            {"status": "error", "route": None},
+            {"status": "ok", "route": "exact"},
+        ]
+        metrics = load_metrics(
+            results,
+            [0.1, 0.2, 0.3, 0.4],
+            2.0,
+            snapshot(1, 0, 1, 1),
+            snapshot(2, 3, 3, 5),
+        )
+        self.assertEqual(metrics["requests"], 4)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertEqual(metrics["throughput_per_second"], 2.0)
+        self.assertEqual(metrics["route.exact"], 2)
+        self.assertEqual(metrics["service.cache.built"], 1)
+        self.assertEqual(metrics["service.cache.memory"], 3)
+        self.assertEqual(metrics["service.mean_batch_size"], 2.0)
+        self.assertAlmostEqual(metrics["latency.max_seconds"], 0.4)
+        self.assertEqual(direction("throughput_per_second"), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from utils.bool_masks import (
+    nb_words,
+    pack_bools,
+    pack_bool_rows,
+    unpack_bools,
+    compile_clause_masks,
+    bool_part_sat,
+)
+
+
+class TestBoolMasks(unittest.TestCase):
+    def test_pack_roundtrip(self):
+        np.random.seed(0)
+        for nbBools in [1, 63, 64, 65, 200]:
+            bools = np.random.uniform(size=nbBools) < 0.5
+            bits = pack_bools(bools, nb_words(nbBools))
+            self.assertEqual(bits.dtype, np.uint64)
+            self.assertEqual(len(bits), nb_words(nbBools))
+            np.testing.assert_array_equal(unpack_bools(bits, nbBools), bools)
+
+    def test_pack_rows(self):
+        np.random.seed(0)
+        for nbBools in [0, 5, 64, 130]:
+            bools = np.random.uniform(size=(7, nbBools)) < 0.5
+            rows = pack_bool_rows(bools, nb_words(nbBools))
+            self.assertEqual(rows.shape, (7, nb_words(nbBools)))
+            for row, packed in zip(bools, rows):
+                np.testing.assert_array_equal(
+                    packed, pack_bools(row, nb_words(nbBools))
+                )
+
+    def test_clause_masks_agree_with_literals(self):
+        np.random.seed(1)
+        nbBools = 130
+        nbVariables = nbBools + 2
+        clauses = []
+        for _ in range(50):
+            vars_ = np.random.choice(nbBools, size=4, replace=False)
+            negate = np.random.uniform(size=4) < 0.5
+            clause = [
+                int(v) + nbVariables * int(n) for v, n in zip(vars_, negate)
+            ]
+            clause.append([(nbBools, 1), ("<=", 5)])
+            clauses.append(clause)
+
+        pos, neg = compile_clause_masks(clauses, nbBools, nbVariables)
+
+        for _ in range(20):
+            bools = np.random.uniform(size=nbBools) < 0.5
+            bits = pack_bools(bools, nb_words(nbBools))
+            expected = [
+                all(
+                    bools[lit] if lit < nbVariables
+                    else not bools[lit - nbVariables]
+                    for lit in clause
+                    if type(lit) != list
+                )
+                for clause in clauses
+            ]
+            np.testing.assert_array_equal(
+                bool_part_sat(bits, pos, neg), expected
+            )
+            for idx in range(len(clauses)):
+                self.assertEqual(
+                    bool_part_sat(bits, pos[idx], neg[idx]), expected[idx]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
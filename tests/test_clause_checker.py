@@ -0,0 +1,121 @@
+import unittest
+import numpy as np
+from utils.clause_checker import ClauseChecker, CHECK_BOOLS, FIRST_ATOM
+from utils.bool_masks import nb_words, pack_bools
+from utils.compiled_formula import CompiledFormula
+from utils.spatial_index import BoxIndex
+
+
+class TestClauseChecker(unittest.TestCase):
+    def setUp(self):
+        # One Boolean, three reals in [0, 10]. The clause is
+        # b0 AND x0 + x1 + x2 <= 29 AND x0 <= 1
+        self.clauses = [
+            [
+                0,
+                [(1, 1), (2, 1), (3, 1), ("<=", 29)],
+                [(1, 1), ("<=", 1)],
+            ]
+        ]
+        formula = CompiledFormula.fromClauseList(self.clauses, 1, 3)
+        pos, neg = formula.boolMasks()
+        # A box that does not reject anything, to isolate the atoms
+        box = BoxIndex(np.zeros((1, 3)), np.full((1, 3), 10.0))
+        self.checker = ClauseChecker(
+            formula, pos, neg, box, refreshInterval=100
+        )
+
+    def test_matches_direct_evaluation(self):
+        np.random.seed(0)
+        for _ in range(1000):
+            bools = np.random.uniform(size=1) < 0.5
+            reals = np.random.uniform(0, 10, size=3)
+            expected = (
+                bools[0] and reals.sum() <= 29 and reals[0] <= 1
+            )
+            sol = (pack_bools(bools, nb_words(1)), reals)
+            self.assertEqual(self.checker.check(sol, 0), expected)
+
+    def test_selective_check_moves_first(self):
+        np.random.seed(0)
+        for _ in range(1000):
+            sol = (
+                pack_bools([True], nb_words(1)),
+                np.random.uniform(0, 10, size=3),
+            )
+            self.checker.check(sol, 0)
+
+        # x0 <= 1 rejects 90% of points at the cost of one coefficient,
+        # the Boolean always passes and the dense atom almost always passes
+        order = self.checker.orderOf(0)
+        self.assertEqual(order[0], FIRST_ATOM + 1)
+        self.assertLess(order.index(FIRST_ATOM + 1), order.index(CHECK_BOOLS))
+
+    def test_refresh_only_touches_checked_clauses(self):
+        clauses = self.clauses * 2
+        formula = CompiledFormula.fromClauseList(clauses, 1, 3)
+        pos, neg = formula.boolMasks()
+        box = BoxIndex(np.zeros((2, 3)), np.full((2, 3), 10.0))
+        checker = ClauseChecker(
+            formula, pos, neg, box, refreshInterval=100
+        )
+        initial = checker.orderOf(1)
+
+        np.random.seed(0)
+        for _ in range(1000):
+            sol = (
+                pack_bools([True], nb_words(1)),
+                np.random.uniform(0, 10, size=3),
+            )
+            checker.check(sol, 0)
+
+        self.assertEqual(checker.orderOf(0)[0], FIRST_ATOM + 1)
+        self.assertEqual(checker.orderOf(1), initial)
+
+    def test_refresh_of_unsorted_clauses(self):
+        # Clauses with different numbers of atoms, so a check order written
+        # to the slots of another clause changes the answer
+        rng = np.random.RandomState(0)
+        clauses = []
+        for _ in range(300):
+            atoms = [
+                [(int(v) + 1, float(rng.uniform(-1, 1))) for v in range(3)]
+                + [("<=", float(rng.uniform(-3, 3)))]
+                for _ in range(rng.randint(1, 4))
+            ]
+            clauses.append([0] + atoms)
+        formula = CompiledFormula.fromClauseList(clauses, 1, 3)
+        pos, neg = formula.boolMasks()
+        n = len(clauses)
+        box = BoxIndex(np.zeros((n, 3)), np.full((n, 3), 10.0))
+        checker = ClauseChecker(formula, pos, neg, box, refreshInterval=97)
+
+        def expected(bools, reals, clause):
+            for atom in clause[1:]:
+                total = sum(c * reals[v - 1] for v, c in atom[:-1])
+                if total > atom[-1][1]:
+                    return False
+            return bool(bools[0])
+
+        points = [
+            (rng.uniform(size=1) < 0.8, rng.uniform(0, 1, size=3))
+            for _ in range(400)
+        ]
+        for step in range(3):
+            for k, (bools, reals) in enumerate(points):
+                idx = (k * 7919) % n
+                sol = (pack_bools(bools, nb_words(1)), reals)
+                self.assertEqual(
+                    checker.check(sol, idx),
+                    expected(bools, reals, clauses[idx]),
+                )
+            checker.refreshOrders(rng.permutation(n)[: n // 2])
+            for idx in range(n):
+                self.assertEqual(
+                    sorted(checker.orderOf(idx)),
+                    list(range(FIRST_ATOM + len(clauses[idx]) - 1)),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+from utils.clause_selection import AliasTable, FenwickTree, StratifiedSelector
+
+
+class TestAliasTable(unittest.TestCase):
+    def test_alias_table_matches_weights(self):
+        np.random.seed(0)
+        weights = np.array([1.0, 0.0, 3.0, 6.0])
+        table = AliasTable(weights)
+
+        draws = table.sample_many(200000)
+        freqs = np.bincount(draws, minlength=len(weights)) / len(draws)
+
+        np.testing.assert_allclose(freqs, weights / weights.sum(), atol=0.01)
+        self.assertEqual(freqs[1], 0.0)
+
+    def test_alias_table_single_draw(self):
+        np.random.seed(0)
+        table = AliasTable([0.0, 2.0, 0.0])
+        for _ in range(100):
+            self.assertEqual(table.sample(), 1)
+
+
+class TestFenwickTree(unittest.TestCase):
+    def test_prefix_sums(self):
+        weights = [2.0, 1.0, 4.0, 0.5, 3.0]
+        tree = FenwickTree(weights)
+        for i in range(len(weights) + 1):
+            self.assertAlmostEqual(tree.prefix_sum(i), sum(weights[:i]))
+        self.assertAlmostEqual(tree.total, sum(weights))
+
+    def test_update_and_append(self):
+        tree = FenwickTree([1.0, 1.0, 1.0])
+        tree.update(1, 0.0)
+        idx = tree.append(5.0)
+        tree.append(2.0)
+
+        self.assertEqual(idx, 3)
+        self.assertEqual(tree.size, 5)
+        self.assertAlmostEqual(tree.total, 9.0)
+        self.assertAlmostEqual(tree.prefix_sum(4), 7.0)
+
+    def test_appends_grow_the_buffer(self):
+        np.random.seed(0)
+        weights = np.random.uniform(0, 1, size=37)
+        tree = FenwickTree(weights[:3])
+        for weight in weights[3:]:
+            tree.append(weight)
+
+        self.assertEqual(tree.size, 37)
+        self.assertEqual(tree.capacity, 64)
+        for i in range(len(weights) + 1):
+            self.assertAlmostEqual(tree.prefix_sum(i), weights[:i].sum())
+        self.assertAlmostEqual(tree.total, weights.sum())
+        self.assertLess(tree.sample_many(1000).max(), 37)
+
+    def test_removed_clause_is_never_drawn(self):
+        np.random.seed(0)
+        tree = FenwickTree([1.0, 2.0, 1.0])
+        tree.update(1, 0.0)
+
+        draws = tree.sample_many(5000)
+        self.assertNotIn(1, draws)
+        freqs = np.bincount(draws, minlength=3) / len(draws)
+        self.assertAlmostEqual(freqs[0], 0.5, delta=0.03)
+
+
+class TestStratifiedSelector(unittest.TestCase):
+    def test_block_counts_are_proportional(self):
+        np.random.seed(0)
+        weights = np.array([1.0, 0.0, 3.0, 6.0])
+        selector = StratifiedSelector(weights, blockSize=100)
+
+        block = selector.sample_many(100)
+        counts = np.bincount(block, minlength=len(weights))
+
+        np.testing.assert_array_equal(counts, [10, 0, 30, 60])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import numpy as np
+from utils.exact_wmi import (
+    exact_clause_weights,
+    exact_wmi,
+    inclusion_exclusion,
+    polytope_integral,
+    simplex_integral,
+)
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+
+
+class TestExactIntegration(unittest.TestCase):
+    def test_simplex(self):
+        triangle = [[0, 0], [1, 0], [0, 1]]
+        self.assertAlmostEqual(simplex_integral(triangle, [[1, [0, 0]]]), 0.5)
+        self.assertAlmostEqual(
+            simplex_integral(triangle, [[1, [1, 0]]]), 1 / 6
+        )
+        # x^2 y: 2! 1! / 5!
+        self.assertAlmostEqual(
+            simplex_integral(triangle, [[3, [2, 1]]]), 3 * 2 / 120
+        )
+        self.assertAlmostEqual(
+            simplex_integral([[2], [5]], [[1, [2]]]), (125 - 8) / 3
+        )
+
+    def test_polytope(self):
+        universe = RealsUniverse(2)
+        # x + y <= 10 over [0, 10]^2, weight x * y
+        A = np.array([[1.0, 1.0]])
+        b = np.array([10.0])
+        self.assertAlmostEqual(
+            polytope_integral(A, b, [[1, [1, 1]]], universe), 10**4 / 24
+        )
+        # Empty and flat polytopes
+        A = np.array([[1.0, 0.0], [-1.0, 0.0]])
+        for b in [[3.0, -4.0], [3.0, -3.0]]:
+            self.assertEqual(
+                polytope_integral(A, np.array(b), [[1, [0, 0]]], universe), 0
+            )
+
+
+class TestExactWMI(unittest.TestCase):
+    def test_free_variables(self):
+        # Same formula as examples/four_variables_mixed.py
+        universe = RealsUniverse(4)
+        clause = [
+            [(0, 1), (">=", 2)],
+            [(0, 1), ("<=", 8)],
+            [(1, 1), (">=", 3)],
+            [(1, 1), ("<=", 7)],
+        ]
+        wf = WeightFunction([[1, [0, 0, 0, 0]]], np.zeros(0))
+        self.assertAlmostEqual(exact_wmi([clause], 0, universe, wf), 2400)
+
+    def test_inclusion_exclusion(self):
+        universe = RealsUniverse(1)
+        wf = WeightFunction([[1, [0]]], np.array([0.5, 0.25]))
+        # b0 and x <= 6, b1 and x >= 4, not b0 and x >= 8
+        clauses = [
+            [0, [(2, 1), ("<=", 6)]],
+            [1, [(2, 1), (">=", 4)]],
+            [3, [(2, 1), (">=", 8)]],
+        ]
+        # Per Boolean assignment (b0, b1): the measure of the union
+        expected = (
+            0.5 * 0.25 * 10  # b0 b1: [0, 6] u [4, 10]
+            + 0.5 * 0.75 * 6  # b0 ~b1: [0, 6]
+            + 0.5 * 0.25 * 6  # ~b0 b1: [4, 10] u [8, 10]
+            + 0.5 * 0.75 * 2  # ~b0 ~b1: [8, 10]
+        )
+        self.assertAlmostEqual(exact_wmi(clauses, 2, universe, wf), expected)
+        np.testing.assert_allclose(
+            exact_clause_weights(clauses, 2, universe, wf),
+            [0.5 * 6, 0.25 * 6, 0.5 * 2],
+        )
+
+    def test_matches_monte_carlo(self):
+        universe = RealsUniverse(2)
+        wf = WeightFunction([[-1, [1, 1]], [101, [0, 0]]], np.array([0.3]))
+        clauses = [
+            [0, [(1, 1), (2, 1), ("<=", 12)]],
+            [[(1, 1), (2, -1), (">=", 1)]],
+        ]
+        rng = np.random.RandomState(0)
+        x = rng.uniform(0, 10, size=(400000, 2))
+        b0 = rng.uniform(size=len(x)) < 0.3
+        inside = (b0 & (x.sum(axis=1) <= 12)) | (x[:, 0] - x[:, 1] >= 1)
+        weights = 101 - x[:, 0] * x[:, 1]
+        estimate = 100 * (inside * weights).mean()
+        self.assertAlmostEqual(
+            exact_wmi(clauses, 1, universe, wf) / estimate, 1, places=2
+        )
+
+    def test_neighbours(self):
+        # Finite sets: the sum is the size of their union
+        sets = [{0, 1, 2}, {2, 3}, {5, 6}, {1, 2, 7}]
+
+        def join(state, idx):
+            common = sets[idx] if state is None else state & sets[idx]
+            return (len(common), common) if common else None
+
+        self.assertEqual(inclusion_exclusion(len(sets), join, None), 7)
+        # {5, 6} meets no other set
+        neighbours = [0b1010, 0b1001, 0b0000, 0b0011]
+        self.assertEqual(
+            inclusion_exclusion(len(sets), join, None, neighbours), 7
+        )
+
+    def test_term_limit(self):
+        universe = RealsUniverse(1)
+        wf = WeightFunction([[1, [0]]], np.zeros(0))
+        clauses = [[[(0, 1), ("<=", 5 + k)]] for k in range(5)]
+        with self.assertRaises(ValueError):
+            exact_wmi(clauses, 0, universe, wf, maxTerms=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
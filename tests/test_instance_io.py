@@ -0,0 +1,124 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+import numpy as np
+from utils.compiled_formula import CompiledFormula
+from utils.bool_masks import compile_clause_masks
+from utils.instance_io import (
+    Instance,
+    load_instance,
+    read_binary_instance,
+    read_legacy_instance,
+    write_binary_instance,
+    write_json_instance,
+)
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+from generators.lra_gen import generateLRA
+
+
+def generate_formula(seed=0, nbBools=8, nbReals=4, nbClauses=20):
+    np.random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return generateLRA(
+            nbBools,
+            RealsUniverse(nbReals),
+            nbClauses,
+            2,
+            3,
+            avgLRAAtomLength=1,
+        )
+
+
+class TestCompiledFormula(unittest.TestCase):
+    def test_round_trip_and_masks(self):
+        clauseList = generate_formula()
+        formula = CompiledFormula.fromClauseList(clauseList, 8, 4)
+
+        self.assertEqual(formula.nbClauses, 20)
+        # Compiled clauses list their literals first; compare through JSON,
+        # which does not tell tuples from lists
+        def canonical(clause):
+            clause = json.loads(json.dumps(clause, default=int))
+            return [x for x in clause if type(x) != list] + [
+                x for x in clause if type(x) == list
+            ]
+
+        self.assertEqual(
+            [canonical(clause) for clause in formula.toClauseList()],
+            [canonical(clause) for clause in clauseList],
+        )
+
+        pos, neg = formula.boolMasks()
+        expectedPos, expectedNeg = compile_clause_masks(clauseList, 8, 12)
+        np.testing.assert_array_equal(pos, expectedPos)
+        np.testing.assert_array_equal(neg, expectedNeg)
+
+    def test_rejects_malformed_clauses(self):
+        with self.assertRaises(ValueError):
+            CompiledFormula.fromClauseList([[0, [[2, 1], ["<>", 1]]]], 2, 1)
+        with self.assertRaises(ValueError):
+            # Boolean literal of a variable that does not exist
+            CompiledFormula.fromClauseList([[2]], 2, 1)
+        with self.assertRaises(ValueError):
+            # Atom over a Boolean variable
+            CompiledFormula.fromClauseList([[[[1, 1], ["<=", 1]]]], 2, 1)
+
+
+class TestInstanceIO(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        formula = CompiledFormula.fromClauseList(generate_formula(), 8, 4)
+        wf = WeightFunction(
+            [[2, [1, 0, 0, 0]], [1, [0] * 4]], np.full(8, 0.5)
+        )
+        self.instance = Instance(
+            formula, RealsUniverse(4, 0, 5), wf, {"generator": "lra"}
+        )
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def assertSameInstance(self, loaded):
+        self.assertEqual(
+            loaded.formula.toClauseList(),
+            self.instance.formula.toClauseList(),
+        )
+        self.assertEqual(loaded.universeReals.upperBound, 5)
+        self.assertEqual(
+            loaded.weightFunction.f, self.instance.weightFunction.f
+        )
+        self.assertEqual(loaded.meta, {"generator": "lra"})
+
+    def test_json_round_trip(self):
+        path = os.path.join(self.dir.name, "instance.json")
+        write_json_instance(path, self.instance)
+        self.assertSameInstance(load_instance(path))
+
+    def test_binary_round_trip_is_memory_mapped(self):
+        path = os.path.join(self.dir.name, "instance.npz")
+        write_binary_instance(path, self.instance)
+
+        loaded = load_instance(path)
+        self.assertSameInstance(loaded)
+        self.assertIsInstance(loaded.formula.termCoefs, np.memmap)
+        self.assertSameInstance(read_binary_instance(path, mmap=False))
+
+    def test_legacy_format_is_not_evaluated(self):
+        path = os.path.join(self.dir.name, "instance.txt")
+        with open(path, "w") as f:
+            f.write(repr([repr([[0, [[2, 1.5], ["<=", 3]]]]), 1, 2, 1]))
+        loaded = read_legacy_instance(path)
+        self.assertEqual(loaded.formula.clause(0), [0, [(2, 1.5), ("<=", 3)]])
+
+        with open(path, "w") as f:
+            f.write("[__import__('os').getcwd(), 1, 2]")
+        with self.assertRaises(ValueError):
+            read_legacy_instance(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from simple_wmi_solver import SimpleWMISolver
+from utils.metrics import Metrics, NullMetrics
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counters_and_timers(self):
+        metrics = Metrics()
+        metrics.count("bytes", 10)
+        metrics.count("bytes", 5)
+        with metrics.timer("phase"):
+            pass
+        metrics.add("phase", 2.0)
+        self.assertEqual(metrics.get("bytes"), 15)
+        count, seconds = metrics.get("phase")
+        self.assertEqual(count, 2)
+        self.assertGreaterEqual(seconds, 2.0)
+        self.assertEqual(metrics.get("missing"), 0)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"], {"bytes": 15})
+        self.assertEqual(snapshot["timers"]["phase"]["count"], 2)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {"counters": {}, "timers": {}})
+
+    def test_null_metrics_record_nothing(self):
+        metrics = NullMetrics()
+        metrics.count("bytes", 10)
+        with metrics.timer("phase"):
+            pass
+        self.assertEqual(metrics.snapshot(), {"counters": {}, "timers": {}})
+
+
+class TestSolverMetrics(unittest.TestCase):
+    def build(self, metrics=None):
+        # x_0 <= 5 or b_0, on [0, 10]: no LattE calls
+        uni = RealsUniverse(1)
+        wf = WeightFunction([[1, [0]]], np.array([0.5]))
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            return SimpleWMISolver(
+                [[[(1, 1), ("<=", 5)]], [0]],
+                1,
+                uni,
+                wf,
+                seed=0,
+                metrics=metrics,
+            )
+
+    def test_phases_are_recorded(self):
+        solver = self.build(Metrics())
+        _, _, T = solver.coverageParameters(0.5, 0.2)
+        solver.simpleCoverage(0.5, 0.2, progress=False)
+        metrics = solver.metrics
+
+        self.assertEqual(metrics.get("chebyshev_lp")[0], 2)
+        self.assertEqual(metrics.get("bounding_box_lp")[0], 2)
+        self.assertEqual(metrics.get("trials"), T)
+        self.assertEqual(metrics.get("clause_checks")[0], T)
+        samples = metrics.get("sampling")[0]
+        self.assertIn(metrics.get("successes"), [samples - 1, samples])
+        self.assertEqual(metrics.get("hrep")[0], samples)
+        self.assertEqual(metrics.get("hit_and_run_steps"), 32 * samples)
+        self.assertGreater(metrics.get("weight_evals"), 0)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "metrics.json")
+            metrics.writeJSON(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), metrics.snapshot())
+
+    def test_metrics_do_not_change_the_run(self):
+        plain = self.build().simpleCoverage(0.5, 0.2, progress=False)
+        measured = self.build(Metrics()).simpleCoverage(
+            0.5, 0.2, progress=False
+        )
+        self.assertEqual(plain, measured)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import signal
+import tempfile
+import time
+import unittest
+import numpy as np
+from utils.profiling import (
+    SamplingProfiler,
+    TracingProfiler,
+    format_hot_table,
+    make_profiler,
+)
+from utils.weight_function import WeightFunction
+
+BUSY = "tests.test_profiling:busy"
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        np.linalg.norm(np.arange(100.0))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_collapsed_stacks(self):
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy(0.3)
+        self.assertGreater(profiler.nbSamples, 10)
+
+        lines = profiler.collapsed()
+        self.assertEqual(
+            sum(int(line.rsplit(" ", 1)[1]) for line in lines),
+            profiler.nbSamples,
+        )
+        for stack in profiler.labelledStacks():
+            # Library frames are folded into one
+            for a, b in zip(stack, stack[1:]):
+                self.assertFalse(a == b and a.startswith("["))
+        self.assertTrue(any(BUSY in line for line in lines))
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "profile.collapsed")
+            profiler.writeCollapsed(path)
+            with open(path) as f:
+                self.assertEqual(f.read().splitlines(), lines)
+
+    def test_hot_table(self):
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy(0.2)
+        rows = profiler.hotTable(top=3)
+        functions = [row["function"] for row in rows]
+        self.assertIn(BUSY, functions)
+        self.assertIn("utils.polytope_sampling:hit_and_run", functions)
+        busyRow = rows[functions.index(BUSY)]
+        self.assertGreater(busyRow["share"], 0.5)
+        self.assertIn(BUSY, format_hot_table(rows))
+
+    def test_restores_signal_handler(self):
+        previous = signal.getsignal(signal.SIGALRM)
+        with SamplingProfiler():
+            pass
+        self.assertEqual(signal.getsignal(signal.SIGALRM), previous)
+        self.assertEqual(signal.getitimer(signal.ITIMER_REAL), (0.0, 0.0))
+
+
+class TestTracingProfiler(unittest.TestCase):
+    def test_call_counts(self):
+        wf = WeightFunction([[1, [1]]], np.zeros(0))
+        with make_profiler("trace") as profiler:
+            for _ in range(7):
+                wf.eval(np.array([2.0]))
+        self.assertIsInstance(profiler, TracingProfiler)
+        rows = {row["function"]: row for row in profiler.hotTable()}
+        self.assertEqual(
+            rows["utils.weight_function:WeightFunction.eval"]["calls"], 7
+        )
+
+    def test_unknown_profiler(self):
+        with self.assertRaises(ValueError):
+            make_profiler("perf")
+
+
+if __name__ == "__main__":
+    unittest.main()
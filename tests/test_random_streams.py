@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from utils.random_streams import (
+    BufferedRandom,
+    spawn_streams,
+    pack_streams,
+    restore_streams,
+)
+
+
+class TestBufferedRandom(unittest.TestCase):
+    def test_draws_follow_the_distributions(self):
+        rng = BufferedRandom(0, bufferSize=100)
+        u = np.array([rng.uniform() for _ in range(5000)])
+        n = rng.normal(size=(5000, 2))
+        ints = rng.randint(3, 7, size=5000)
+
+        self.assertTrue(((0 <= u) & (u < 1)).all())
+        self.assertAlmostEqual(u.mean(), 0.5, delta=0.02)
+        self.assertEqual(n.shape, (5000, 2))
+        self.assertAlmostEqual(n.std(), 1.0, delta=0.05)
+        self.assertEqual(set(ints), {3, 4, 5, 6})
+        self.assertTrue(0 <= rng.randint(10) < 10)
+
+    def test_state_roundtrip_continues_the_stream(self):
+        streams = spawn_streams(np.random.SeedSequence(1))
+        for stream in streams.values():
+            stream.uniform(size=7)
+            stream.normal(size=3)
+        arrays = pack_streams(streams)
+        expected = {
+            name: (stream.uniform(size=5000), stream.normal(size=5000))
+            for name, stream in streams.items()
+        }
+
+        fresh = spawn_streams(np.random.SeedSequence(2))
+        restore_streams(fresh, arrays)
+        for name, stream in fresh.items():
+            np.testing.assert_array_equal(
+                stream.uniform(size=5000), expected[name][0]
+            )
+            np.testing.assert_array_equal(
+                stream.normal(size=5000), expected[name][1]
+            )
+
+    def test_spawned_streams_differ(self):
+        streams = spawn_streams(np.random.SeedSequence(3))
+        draws = [tuple(s.uniform(size=4)) for s in streams.values()]
+        self.assertEqual(len(set(draws)), len(draws))
+
+
+if __name__ == "__main__":
+    unittest.main()
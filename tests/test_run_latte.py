@@ -0,0 +1,159 @@
+import contextlib
+import io
+import os
+import stat
+import tempfile
+import time
+import unittest
+import numpy as np
+from unittest import mock
+from simple_wmi_solver import SimpleWMISolver
+from utils import run_latte
+from utils.metrics import Metrics
+from utils.polytope_utils import monte_carlo_integral
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+
+# Stand-in for the LattE integrate binary: leaves a file in its working
+# directory, as LattE does, and prints a result
+FAKE_LATTE = """#!/bin/sh
+touch stray_output.txt
+echo "Answer: 1/2"
+echo "Decimal: 0.5"
+"""
+
+# A LattE that never finishes, with a helper process of its own
+SLOW_LATTE = """#!/bin/sh
+sleep 60 &
+echo $! > helper.pid
+sleep 60
+"""
+
+
+class TestRunLatte(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        self.env = mock.patch.dict(
+            os.environ, {run_latte.SCRATCH_DIR_ENV: self.dir.name}
+        )
+        self.env.start()
+        # Force a fresh scratch directory under self.dir
+        run_latte._scratch["pid"] = None
+
+        self.binary = self.script("integrate", FAKE_LATTE)
+
+        # Two reals linked by one constraint, so LattE is called
+        self.universe = RealsUniverse(2, lowerBound=0, upperBound=1)
+        self.atoms = [[(0, 1), (1, 1), ("<=", 1)]]
+        self.monomials = [[1, [0, 0]]]
+
+    def script(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        run_latte.set_latte_binary(None)
+        run_latte._remove_scratch_dir(os.getpid(), run_latte.scratch_dir())
+        run_latte._scratch["pid"] = None
+        self.env.stop()
+        self.dir.cleanup()
+
+    def test_scratch_dir(self):
+        scratch = run_latte.scratch_dir()
+        self.assertEqual(os.path.dirname(scratch), self.dir.name)
+        self.assertEqual(run_latte.scratch_dir(), scratch)
+
+    def test_binary_override(self):
+        with mock.patch.dict(os.environ, {run_latte.LATTE_BINARY_ENV: "x"}):
+            self.assertEqual(run_latte.latte_binary(), "x")
+            run_latte.set_latte_binary("y")
+            self.assertEqual(run_latte.latte_binary(), "y")
+
+    def test_integrate_independent_of_cwd(self):
+        run_latte.set_latte_binary(self.binary)
+        # No temp/ folder and no latte-distro relative to this directory
+        os.chdir(self.dir.name)
+        metrics = Metrics()
+        result = run_latte.integrate(
+            self.atoms, self.monomials, 0, self.universe, metrics=metrics
+        )
+        self.assertAlmostEqual(float(result), 0.5)
+        self.assertEqual(metrics.get("latte")[0], 1)
+        self.assertGreater(metrics.get("latte_bytes_written"), 0)
+        # Inputs are removed; only LattE's own outputs remain until exit
+        self.assertEqual(
+            os.listdir(run_latte.scratch_dir()), ["stray_output.txt"]
+        )
+
+    def test_inputs_removed_on_failure(self):
+        run_latte.set_latte_binary(os.path.join(self.dir.name, "missing"))
+        result = run_latte.integrate(
+            self.atoms, self.monomials, 0, self.universe
+        )
+        self.assertEqual(result, 0.0)
+        self.assertEqual(os.listdir(run_latte.scratch_dir()), [])
+
+    def test_timeout_kills_process_group(self):
+        run_latte.set_latte_binary(self.script("slow", SLOW_LATTE))
+        start = time.time()
+        with self.assertRaises(run_latte.LatteTimeout):
+            run_latte.integrate(
+                self.atoms, self.monomials, 0, self.universe, timeout=0.5
+            )
+        self.assertLess(time.time() - start, 10)
+
+        pidFile = os.path.join(run_latte.scratch_dir(), "helper.pid")
+        with open(pidFile) as f:
+            helper = int(f.read())
+        # The helper is gone (or a zombie waiting for init to reap it)
+        time.sleep(0.2)
+        try:
+            with open("/proc/" + str(helper) + "/stat") as f:
+                self.assertEqual(f.read().split()[2], "Z")
+        except FileNotFoundError:
+            pass
+
+    def test_solver_falls_back_past_the_budget(self):
+        run_latte.set_latte_binary(self.script("slow", SLOW_LATTE))
+        wf = WeightFunction([[2, [1, 0]]], np.zeros(0))
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver = SimpleWMISolver(
+                [self.atoms], 0, self.universe, wf, seed=0, latteBudget=0.3
+            )
+        # 2x over the triangle x + y <= 1 of the unit square is 1/3
+        self.assertEqual(solver.latteBudgetSummary()["clauses"], [0])
+        fallback = solver.latteFallbacks[0]
+        self.assertAlmostEqual(solver.clauseWeights[0], 1 / 3, delta=0.01)
+        self.assertLess(fallback["stdError"], 0.01)
+
+
+class TestMonteCarloIntegral(unittest.TestCase):
+    def test_triangle(self):
+        A = np.array([[1.0, 1.0]])
+        b = np.array([1.0])
+        rng = np.random.RandomState(0)
+        estimate, stdError = monte_carlo_integral(
+            A, b, [[1, [0, 0]]], [0, 0], [1, 1], 100000, rng
+        )
+        self.assertAlmostEqual(estimate, 0.5, delta=4 * stdError)
+
+    def test_empty_box(self):
+        estimate, stdError = monte_carlo_integral(
+            np.zeros((0, 1)),
+            np.zeros(0),
+            [[1, [0]]],
+            [np.inf],
+            [-np.inf],
+            10,
+            np.random,
+        )
+        self.assertEqual((estimate, stdError), (0.0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
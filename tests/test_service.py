@@ -0,0 +1,132 @@
+import json
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from utils.service import (
+    SolverCache,
+    WMIService,
+    instance_key,
+    latency_summary,
+    make_server,
+)
+
+# a OR b with P(a) = 0.6, P(b) = 0.8 and a dummy real; WMI is 0.92
+INSTANCE = {
+    "formula": [[0], [1]],
+    "nbBools": 2,
+    "nbReals": 1,
+    "lowerBound": 0,
+    "upperBound": 1,
+    "weightFunction": {"monomials": [[1, [0]]], "boolWeights": [0.6, 0.8]},
+}
+
+
+class TestSolverCache(unittest.TestCase):
+    def test_keys(self):
+        key = instance_key(INSTANCE, 0, None)
+        self.assertEqual(key, instance_key(dict(INSTANCE, id=3), 1, None))
+        self.assertNotEqual(key, instance_key(INSTANCE, 0, 5.0))
+        self.assertNotEqual(
+            key, instance_key(dict(INSTANCE, formula=[[0]]), 0, None)
+        )
+        # The seed draws the weight function of instances without one
+        plain = dict(INSTANCE, weightFunction=None)
+        self.assertNotEqual(
+            instance_key(plain, 0, None), instance_key(plain, 1, None)
+        )
+
+    def test_memory_disk_and_eviction(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = SolverCache(maxSize=1, directory=d)
+            other = dict(INSTANCE, formula=[[0]])
+            keys = [instance_key(i, 0, None) for i in (INSTANCE, other)]
+
+            solver, source = cache.get(keys[0], INSTANCE, 0, None)
+            self.assertEqual(source, "built")
+            self.assertIs(cache.get(keys[0], INSTANCE, 0, None)[0], solver)
+            self.assertEqual(cache.get(keys[1], other, 0, None)[1], "built")
+            # Dropped from memory, still on disk
+            self.assertEqual(list(cache.solvers), [keys[1]])
+            solver, source = cache.get(keys[0], INSTANCE, 0, None)
+            self.assertEqual(source, "disk")
+            self.assertEqual(solver.nbClauses, 2)
+
+    def test_latency_summary(self):
+        summary = latency_summary([0.1] * 98 + [1.0, 2.0])
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p50_seconds"], 0.1)
+        self.assertEqual(summary["max_seconds"], 2.0)
+        self.assertEqual(latency_summary([]), {"count": 0})
+
+
+class TestService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = WMIService(nbWorkers=1, batchWindow=0.05).start()
+        cls.server = make_server(cls.service, port=0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = "http://{}:{}".format(*cls.server.server_address)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        with urllib.request.urlopen(self.url + path, data, 60) as response:
+            return json.loads(response.read())
+
+    def test_solve(self):
+        first = self.request("/solve", dict(INSTANCE, id="a"))
+        self.assertEqual(first["status"], "ok")
+        self.assertEqual(first["id"], "a")
+        self.assertAlmostEqual(first["estimate"], 0.92)
+        self.assertGreater(first["latency"], 0)
+
+        # A list is submitted at once: one batch, identical requests
+        # solved once
+        results = self.request(
+            "/solve",
+            [
+                dict(INSTANCE, id=1, exact=False, seed=7),
+                dict(INSTANCE, id=2, exact=False, seed=7),
+                dict(INSTANCE, id=3, exact=False, seed=8),
+            ],
+        )
+        self.assertEqual([r["id"] for r in results], [1, 2, 3])
+        self.assertEqual(
+            [r["cache"] for r in results], ["memory"] * len(results)
+        )
+        self.assertEqual([r["route"] for r in results], ["sampling"] * 3)
+        self.assertEqual(results[0]["estimate"], results[1]["estimate"])
+        self.assertTrue(results[1]["coalesced"])
+        for result in results:
+            self.assertAlmostEqual(result["estimate"], 0.92, delta=0.25)
+
+        metrics = self.request("/metrics")
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertGreaterEqual(metrics["completed"], 4)
+        self.assertGreaterEqual(metrics["latency"]["count"], 4)
+        self.assertGreater(metrics["throughput_per_second"], 0)
+        self.assertGreaterEqual(metrics["metrics"]["counters"]["coalesced"], 1)
+        self.assertEqual(self.request("/health")["workers"], 1)
+
+    def test_errors(self):
+        result = self.request("/solve", {"id": 5, "formula": "x"})
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["id"], 5)
+        missing = self.request("/solve", {"id": 6, "path": "nowhere.npz"})
+        self.assertEqual(missing["status"], "error")
+
+        request = urllib.request.Request(self.url + "/solve", b"{")
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(request, timeout=60)
+        self.assertEqual(raised.exception.code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
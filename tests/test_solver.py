@@ -0,0 +1,594 @@
+import unittest
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+from simple_wmi_solver import SimpleWMISolver, SAMPLING_MODES, _count_cliques
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+from utils.bool_masks import pack_bools
+from utils.compiled_formula import CompiledFormula
+from utils.exact_wmi import exact_wmi, polytope_integral
+from utils.instance_io import Instance, load_instance
+from utils.metrics import Metrics
+from utils.polytope_utils import clause_rows
+from generators.lra_gen import generateLRA
+
+
+def build_solver(
+    seed=0, nbBools=8, nbReals=4, nbClauses=20, compiled=False
+):
+    """Build a solver over a generated formula, without console noise."""
+    np.random.seed(seed)
+    uni = RealsUniverse(nbReals)
+    formula = generateLRA(nbBools, uni, nbClauses, 2, 3, avgLRAAtomLength=1)
+    if compiled:
+        formula = CompiledFormula.fromClauseList(formula, nbBools, nbReals)
+    wf = WeightFunction(
+        [[1, [0] * nbReals]], np.random.uniform(0, 1, size=nbBools)
+    )
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+        io.StringIO()
+    ):
+        return SimpleWMISolver(formula, nbBools, uni, wf)
+
+
+def build_boolean_solver(seed=0):
+    """a OR b with P(a) = 0.6, P(b) = 0.8 and a dummy real; WMI is 0.92."""
+    uni = RealsUniverse(1, lowerBound=0, upperBound=1)
+    wf = WeightFunction([[1, [0]]], np.array([0.6, 0.8]))
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+        io.StringIO()
+    ):
+        return SimpleWMISolver([[0], [1]], 2, uni, wf, seed=seed)
+
+
+class PythonIntegrationSolver(SimpleWMISolver):
+    """Integrates with utils.exact_wmi instead of LattE."""
+
+    def lraWeight(self, lraAtoms):
+        A, b = clause_rows(lraAtoms, self.nbReals, self.nbBools)
+        return polytope_integral(
+            A, b, self.weightFunction.f, self.universeReals
+        )
+
+
+class TestSolverClauseChecks(unittest.TestCase):
+    def test_satisfied_clauses_matches_single_checks(self):
+        solver = build_solver()
+        np.random.seed(1)
+        for _ in range(200):
+            bools = pack_bools(
+                np.random.uniform(size=solver.nbBools) < 0.5,
+                solver.nbBoolWords,
+            )
+            reals = np.random.uniform(0, 10, size=solver.nbReals)
+            expected = [
+                idx
+                for idx in range(solver.nbClauses)
+                if solver.checkClauseSAT((bools, reals), idx)
+            ]
+            np.testing.assert_array_equal(
+                solver.satisfiedClauses((bools, reals)), expected
+            )
+
+    def test_compiled_formula_input(self):
+        listSolver = build_solver()
+        compiledSolver = build_solver(compiled=True)
+
+        np.testing.assert_array_equal(
+            compiledSolver.boolPos, listSolver.boolPos
+        )
+        np.testing.assert_array_equal(
+            compiledSolver.boolNeg, listSolver.boolNeg
+        )
+        np.random.seed(2)
+        for _ in range(200):
+            bools = pack_bools(
+                np.random.uniform(size=listSolver.nbBools) < 0.5,
+                listSolver.nbBoolWords,
+            )
+            reals = np.random.uniform(0, 10, size=listSolver.nbReals)
+            np.testing.assert_array_equal(
+                compiledSolver.satisfiedClauses((bools, reals)),
+                listSolver.satisfiedClauses((bools, reals)),
+            )
+
+
+class TestMedianCoverage(unittest.TestCase):
+    def test_median_of_replicas(self):
+        solver = build_boolean_solver()
+        solver.reseed(0)
+        estimate, replicas = solver.medianCoverage(0.5, 0.1, nbWorkers=1)
+
+        self.assertEqual(len(replicas) % 2, 1)
+        self.assertGreaterEqual(len(replicas), np.log(10) / 0.125)
+        self.assertEqual(estimate, np.median(replicas))
+        self.assertLess(abs(estimate - 0.92), 0.92 * 0.5)
+
+    def test_parallel_replicas_match_serial(self):
+        solver = build_boolean_solver()
+        solver.reseed(0)
+        serial = solver.medianCoverage(0.5, 0.2, nbWorkers=1)
+        solver.reseed(0)
+        parallel = solver.medianCoverage(0.5, 0.2, nbWorkers=2)
+
+        self.assertEqual(serial, parallel)
+
+    def test_replicas_with_reals_match_serial(self):
+        # Every replica walks hit-and-run chains, which must start from the
+        # solver's own in every process and be left untouched
+        solver = build_solver(nbClauses=4, nbReals=2)
+        lastSampled = solver.lastSampled.copy()
+        solver.reseed(0)
+        serial = solver.medianCoverage(0.9, 0.5, nbWorkers=1)
+        np.testing.assert_array_equal(solver.lastSampled, lastSampled)
+        solver.reseed(0)
+        parallel = solver.medianCoverage(0.9, 0.5, nbWorkers=2)
+
+        self.assertEqual(serial, parallel)
+
+
+class TestCoverageStream(unittest.TestCase):
+    def test_stream_matches_simple_coverage(self):
+        solver = build_boolean_solver()
+        solver.reseed(3)
+        expected = solver.simpleCoverage(0.5, 0.2, progress=False)
+        solver.reseed(3)
+        updates = list(solver.coverageStream(0.5, 0.2, interval=50))
+
+        _, _, T = solver.coverageParameters(0.5, 0.2)
+        self.assertEqual(updates[-1]["trials"], T)
+        self.assertEqual(updates[-1]["estimate"], expected)
+        self.assertEqual(
+            [u["trials"] for u in updates[:-1]],
+            list(range(50, T, 50))[: len(updates) - 1],
+        )
+        for u in updates:
+            low, high = u["interval"]
+            self.assertLessEqual(low, high)
+            if u["estimate"] is not None:
+                self.assertLessEqual(low, u["estimate"])
+                self.assertLessEqual(u["estimate"], high)
+
+    def test_stream_can_stop_early(self):
+        solver = build_boolean_solver()
+        solver.reseed(3)
+        for update in solver.coverageStream(0.25, 0.1, interval=100):
+            if update["trials"] >= 300:
+                break
+
+        self.assertEqual(update["trials"], 300)
+        self.assertGreater(update["successes"], 0)
+        self.assertLess(abs(update["estimate"] - 0.92), 0.3)
+
+
+class TestExactRoute(unittest.TestCase):
+    def test_exact_matches_inclusion_exclusion(self):
+        np.random.seed(4)
+        uni = RealsUniverse(2)
+        formula = generateLRA(4, uni, 8, 2, 3, avgLRAAtomLength=1)
+        wf = WeightFunction(
+            [[-1, [1, 1]], [101, [0, 0]]], np.random.uniform(0, 1, size=4)
+        )
+        with contextlib.redirect_stderr(io.StringIO()):
+            solver = PythonIntegrationSolver(formula, 4, uni, wf, seed=0)
+        estimate = solver.exactWMI()
+        self.assertIs(type(estimate), float)
+        self.assertAlmostEqual(
+            estimate / exact_wmi(formula, 4, uni, wf), 1, places=9
+        )
+
+    def test_routes(self):
+        solver = build_boolean_solver()
+        costs = solver.routeCosts(0.25, 0.15)
+        self.assertEqual(costs["exactTerms"], 3)
+        self.assertEqual(costs["route"], "exact")
+        estimate = solver.solve(0.25, 0.15, progress=False)
+        self.assertIs(type(estimate), float)
+        self.assertAlmostEqual(estimate, 0.92)
+        self.assertEqual(solver.lastRoute, "exact")
+
+        estimate = solver.solve(0.25, 0.15, progress=False, exact=False)
+        self.assertEqual(solver.lastRoute, "sampling")
+        self.assertAlmostEqual(estimate, 0.92, delta=0.92 * 0.25)
+
+    def test_count_cliques(self):
+        triangle = [0b110, 0b101, 0b011]
+        self.assertEqual(_count_cliques(triangle, 100), 7)
+        self.assertEqual(_count_cliques([0, 0, 0], 100), 3)
+        # Counting stops past the limit
+        self.assertEqual(_count_cliques(triangle, 3), 4)
+
+
+class TestBooleanPath(unittest.TestCase):
+    def test_no_polytope_work(self):
+        uni = RealsUniverse(1, lowerBound=0, upperBound=1)
+        wf = WeightFunction([[1, [0]]], np.array([0.6, 0.8]))
+        solver = SimpleWMISolver(
+            [[0], [1]], 2, uni, wf, seed=0, metrics=Metrics()
+        )
+        self.assertTrue(solver.booleanOnly)
+        _, _, T = solver.coverageParameters(0.25, 0.15)
+        updates = list(solver.coverageStream(0.25, 0.15, interval=100))
+
+        self.assertEqual(
+            [update["trials"] for update in updates],
+            list(range(100, T, 100)) + [T],
+        )
+        self.assertAlmostEqual(updates[-1]["estimate"], 0.92, delta=0.92 * 0.25)
+        self.assertEqual(solver.metrics.get("trials"), T)
+        for name in ["chebyshev_lp", "bounding_box_lp", "sampling", "hrep"]:
+            self.assertEqual(solver.metrics.get(name), 0)
+
+    def test_clause_weights(self):
+        uni = RealsUniverse(1, lowerBound=0, upperBound=2)
+        wf = WeightFunction([[1, [0]]], np.array([0.6, 0.8, 0.3]))
+        # a and not c, b, and a clause with b and not b
+        clauses = [[0, 6], [1], [1, 5, 2]]
+        with contextlib.redirect_stderr(io.StringIO()):
+            solver = SimpleWMISolver(clauses, 3, uni, wf)
+        np.testing.assert_allclose(
+            np.asarray(solver.clauseWeights, dtype=float),
+            [2 * 0.6 * 0.7, 2 * 0.8, 0.0],
+        )
+
+    def test_appended_clause_weights(self):
+        class CountingSolver(SimpleWMISolver):
+            lraCalls = 0
+
+            def lraWeight(self, lraAtoms):
+                CountingSolver.lraCalls += 1
+                return super().lraWeight(lraAtoms)
+
+        uni = RealsUniverse(1, lowerBound=0, upperBound=2)
+        wf = WeightFunction([[1, [0]]], np.array([0.6, 0.8, 0.3]))
+        clauses = [[0, 6], [1], [1, 5, 2]]
+        with contextlib.redirect_stderr(io.StringIO()):
+            solver = CountingSolver(clauses[:1], 3, uni, wf)
+            calls = CountingSolver.lraCalls
+            solver.addClauses(clauses[1:2])
+            solver.addClauses(clauses[2:])
+            fresh = SimpleWMISolver(clauses, 3, uni, wf)
+
+        # The universe weight is integrated once, not on every append
+        self.assertEqual(CountingSolver.lraCalls, calls)
+        np.testing.assert_allclose(
+            np.asarray(solver.clauseWeights, dtype=float),
+            np.asarray(fresh.clauseWeights, dtype=float),
+        )
+
+    def test_without_reals(self):
+        wf = WeightFunction([[1, []]], np.array([0.6, 0.8]))
+        solver = SimpleWMISolver([[0], [1]], 2, RealsUniverse(0), wf, seed=0)
+        self.assertAlmostEqual(
+            solver.simpleCoverage(0.1, 0.1, progress=False),
+            0.92,
+            delta=0.92 * 0.1,
+        )
+        self.assertAlmostEqual(solver.exactWMI(), 0.92)
+
+    def test_edits_without_reals(self):
+        wf = WeightFunction([[1, []]], np.array([0.6, 0.8, 0.5]))
+        metrics = Metrics()
+        solver = SimpleWMISolver(
+            [[0]], 3, RealsUniverse(0), wf, seed=0, metrics=metrics
+        )
+        # a or b or c, then a or c
+        solver.addClauses([[1], [2]])
+        self.assertAlmostEqual(solver.exactWMI(), 1 - 0.4 * 0.2 * 0.5)
+        solver.removeClauses([1])
+        self.assertAlmostEqual(solver.exactWMI(), 1 - 0.4 * 0.5)
+        self.assertAlmostEqual(
+            solver.simpleCoverage(0.1, 0.1, progress=False),
+            0.8,
+            delta=0.8 * 0.1,
+        )
+        for name in ["chebyshev_lp", "bounding_box_lp", "hrep"]:
+            self.assertEqual(metrics.get(name), 0)
+
+    def test_atom_clause_leaves_the_path(self):
+        solver = build_boolean_solver()
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver.addClauses([[[(2, 1), ("<=", 0.5)]]])
+        self.assertFalse(solver.booleanOnly)
+        # a or b or x <= 0.5: 1 - 0.4 * 0.2 * 0.5
+        self.assertAlmostEqual(
+            solver.simpleCoverage(0.2, 0.2, progress=False),
+            0.96,
+            delta=0.96 * 0.2,
+        )
+
+
+class TestSamplingModes(unittest.TestCase):
+    def test_modes_estimate_the_same_quantity(self):
+        solver = build_boolean_solver()
+        solver.reseed(0)
+        report = solver.samplingModeVariance(
+            0.5, 0.2, nbReplicas=4, nbWorkers=1
+        )
+
+        self.assertEqual(set(report), set(SAMPLING_MODES))
+        for mode, stats in report.items():
+            self.assertEqual(len(stats["estimates"]), 4)
+            self.assertGreaterEqual(stats["variance"], 0)
+            self.assertLess(abs(stats["mean"] - 0.92), 0.2, mode)
+
+    def test_unknown_mode(self):
+        solver = build_boolean_solver()
+        with self.assertRaises(ValueError):
+            solver.simpleCoverage(0.5, 0.2, progress=False, mode="lhs")
+
+
+class TestRandomStreams(unittest.TestCase):
+    def test_seeded_runs_ignore_global_state(self):
+        np.random.seed(0)
+        first = build_boolean_solver(seed=7).simpleCoverage(
+            0.5, 0.2, progress=False
+        )
+        np.random.seed(1)
+        np.random.uniform(size=100)
+        second = build_boolean_solver(seed=7).simpleCoverage(
+            0.5, 0.2, progress=False
+        )
+
+        self.assertEqual(first, second)
+
+
+class TestIncrementalUpdates(unittest.TestCase):
+    def test_added_clauses_match_a_fresh_solver(self):
+        full = build_solver(nbClauses=20)
+        clauses = full.formula.toClauseList()
+        partial = SimpleWMISolver(
+            clauses[:15],
+            full.nbBools,
+            full.universeReals,
+            full.weightFunction,
+            clauseWeights=full.clauseWeights[:15],
+        )
+        before = partial.lastSampled.copy()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            added = partial.addClauses(clauses[15:])
+
+        np.testing.assert_array_equal(added, np.arange(15, 20))
+        np.testing.assert_array_equal(partial.lastSampled[:15], before)
+        np.testing.assert_allclose(
+            np.asarray(partial.clauseWeights, dtype=float),
+            np.asarray(full.clauseWeights, dtype=float),
+        )
+        self.assertAlmostEqual(
+            float(partial.universeDisjointWeightSum),
+            float(full.universeDisjointWeightSum),
+        )
+        np.testing.assert_array_equal(partial.boolPos, full.boolPos)
+        np.random.seed(3)
+        for _ in range(100):
+            sol = (
+                pack_bools(
+                    np.random.uniform(size=full.nbBools) < 0.5,
+                    full.nbBoolWords,
+                ),
+                np.random.uniform(0, 10, size=full.nbReals),
+            )
+            np.testing.assert_array_equal(
+                partial.satisfiedClauses(sol), full.satisfiedClauses(sol)
+            )
+
+    def test_edits_change_the_estimate(self):
+        solver = build_boolean_solver(seed=0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver.addClauses([[0, 1]])
+        self.assertEqual(solver.nbClauses, 3)
+        self.assertAlmostEqual(
+            solver.simpleCoverage(0.2, 0.2, progress=False), 0.92, delta=0.06
+        )
+
+        # Only b is left: P(b) = 0.8
+        solver.removeClauses([0, 2])
+        self.assertEqual(solver.nbClauses, 1)
+        self.assertEqual(
+            solver.satisfiedClauses(
+                (pack_bools([True, True], 1), np.array([0.5]))
+            ).tolist(),
+            [1],
+        )
+        self.assertAlmostEqual(
+            solver.simpleCoverage(0.2, 0.2, progress=False), 0.8, delta=0.05
+        )
+        with self.assertRaises(ValueError):
+            solver.removeClauses([2])
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "checkpoint.npz")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_resume_is_bit_for_bit(self):
+        # Checkpointed runs take the trial-by-trial loop, not the batched
+        # one of atom-free formulas: compare with an uninterrupted one
+        solver = build_boolean_solver()
+        solver.reseed(5)
+        for update in solver.coverageStream(
+            0.5, 0.2, interval=0, checkpointPath=self.path
+        ):
+            expected = update["estimate"]
+
+        solver = build_boolean_solver()
+        solver.reseed(5)
+        for update in solver.coverageStream(
+            0.5,
+            0.2,
+            interval=1,
+            checkpointPath=self.path,
+            checkpointInterval=0,
+        ):
+            if update["trials"] == 150:
+                break  # Preempted
+
+        # A fresh process starts from unrelated streams
+        np.random.seed(1234)
+        resumed = SimpleWMISolver.fromCheckpoint(
+            self.path,
+            [[0], [1]],
+            2,
+            solver.universeReals,
+            solver.weightFunction,
+        )
+        np.testing.assert_array_equal(
+            resumed.clauseWeights, solver.clauseWeights
+        )
+        result = resumed.resumeCoverage(self.path, 0.5, 0.2, progress=False)
+
+        self.assertEqual(result, expected)
+
+    def test_resume_with_reals_is_bit_for_bit(self):
+        # Hit-and-run chains are part of the run state
+        solver = build_solver(nbClauses=4, nbReals=2)
+        solver.removeClauses([1])
+        solver.reseed(5)
+        for update in solver.coverageStream(
+            0.9, 0.5, interval=0, checkpointPath=self.path
+        ):
+            expected = update["estimate"]
+
+        solver = build_solver(nbClauses=4, nbReals=2)
+        solver.removeClauses([1])
+        solver.reseed(5)
+        for update in solver.coverageStream(
+            0.9,
+            0.5,
+            interval=1,
+            checkpointPath=self.path,
+            checkpointInterval=0,
+        ):
+            if update["trials"] == 150:
+                break  # Preempted
+
+        np.random.seed(1234)
+        resumed = build_solver(nbClauses=4, nbReals=2)
+        with self.assertRaises(ValueError):
+            resumed.resumeCoverage(self.path, 0.9, 0.5, progress=False)
+        resumed.removeClauses([1])
+        result = resumed.resumeCoverage(self.path, 0.9, 0.5, progress=False)
+
+        self.assertEqual(result, expected)
+
+    def test_resume_rejects_other_formulas(self):
+        solver = build_solver(nbClauses=4, nbReals=2)
+        for _ in solver.coverageStream(
+            0.9, 0.5, interval=0, checkpointPath=self.path
+        ):
+            pass
+        other = build_solver(seed=1, nbClauses=4, nbReals=2)
+        with self.assertRaises(ValueError):
+            other.resumeCoverage(self.path, 0.9, 0.5, progress=False)
+
+    def test_resume_rejects_other_parameters(self):
+        solver = build_boolean_solver()
+        for _ in solver.coverageStream(
+            0.5, 0.2, interval=0, checkpointPath=self.path
+        ):
+            pass
+        with self.assertRaises(ValueError):
+            solver.resumeCoverage(self.path, 0.25, 0.2, progress=False)
+
+
+class TestSaveLoad(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "solver.npz")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_load_continues_the_run(self):
+        solver = build_solver(compiled=True)
+        # Warm chains and check statistics, then an edit
+        solver.simpleCoverage(0.5, 0.2, progress=False)
+        solver.removeClauses([3])
+        solver.save(self.path)
+
+        loaded = SimpleWMISolver.load(self.path)
+        self.assertIsInstance(loaded.formula.lits, np.memmap)
+        self.assertIsInstance(loaded.lastSampled, np.memmap)
+        np.testing.assert_array_equal(loaded.lastSampled, solver.lastSampled)
+        np.testing.assert_array_equal(
+            loaded.clauseWeights, solver.clauseWeights
+        )
+        self.assertEqual(loaded.nbClauses, 19)
+        self.assertEqual(
+            loaded.simpleCoverage(0.3, 0.2, progress=False),
+            solver.simpleCoverage(0.3, 0.2, progress=False),
+        )
+
+        # The file doubles as a binary instance
+        self.assertEqual(
+            load_instance(self.path).formula.toClauseList(),
+            solver.formula.toClauseList(),
+        )
+
+    def test_edits_leave_the_file_alone(self):
+        build_boolean_solver().save(self.path)
+        with open(self.path, "rb") as f:
+            saved = f.read()
+
+        loaded = SimpleWMISolver.load(self.path)
+        self.assertTrue(loaded.booleanOnly)
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded.addClauses([[0, 1]])
+        loaded.removeClauses([1])
+        loaded.simpleCoverage(0.5, 0.2, progress=False)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), saved)
+
+        copy = SimpleWMISolver.load(self.path, mmap=False)
+        self.assertNotIsInstance(copy.lastSampled, np.memmap)
+        self.assertEqual(copy.nbClauses, 2)
+
+    def test_fingerprint_of_the_instance(self):
+        solver = build_boolean_solver()
+        solver.save(self.path)
+        instance = Instance(
+            solver.formula, solver.universeReals, solver.weightFunction
+        )
+        loaded = SimpleWMISolver.load(
+            self.path, fingerprint=instance.fingerprint()
+        )
+        self.assertEqual(loaded.nbClauses, 2)
+
+        # Same sizes, other weights or another formula
+        otherWeights = WeightFunction([[1, [0]]], np.array([0.6, 0.7]))
+        otherFormula = CompiledFormula.fromClauseList([[0], [4]], 2, 1)
+        for other in [
+            Instance(solver.formula, solver.universeReals, otherWeights),
+            Instance(
+                otherFormula, solver.universeReals, solver.weightFunction
+            ),
+        ]:
+            with self.assertRaises(ValueError):
+                SimpleWMISolver.load(
+                    self.path, fingerprint=other.fingerprint()
+                )
+
+    def test_rejects_other_files(self):
+        build_boolean_solver().save(self.path)
+        arrays = dict(np.load(self.path))
+        for solverState in [None, '{"version": 0}']:
+            if solverState is None:
+                del arrays["solver"]
+            else:
+                arrays["solver"] = np.array(solverState)
+            with open(self.path, "wb") as f:
+                np.savez(f, **arrays)
+            with self.assertRaises(ValueError):
+                SimpleWMISolver.load(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
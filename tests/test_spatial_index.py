@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+from utils.spatial_index import BoxIndex
+from utils.polytope_utils import find_bounding_box_active_vars
+from utils.reals_universe import RealsUniverse
+
+
+class TestBoxIndex(unittest.TestCase):
+    def test_query_matches_brute_force(self):
+        np.random.seed(0)
+        nbBoxes, nbReals = 300, 3
+        a = np.random.uniform(0, 10, size=(nbBoxes, nbReals))
+        b = np.random.uniform(0, 10, size=(nbBoxes, nbReals))
+        lower, upper = np.minimum(a, b), np.maximum(a, b)
+        # A couple of empty (infeasible) boxes
+        lower[:5], upper[:5] = np.inf, -np.inf
+
+        index = BoxIndex(lower, upper, tol=0)
+        for _ in range(50):
+            x = np.random.uniform(0, 10, size=nbReals)
+            expected = np.where(
+                np.all((lower <= x) & (x <= upper), axis=1)
+            )[0]
+            np.testing.assert_array_equal(index.query(x), expected)
+            for idx in range(nbBoxes):
+                self.assertEqual(index.contains(idx, x), idx in expected)
+
+    def test_append_and_remove(self):
+        index = BoxIndex(np.array([[0.0, 0.0]]), np.array([[1.0, 1.0]]))
+        index.append(np.array([[0.5, 0.5]]), np.array([[2.0, 2.0]]))
+        x = np.array([0.75, 0.75])
+
+        np.testing.assert_array_equal(index.query(x), [0, 1])
+        index.remove(0)
+        np.testing.assert_array_equal(index.query(x), [1])
+        self.assertFalse(index.contains(0, x))
+
+        copy = BoxIndex.fromArrays(index.toArrays())
+        np.testing.assert_array_equal(copy.lower, index.lower)
+        np.testing.assert_array_equal(copy.query(x), [1])
+
+    def test_append_merges_sorted_bounds(self):
+        np.random.seed(1)
+        # Rounded bounds, so that ties between old and new boxes occur
+        a = np.round(np.random.uniform(0, 10, size=(60, 3)))
+        b = np.round(np.random.uniform(0, 10, size=(60, 3)))
+        lower, upper = np.minimum(a, b), np.maximum(a, b)
+
+        index = BoxIndex(lower[:20], upper[:20], tol=0)
+        index.remove(3)
+        for lo, hi in [(20, 21), (21, 40), (40, 40), (40, 60)]:
+            index.append(lower[lo:hi], upper[lo:hi])
+        lower[3], upper[3] = np.inf, -np.inf
+
+        fresh = BoxIndex(lower, upper, tol=0)
+        for order, freshOrder in [
+            (index.lowerOrder, fresh.lowerOrder),
+            (index.upperOrder, fresh.upperOrder),
+        ]:
+            # Up to the stale position of the removed box
+            for d in range(3):
+                np.testing.assert_array_equal(
+                    order[:, d][order[:, d] != 3],
+                    freshOrder[:, d][freshOrder[:, d] != 3],
+                )
+        for _ in range(50):
+            x = np.random.uniform(0, 10, size=3)
+            expected = np.where(
+                np.all((lower <= x) & (x <= upper), axis=1)
+            )[0]
+            np.testing.assert_array_equal(index.query(x), expected)
+
+
+class TestBoundingBox(unittest.TestCase):
+    def test_triangle_box(self):
+        # x + y <= 4, x >= 1 over [0, 10]^3 (z is free)
+        universe = RealsUniverse(3, lowerBound=0, upperBound=10)
+        atoms = [[(0, 1), (1, 1), ("<=", 4)], [(0, 1), (">=", 1)]]
+
+        lower, upper = find_bounding_box_active_vars(atoms, 3, 0, universe)
+
+        np.testing.assert_allclose(lower, [1, 0, 0], atol=1e-7)
+        np.testing.assert_allclose(upper, [4, 3, 10], atol=1e-7)
+
+    def test_infeasible_box(self):
+        universe = RealsUniverse(1, lowerBound=0, upperBound=10)
+        atoms = [[(0, 1), ("<=", 2)], [(0, 1), (">=", 3)]]
+
+        self.assertIsNone(
+            find_bounding_box_active_vars(atoms, 1, 0, universe)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,443 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+import numpy as np
+from multiprocessing.connection import wait
+from utils.compiled_formula import CompiledFormula
+from utils.instance_io import load_instance
+from utils.metrics import Metrics, NullMetrics
+from utils.reals_universe import RealsUniverse
+from utils.run_latte import exit_on_terminate, remove_scratch_dir
+from utils.weight_function import WeightFunction, random_weight_function
+
+
+def read_instances(path):
+    """
+    Stream instances from a JSONL file, one instance per line.
+
+    A line is either an object
+
+        {"id": ..., "formula": [...], "nbReals": 2, "nbBools": 3,
+         "lowerBound": 0, "upperBound": 10, "epsilon": ..., "delta": ...,
+         "seed": ..., "latteBudget": ...,
+         "weightFunction": {"monomials": [...], "boolWeights": [...]}}
+
+    where everything after nbBools is optional, {"id": ..., "path": ...}
+    pointing to an instance file in any encoding of utils.instance_io, or
+    the list form [formula, nbReals, nbBools, <generation parameters>...]. An
+    instance without an id is identified by its line number. Blank lines
+    are skipped.
+
+    Args:
+        path: path to the JSONL file.
+
+    Returns:
+        A generator of instance dicts.
+    """
+    with open(path, "r") as f:
+        for lineNo, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, list):
+                record = {
+                    "formula": record[0],
+                    "nbReals": int(record[1]),
+                    "nbBools": int(record[2]),
+                    "parameters": record[3:],
+                }
+            record.setdefault("id", lineNo)
+            yield record
+
+
+# Seconds a terminated worker gets to clean up before it is killed
+TERMINATE_GRACE = 5.0
+
+# Statuses of finished instances; the others ("error", "killed",
+# "crashed") may be transient and are retried when a batch is run again
+COMPLETED_STATUSES = ["ok", "timeout"]
+
+
+def completed_ids(path):
+    """
+    Ids recorded in a results file with a status of COMPLETED_STATUSES. A
+    truncated last line (from an interrupted run) is ignored, so that
+    instance is solved again.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                if result["status"] in COMPLETED_STATUSES:
+                    done.add(result["id"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def _drop_partial_line(path):
+    # A run killed mid-write leaves a line without its newline
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def build_instance(instance, seed):
+    """
+    Build the solver arguments of an instance.
+
+    Args:
+        instance: an instance dict (see read_instances).
+        seed: seed for the random weight function, used when the instance
+            does not come with its own.
+
+    Returns:
+        (formula, nbBools, universeReals, weightFunction), with the formula
+        compiled (see utils.compiled_formula).
+    """
+    if "path" in instance:
+        loaded = load_instance(instance["path"])
+        formula = loaded.formula
+        universe = loaded.universeReals
+        wf = loaded.weightFunction
+    else:
+        if not isinstance(instance["formula"], list):
+            raise ValueError("The formula must be given as a JSON list")
+        formula = CompiledFormula.fromClauseList(
+            instance["formula"],
+            int(instance["nbBools"]),
+            int(instance["nbReals"]),
+        )
+        universe = RealsUniverse(
+            formula.nbReals,
+            lowerBound=instance.get("lowerBound", 0),
+            upperBound=instance.get("upperBound", 10),
+        )
+        wf = instance.get("weightFunction")
+        if wf is not None:
+            wf = WeightFunction(wf["monomials"], np.array(wf["boolWeights"]))
+
+    if wf is None:
+        wf = random_weight_function(
+            formula.nbReals, formula.nbBools, np.random.RandomState(seed)
+        )
+    return formula, formula.nbBools, universe, wf
+
+
+def solve_instance(
+    instance,
+    epsilon,
+    delta,
+    timeout=None,
+    seed=0,
+    latteBudget=None,
+    metrics=False,
+):
+    """
+    Solve one instance and describe the outcome as a JSON-friendly dict.
+
+    Sampling runs through coverageStream, so when the time limit is hit the
+    result still carries the running estimate (status "timeout"). The
+    limit covers preprocessing too, but preprocessing itself (LattE, the
+    LPs) is not interruptible; run_batch enforces the hard limit.
+
+    Args:
+        instance: an instance dict (see read_instances).
+        epsilon, delta: defaults for instances that do not set their own.
+        timeout: wall-clock limit in seconds, or None.
+        seed: default seed for instances that do not set their own.
+        latteBudget: default LattE seconds per clause (see SimpleWMISolver),
+            or None.
+        metrics: whether to record the solver's phase metrics (see
+            utils.metrics) into the result, under "metrics".
+
+    Returns:
+        The result dict.
+    """
+    from simple_wmi_solver import SimpleWMISolver
+
+    start = time.time()
+    seed = instance.get("seed", seed)
+    epsilon = instance.get("epsilon", epsilon)
+    delta = instance.get("delta", delta)
+    latteBudget = instance.get("latteBudget", latteBudget)
+    result = {
+        "id": instance["id"],
+        "status": "error",
+        "estimate": None,
+        "interval": None,
+        "trials": 0,
+        "successes": 0,
+        "epsilon": epsilon,
+        "delta": delta,
+        "seed": seed,
+        "setup_time": None,
+        "sampling_time": None,
+        "total_time": None,
+    }
+    try:
+        formula, nbBools, universe, wf = build_instance(instance, seed)
+        metrics = Metrics() if metrics else NullMetrics()
+        solver = SimpleWMISolver(
+            formula,
+            nbBools,
+            universe,
+            wf,
+            seed=seed,
+            latteBudget=latteBudget,
+            metrics=metrics,
+        )
+        result["setup_time"] = time.time() - start
+        result["latte_fallbacks"] = solver.latteBudgetSummary()["clauses"]
+        result["status"] = "ok"
+
+        timeInterval = None if timeout is None else min(timeout / 20, 1.0)
+        update = None
+        for update in solver.coverageStream(
+            epsilon, delta, timeInterval=timeInterval
+        ):
+            if timeout is not None and time.time() - start >= timeout:
+                result["status"] = "timeout"
+                break
+        result["sampling_time"] = time.time() - start - result["setup_time"]
+
+        if update["estimate"] is not None:
+            result["estimate"] = float(update["estimate"])
+        # An unbounded side of the interval is written as null
+        result["interval"] = [
+            float(x) if np.isfinite(x) else None for x in update["interval"]
+        ]
+        result["trials"] = int(update["trials"])
+        result["successes"] = int(update["successes"])
+        if metrics.enabled:
+            result["metrics"] = metrics.snapshot()
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = "".join(
+            traceback.format_exception_only(type(e), e)
+        ).strip()
+    result["total_time"] = time.time() - start
+    return result
+
+
+def _batch_worker(conn, epsilon, delta, timeout, seed, latteBudget, metrics):
+    # Solves the instances sent over conn until it gets None. Solver and
+    # LattE chatter would interleave between workers
+    exit_on_terminate()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+        devnull
+    ), contextlib.redirect_stderr(devnull):
+        while True:
+            try:
+                instance = conn.recv()
+            except EOFError:
+                break
+            if instance is None:
+                break
+            conn.send(
+                solve_instance(
+                    instance,
+                    epsilon,
+                    delta,
+                    timeout,
+                    seed,
+                    latteBudget,
+                    metrics,
+                )
+            )
+    conn.close()
+    # Forked workers exit without running atexit handlers
+    remove_scratch_dir()
+
+
+class _BatchWorker:
+    """A worker process of run_batch and the instance it is solving."""
+
+    def __init__(self, args):
+        self.conn, childConn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_batch_worker, args=(childConn,) + args, daemon=True
+        )
+        self.process.start()
+        childConn.close()
+        self.instance = None
+        self.deadline = None
+        self.started = None
+
+    def assign(self, instance, timeout, killGrace):
+        self.conn.send(instance)
+        self.instance = instance
+        self.started = time.time()
+        self.deadline = None
+        if timeout is not None:
+            self.deadline = self.started + timeout + killGrace
+
+    def release(self):
+        instance, started = self.instance, self.started
+        self.instance = self.deadline = self.started = None
+        return instance, started
+
+    def kill(self):
+        # SIGTERM first, so the worker takes its LattE calls and scratch
+        # directory down with it (see exit_on_terminate)
+        self.process.terminate()
+        self.process.join(TERMINATE_GRACE)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        with contextlib.suppress(OSError):
+            self.conn.send(None)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+def run_batch(
+    instancesPath,
+    resultsPath,
+    epsilon,
+    delta,
+    nbWorkers=None,
+    timeout=None,
+    killGrace=5.0,
+    seed=0,
+    latteBudget=None,
+    metrics=False,
+):
+    """
+    Solve every instance of a JSONL file and append the results to a JSONL
+    file, as they complete (so not in input order).
+
+    The instances are solved by a pool of nbWorkers long-lived worker
+    processes, one instance at a time each; instances are read lazily, so
+    the input can be arbitrarily large. An instance still running
+    killGrace seconds after its timeout (e.g. stuck in LattE) is killed
+    with its worker and recorded with status "killed", and a worker that
+    dies is recorded as "crashed"; either way a fresh worker takes its
+    place. Instances already solved or timed out in the results file are
+    skipped, so an interrupted batch is continued by running it again;
+    failed ones are retried and get another line, the last line of an id
+    being its latest result.
+
+    Args:
+        instancesPath: JSONL file of instances (see read_instances).
+        resultsPath: JSONL file the results are appended to.
+        epsilon, delta: defaults for instances that do not set their own.
+        nbWorkers: number of worker processes (default: CPU count).
+        timeout: per-instance wall-clock limit in seconds, or None.
+        killGrace: extra seconds before a timed out instance is killed.
+        seed: default seed for instances that do not set their own.
+        latteBudget: default LattE seconds per clause, or None; clauses over
+            it get Monte Carlo weights (listed in "latte_fallbacks").
+        metrics: whether every result carries the solver's phase metrics.
+
+    Returns:
+        Counts of the statuses of the instances solved in this run.
+    """
+    nbWorkers = nbWorkers or os.cpu_count() or 1
+    _drop_partial_line(resultsPath)
+    done = completed_ids(resultsPath)
+    pending = (
+        instance
+        for instance in read_instances(instancesPath)
+        if instance["id"] not in done
+    )
+    args = (epsilon, delta, timeout, seed, latteBudget, metrics)
+    workers = []
+    counts = {}
+
+    with open(resultsPath, "a") as out:
+
+        def record(result):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+        def replace(worker, status):
+            # The worker is gone with its instance
+            worker.kill()
+            instance, started = worker.release()
+            record(_failed(instance, status, started))
+            workers[workers.index(worker)] = _BatchWorker(args)
+
+        try:
+            exhausted = False
+            while True:
+                # Idle workers take the next instances, and workers are
+                # started as long as there are instances for them
+                while not exhausted:
+                    worker = next(
+                        (w for w in workers if w.instance is None), None
+                    )
+                    if worker is None and len(workers) == nbWorkers:
+                        break
+                    instance = next(pending, None)
+                    if instance is None:
+                        exhausted = True
+                        break
+                    if worker is None:
+                        worker = _BatchWorker(args)
+                        workers.append(worker)
+                    worker.assign(instance, timeout, killGrace)
+
+                busy = [w for w in workers if w.instance is not None]
+                if not busy:
+                    break
+                deadlines = [w.deadline for w in busy if w.deadline]
+                waitTime = None
+                if deadlines:
+                    waitTime = max(0.0, min(deadlines) - time.time())
+                ready = wait([w.conn for w in busy], timeout=waitTime)
+
+                for worker in busy:
+                    if worker.conn not in ready:
+                        continue
+                    try:
+                        result = worker.conn.recv()
+                    except EOFError:
+                        # The worker died without reporting (e.g. out of
+                        # memory)
+                        replace(worker, "crashed")
+                        continue
+                    worker.release()
+                    record(result)
+
+                now = time.time()
+                for worker in busy:
+                    if (
+                        worker.instance is not None
+                        and worker.deadline is not None
+                        and now >= worker.deadline
+                    ):
+                        replace(worker, "killed")
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    return counts
+
+
+def _failed(instance, status, started):
+    return {
+        "id": instance["id"],
+        "status": status,
+        "estimate": None,
+        "trials": 0,
+        "successes": 0,
+        "total_time": time.time() - started,
+    }
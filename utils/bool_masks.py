@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def nb_words(nbBools):
+    """Number of uint64 words needed to hold nbBools bits (at least one)."""
+    return max(1, (nbBools + 63) // 64)
+
+
+def pack_bools(bools, nbWords):
+    """
+    Pack a boolean vector into an array of nbWords uint64 words.
+    Bit i of the assignment ends up in word i // 64.
+    """
+    packed = np.packbits(np.asarray(bools, dtype=bool), bitorder="little")
+    buf = np.zeros(8 * nbWords, dtype=np.uint8)
+    buf[: len(packed)] = packed
+    return buf.view(np.uint64)
+
+
+def unpack_bools(bits, nbBools):
+    """Inverse of pack_bools."""
+    return np.unpackbits(
+        np.asarray(bits, dtype=np.uint64).view(np.uint8), bitorder="little"
+    )[:nbBools].astype(bool)
+
+
+def compile_clause_masks(clauseList, nbBools, nbVariables):
+    """
+    Compile the Boolean part of every clause into packed masks.
+
+    Boolean literals are ints: lit < nbVariables is the positive literal of
+    variable lit, lit >= nbVariables the negation of lit - nbVariables.
+
+    Args:
+        clauseList: List of clauses (mixing int literals and LRA atoms)
+        nbBools: Number of boolean variables
+        nbVariables: nbBools + nbReals, the negation offset
+
+    Returns:
+        pos: (nbClauses, nbWords) uint64 array of required-true variables
+        neg: (nbClauses, nbWords) uint64 array of required-false variables
+    """
+    nbWords = nb_words(nbBools)
+    pos = np.zeros((len(clauseList), nbWords), dtype=np.uint64)
+    neg = np.zeros((len(clauseList), nbWords), dtype=np.uint64)
+
+    for idx, clause in enumerate(clauseList):
+        posBools = np.zeros(nbBools, dtype=bool)
+        negBools = np.zeros(nbBools, dtype=bool)
+        for lit in clause:
+            if type(lit) == list:
+                continue
+            lit = int(lit)
+            if lit < nbVariables:
+                posBools[lit] = True
+            else:
+                negBools[lit - nbVariables] = True
+        pos[idx] = pack_bools(posBools, nbWords)
+        neg[idx] = pack_bools(negBools, nbWords)
+
+    return pos, neg
+
+
+def bool_part_sat(bits, pos, neg):
+    """
+    Check the Boolean half of clauses against a packed assignment.
+    Works on a single mask row or vectorized over a (nbClauses, nbWords)
+    mask matrix, in which case a boolean array over the clauses is returned.
+    """
+    ok = ((bits & pos) == pos) & ((bits & neg) == 0)
+    return ok.all(axis=-1)
+
+
+def pack_bool_rows(bools, nbWords):
+    """
+    Pack every row of a (n, nbBools) boolean matrix as pack_bools does.
+
+    Returns:
+        An (n, nbWords) uint64 array
+    """
+    bools = np.asarray(bools, dtype=bool)
+    packed = np.packbits(bools, axis=1, bitorder="little")
+    buf = np.zeros((bools.shape[0], 8 * nbWords), dtype=np.uint8)
+    buf[:, : packed.shape[1]] = packed
+    return buf.view(np.uint64)
@@ -0,0 +1,33 @@
+import os
+import numpy as np
+
+CHECKPOINT_VERSION = 3
+
+
+def write_npz(path, arrays):
+    """
+    Atomically write a dict of numpy arrays/scalars as an uncompressed npz.
+    The data goes to a temporary file in the same directory first and is
+    renamed over path, so a reader (or a preempted writer) never sees a
+    partially written file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_checkpoint(path, arrays):
+    """Write a checkpoint atomically (see write_npz)."""
+    write_npz(path, dict(arrays, version=CHECKPOINT_VERSION))
+
+
+def read_checkpoint(path):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+
+    if int(arrays.pop("version")) != CHECKPOINT_VERSION:
+        raise ValueError("Unsupported checkpoint version in " + path)
+    return arrays
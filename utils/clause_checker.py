@@ -0,0 +1,230 @@
+import numpy as np
+from utils.bool_masks import bool_part_sat
+
+OP_LE = 0
+OP_GE = 1
+OP_EQ = 2
+OP_TRUE = 3
+
+# Checker operator per utils.compiled_formula.OPERATORS code ("<" and ">"
+# are measure-equivalent to "<=" and ">=", "!" atoms are ignored)
+_OP_CODES = [OP_LE, OP_GE, OP_EQ, OP_LE, OP_GE, OP_TRUE]
+
+# Check ids below this value are the Boolean-mask and bounding-box checks,
+# LRA atom k of a clause has check id FIRST_ATOM + k
+CHECK_BOOLS = 0
+CHECK_BOX = 1
+FIRST_ATOM = 2
+
+
+class ClauseChecker:
+    """
+    Compiled clause checker with adaptive check ordering.
+
+    Every clause is split into independent checks: its Boolean masks, its
+    bounding box and each of its LRA atoms. A check is cheap if it touches
+    few values, and useful if it often rejects. For independent checks the
+    expected work per clause check is minimised by evaluating them in
+    increasing order of cost / P(reject), so the checker records how often
+    each check is run and how often it rejects, and every refreshInterval
+    clause checks recomputes the order of the clauses checked since.
+
+    All per-check state is flat: the checks of clause c are the slots
+    checkOffsets[c]..checkOffsets[c+1]-1 of the cost, statistics and order
+    arrays. The atoms are read from a CompiledFormula.
+    """
+
+    def __init__(
+        self,
+        formula,
+        boolPos,
+        boolNeg,
+        clauseBoxes,
+        refreshInterval=4096,
+    ):
+        self.nbBools = formula.nbBools
+        self.clauseBoxes = clauseBoxes
+        self.refreshInterval = refreshInterval
+        self.nbClauses = 0
+
+        self.atomOffsets = np.zeros(1, dtype=int)
+        self.termOffsets = np.zeros(1, dtype=int)
+        self.termVars = np.zeros(0, dtype=int)
+        self.termCoefs = np.zeros(0)
+        self.atomOps = np.zeros(0, dtype=int)
+        self.atomConsts = np.zeros(0)
+
+        self.checkOffsets = np.zeros(1, dtype=int)
+        self.checkClause = np.zeros(0, dtype=int)
+        self.checkIds = np.zeros(0, dtype=int)
+        self.costs = np.zeros(0)
+        self.attempts = np.zeros(0, dtype=np.int64)
+        self.failures = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=int)
+        self.dirty = set()
+        self.nbChecks = 0
+        self.addClauses(formula, boolPos, boolNeg)
+
+    def addClauses(self, formula, boolPos, boolNeg):
+        """
+        Take on the clauses of formula past the ones already known, for a
+        formula that extends the previous one (CompiledFormula.concatenate).
+        boolPos and boolNeg are the masks of all its clauses. Costs time
+        proportional to the new clauses, plus copying the per-check arrays.
+        """
+        self.boolPos = boolPos
+        self.boolNeg = boolNeg
+        first = self.nbClauses
+        clauses = np.arange(first, formula.nbClauses)
+        atomLo = formula.atomOffsets[first]
+        termLo = formula.termOffsets[atomLo]
+
+        self.atomOffsets = np.concatenate(
+            [self.atomOffsets, formula.atomOffsets[first + 1 :]]
+        )
+        self.termOffsets = np.concatenate(
+            [self.termOffsets, formula.termOffsets[atomLo + 1 :]]
+        )
+        self.termVars = np.concatenate(
+            [self.termVars, formula.termVars[termLo:] - self.nbBools]
+        )
+        self.termCoefs = np.concatenate(
+            [self.termCoefs, formula.termCoefs[termLo:]]
+        )
+        self.atomOps = np.concatenate(
+            [self.atomOps, np.array(_OP_CODES)[formula.atomOps[atomLo:]]]
+        )
+        self.atomConsts = np.concatenate(
+            [self.atomConsts, formula.atomConsts[atomLo:]]
+        )
+
+        counts = np.diff(formula.atomOffsets[first:]) + FIRST_ATOM
+        checkOffsets = self.checkOffsets[-1] + np.cumsum(counts)
+        checkClause = np.repeat(clauses, counts)
+        checkIds = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+
+        # The mask test is a couple of word operations, the box test
+        # touches every real, an atom touches its coefficients
+        nbReals = self.clauseBoxes.lower.shape[1]
+        isAtom = checkIds >= FIRST_ATOM
+        atomIdx = (formula.atomOffsets[checkClause] + checkIds)[
+            isAtom
+        ] - FIRST_ATOM
+        costs = np.where(checkIds == CHECK_BOOLS, 1.0, 1.0 + nbReals / 4.0)
+        costs[isAtom] = 1.0 + (
+            formula.termOffsets[atomIdx + 1] - formula.termOffsets[atomIdx]
+        )
+
+        self.checkOffsets = np.concatenate([self.checkOffsets, checkOffsets])
+        self.checkClause = np.concatenate([self.checkClause, checkClause])
+        self.checkIds = np.concatenate([self.checkIds, checkIds])
+        self.costs = np.concatenate([self.costs, costs])
+        self.attempts = np.concatenate(
+            [self.attempts, np.zeros(len(checkIds), dtype=np.int64)]
+        )
+        self.failures = np.concatenate(
+            [self.failures, np.zeros(len(checkIds), dtype=np.int64)]
+        )
+        self.order = np.concatenate([self.order, checkIds])
+        self.nbClauses = formula.nbClauses
+        self.refreshOrders(clauses)
+
+    def refreshOrders(self, clauses=None):
+        """Recompute the check order of the given (default: dirty) clauses."""
+        if clauses is None:
+            clauses = np.fromiter(self.dirty, dtype=int)
+        self.dirty = set()
+        # The slots are scattered back clause after clause in index order
+        clauses = np.unique(clauses)
+        if len(clauses) == 0:
+            return
+
+        # Slots of all checks of these clauses, clause after clause
+        starts = self.checkOffsets[clauses]
+        counts = self.checkOffsets[clauses + 1] - starts
+        slots = np.arange(counts.sum()) + np.repeat(
+            starts - (np.cumsum(counts) - counts), counts
+        )
+        attempts = self.attempts[slots]
+        failures = self.failures[slots]
+        # Laplace smoothing keeps unexplored checks from being starved
+        failRate = (failures + 1) / (attempts + 2)
+        keys = self.costs[slots] / failRate
+
+        # Stable sort by clause, then key within the clause
+        sortedSlots = slots[np.lexsort((keys, self.checkClause[slots]))]
+        self.order[slots] = self.checkIds[sortedSlots]
+
+    def getState(self):
+        """Check statistics as plain arrays (see setState)."""
+        return {
+            "attempts": self.attempts.copy(),
+            "failures": self.failures.copy(),
+        }
+
+    def setState(self, arrays):
+        """Restore the check statistics and the orders learned from them."""
+        self.attempts = np.array(arrays["attempts"], dtype=np.int64)
+        self.failures = np.array(arrays["failures"], dtype=np.int64)
+        self.refreshOrders(np.arange(self.nbClauses))
+
+    def orderOf(self, clauseIdx):
+        """Current check order of a clause, as a list of check ids."""
+        return self.order[
+            self.checkOffsets[clauseIdx] : self.checkOffsets[clauseIdx + 1]
+        ].tolist()
+
+    def evalAtom(self, sampledReals, atomIdx):
+        lo = self.termOffsets[atomIdx]
+        hi = self.termOffsets[atomIdx + 1]
+        var_sum = np.dot(
+            sampledReals[self.termVars[lo:hi]], self.termCoefs[lo:hi]
+        )
+
+        operator = self.atomOps[atomIdx]
+        constant = self.atomConsts[atomIdx]
+        if operator == OP_LE:
+            return var_sum <= constant
+        if operator == OP_GE:
+            return var_sum >= constant
+        if operator == OP_EQ:
+            return abs(var_sum - constant) <= 1e-9
+        return True
+
+    def evalCheck(self, sol, clauseIdx, check):
+        if check == CHECK_BOOLS:
+            return bool_part_sat(
+                sol[0], self.boolPos[clauseIdx], self.boolNeg[clauseIdx]
+            )
+        if check == CHECK_BOX:
+            return self.clauseBoxes.contains(clauseIdx, sol[1])
+        return self.evalAtom(
+            sol[1], self.atomOffsets[clauseIdx] + check - FIRST_ATOM
+        )
+
+    def check(self, sol, clauseIdx):
+        self.nbChecks += 1
+        if self.nbChecks % self.refreshInterval == 0:
+            self.refreshOrders()
+        self.dirty.add(clauseIdx)
+
+        attempts = self.attempts
+        offset = self.checkOffsets[clauseIdx]
+        end = self.checkOffsets[clauseIdx + 1]
+        for check in self.order[offset:end].tolist():
+            attempts[offset + check] += 1
+            if not self.evalCheck(sol, clauseIdx, check):
+                self.failures[offset + check] += 1
+                return False
+        return True
+
+    def checkAtoms(self, sampledReals, clauseIdx):
+        """Exact LRA test only, without touching the statistics."""
+        for atomIdx in range(
+            self.atomOffsets[clauseIdx], self.atomOffsets[clauseIdx + 1]
+        ):
+            if not self.evalAtom(sampledReals, atomIdx):
+                return False
+        return True
@@ -0,0 +1,179 @@
+import numpy as np
+
+
+class AliasTable:
+    """
+    Walker's alias method for drawing clause indices proportionally to a
+    fixed array of weights. Construction is O(m), every draw is O(1).
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        self.size = len(weights)
+        self.total = weights.sum()
+
+        self.prob = np.ones(self.size)
+        self.alias = np.arange(self.size)
+        if self.size == 0 or self.total <= 0:
+            return
+
+        scaled = weights * (self.size / self.total)
+        small = [i for i in range(self.size) if scaled[i] < 1.0]
+        large = [i for i in range(self.size) if scaled[i] >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Whatever is left is 1 up to floating point error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=None):
+        rng = np.random if rng is None else rng
+        i = rng.randint(self.size)
+        if rng.uniform() < self.prob[i]:
+            return i
+        return self.alias[i]
+
+    def sample_many(self, count, rng=None):
+        rng = np.random if rng is None else rng
+        idx = rng.randint(self.size, size=count)
+        keep = rng.uniform(size=count) < self.prob[idx]
+        return np.where(keep, idx, self.alias[idx])
+
+
+class FenwickTree:
+    """
+    Binary indexed tree over clause weights. Supports O(log m) weight
+    updates, appends (amortized: the weights are kept in a buffer of
+    capacity entries, and the tree is rebuilt only when the buffer doubles)
+    and proportional draws, for solvers whose clause set changes between
+    queries. A removed clause is simply given weight 0.
+    """
+
+    def __init__(self, weights=()):
+        weights = np.asarray(weights, dtype=float)
+        self.size = len(weights)
+        self.capacity = 1
+        while self.capacity < max(self.size, 1):
+            self.capacity *= 2
+        # Only the first size entries are weights of clauses
+        self.weights = np.zeros(self.capacity)
+        self.weights[: self.size] = weights
+        self._build()
+
+    def _build(self):
+        self.tree = np.zeros(self.capacity + 1)
+        self.tree[1:] = self.weights
+        for i in range(1, self.capacity + 1):
+            parent = i + (i & -i)
+            if parent <= self.capacity:
+                self.tree[parent] += self.tree[i]
+
+    @property
+    def total(self):
+        return self.tree[self.capacity]
+
+    def update(self, idx, weight):
+        delta = weight - self.weights[idx]
+        self.weights[idx] = weight
+        i = idx + 1
+        while i <= self.capacity:
+            self.tree[i] += delta
+            i += i & -i
+
+    def append(self, weight):
+        if self.size == self.capacity:
+            self.capacity *= 2
+            self.weights = np.concatenate(
+                [self.weights, np.zeros(self.capacity - self.size)]
+            )
+            self.weights[self.size] = weight
+            self.size += 1
+            self._build()
+        else:
+            self.size += 1
+            self.update(self.size - 1, weight)
+        return self.size - 1
+
+    def prefix_sum(self, idx):
+        """Sum of the weights of clauses 0..idx-1."""
+        ret = 0.0
+        while idx > 0:
+            ret += self.tree[idx]
+            idx -= idx & -idx
+        return ret
+
+    def find(self, target):
+        """Smallest index whose prefix sum (inclusive) exceeds target."""
+        pos = 0
+        step = self.capacity
+        while step > 0:
+            nxt = pos + step
+            if nxt <= self.capacity and self.tree[nxt] <= target:
+                pos = nxt
+                target -= self.tree[nxt]
+            step //= 2
+        return min(pos, self.size - 1)
+
+    def sample(self, rng=None):
+        rng = np.random if rng is None else rng
+        idx = self.find(rng.uniform() * self.total)
+        # Guard against landing on a zero-weight clause due to rounding
+        while self.weights[idx] <= 0 and idx > 0:
+            idx -= 1
+        return idx
+
+    def sample_many(self, count, rng=None):
+        return np.array(
+            [self.sample(rng) for _ in range(count)], dtype=int
+        )
+
+
+class StratifiedSelector:
+    """
+    Stratified (systematic) clause selection. Draws come in blocks of
+    blockSize: one uniform offset u gives the points (k + u) / blockSize,
+    which are mapped through the cumulative clause probabilities, so that
+    within a block every clause is drawn floor or ceil of blockSize * p
+    times. The block is shuffled before it is handed out one draw at a time.
+    """
+
+    def __init__(self, weights, blockSize=1024):
+        weights = np.asarray(weights, dtype=float)
+        self.size = len(weights)
+        self.total = weights.sum()
+        self.cumulative = np.cumsum(weights) / self.total
+        self.blockSize = blockSize
+        self.block = np.zeros(0, dtype=int)
+        self.pos = 0
+
+    def _refill(self, rng):
+        points = (np.arange(self.blockSize) + rng.uniform()) / (
+            self.blockSize
+        )
+        self.block = np.minimum(
+            np.searchsorted(self.cumulative, points, side="right"),
+            self.size - 1,
+        )
+        rng.shuffle(self.block)
+        self.pos = 0
+
+    def sample(self, rng=None):
+        if self.pos == len(self.block):
+            self._refill(np.random if rng is None else rng)
+        self.pos += 1
+        return self.block[self.pos - 1]
+
+    def sample_many(self, count, rng=None):
+        return np.array(
+            [self.sample(rng) for _ in range(count)], dtype=int
+        )
@@ -0,0 +1,313 @@
+import hashlib
+import numpy as np
+from utils.bool_masks import nb_words
+
+# Comparison operators of LRA atoms, by code. The first three codes match
+# the OP_LE / OP_GE / OP_EQ codes of the clause checker.
+OPERATORS = ["<=", ">=", "=", "<", ">", "!"]
+_OPERATOR_CODES = {op: code for code, op in enumerate(OPERATORS)}
+OP_EQ = _OPERATOR_CODES["="]
+OP_IGNORE = _OPERATOR_CODES["!"]
+# Sign that turns an atom into a <= row (the "!" atom has no row)
+_ROW_SIGNS = np.array([1.0, -1.0, 1.0, 1.0, -1.0, 0.0])
+
+# Arrays that make up a compiled formula, in file order
+ARRAY_NAMES = [
+    "litOffsets",
+    "lits",
+    "atomOffsets",
+    "termOffsets",
+    "termVars",
+    "termCoefs",
+    "atomOps",
+    "atomConsts",
+]
+
+
+def _number(x):
+    # Integral values go back to ints, so that LattE's precision scaling
+    # sees the same input as for the original formula
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+
+class CompiledFormula:
+    """
+    Columnar (CSR) representation of a DNF formula.
+
+    Clause c has the Boolean literals lits[litOffsets[c]:litOffsets[c+1]]
+    (same int encoding as the clause lists: lit < nbVariables is positive,
+    lit >= nbVariables negates lit - nbVariables) and the LRA atoms
+    atomOffsets[c]..atomOffsets[c+1]-1. Atom a is
+
+        sum(termCoefs[k] * x[termVars[k]]) OPERATORS[atomOps[a]] atomConsts[a]
+
+    for k in termOffsets[a]..termOffsets[a+1]-1, where termVars are variable
+    indices (nbBools..nbVariables-1) as in the clause lists.
+
+    The arrays can be memory-mapped (see utils.instance_io), so large
+    formulas are never turned into Python objects.
+    """
+
+    def __init__(
+        self,
+        nbBools,
+        nbReals,
+        litOffsets,
+        lits,
+        atomOffsets,
+        termOffsets,
+        termVars,
+        termCoefs,
+        atomOps,
+        atomConsts,
+    ):
+        self.nbBools = int(nbBools)
+        self.nbReals = int(nbReals)
+        self.nbVariables = self.nbBools + self.nbReals
+        self.litOffsets = litOffsets
+        self.lits = lits
+        self.atomOffsets = atomOffsets
+        self.termOffsets = termOffsets
+        self.termVars = termVars
+        self.termCoefs = termCoefs
+        self.atomOps = atomOps
+        self.atomConsts = atomConsts
+        self.validate()
+
+    @property
+    def nbClauses(self):
+        return len(self.litOffsets) - 1
+
+    @property
+    def nbAtoms(self):
+        return len(self.atomOps)
+
+    def validate(self):
+        """Check the arrays are consistent, raising ValueError otherwise."""
+
+        def offsets(name, arr, size):
+            if len(arr) == 0 or arr[0] != 0 or arr[-1] != size:
+                raise ValueError("Bad offsets in " + name)
+            if np.any(np.diff(arr) < 0):
+                raise ValueError("Decreasing offsets in " + name)
+
+        offsets("litOffsets", self.litOffsets, len(self.lits))
+        offsets("atomOffsets", self.atomOffsets, self.nbAtoms)
+        offsets("termOffsets", self.termOffsets, len(self.termVars))
+        if self.atomOffsets.shape != self.litOffsets.shape:
+            raise ValueError("litOffsets and atomOffsets differ in length")
+        if len(self.atomConsts) != self.nbAtoms:
+            raise ValueError("atomOps and atomConsts differ in length")
+        if len(self.termCoefs) != len(self.termVars):
+            raise ValueError("termVars and termCoefs differ in length")
+
+        negated = self.lits - self.nbVariables
+        var = np.where(self.lits < self.nbVariables, self.lits, negated)
+        if np.any(self.lits < 0) or np.any(var >= self.nbBools):
+            raise ValueError("Boolean literal out of range")
+        if np.any(self.termVars < self.nbBools) or np.any(
+            self.termVars >= self.nbVariables
+        ):
+            raise ValueError("Real variable out of range")
+        if np.any(self.atomOps < 0) or np.any(
+            self.atomOps >= len(OPERATORS)
+        ):
+            raise ValueError("Unknown operator code")
+
+    @classmethod
+    def fromClauseList(cls, clauseList, nbBools, nbReals):
+        """Compile a formula given as a list of clauses."""
+        builder = FormulaBuilder(nbBools, nbReals)
+        for clause in clauseList:
+            builder.addClause(clause)
+        return builder.build()
+
+    @classmethod
+    def fromArrays(cls, arrays):
+        """Inverse of toArrays (arrays may be memory-mapped)."""
+        return cls(
+            int(arrays["nbBools"]),
+            int(arrays["nbReals"]),
+            *[arrays[name] for name in ARRAY_NAMES]
+        )
+
+    def toArrays(self):
+        arrays = {name: getattr(self, name) for name in ARRAY_NAMES}
+        arrays["nbBools"] = np.int64(self.nbBools)
+        arrays["nbReals"] = np.int64(self.nbReals)
+        return arrays
+
+    def fingerprint(self):
+        """Hex digest of the formula, equal for equal formulas."""
+        digest = hashlib.sha1()
+        for name, array in sorted(self.toArrays().items()):
+            array = np.asarray(array)
+            kind = np.float64 if array.dtype.kind == "f" else np.int64
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(array, dtype=kind).tobytes())
+        return digest.hexdigest()
+
+    def clauseLits(self, idx):
+        return self.lits[self.litOffsets[idx] : self.litOffsets[idx + 1]]
+
+    def atom(self, a):
+        """LRA atom a in list form, [(var, coef)..., (op, const)]."""
+        lo, hi = self.termOffsets[a], self.termOffsets[a + 1]
+        return [
+            (int(i), _number(v))
+            for i, v in zip(self.termVars[lo:hi], self.termCoefs[lo:hi])
+        ] + [(OPERATORS[self.atomOps[a]], _number(self.atomConsts[a]))]
+
+    def clauseAtoms(self, idx):
+        """LRA atoms of clause idx in list form (e.g. for LattE)."""
+        return [
+            self.atom(a)
+            for a in range(self.atomOffsets[idx], self.atomOffsets[idx + 1])
+        ]
+
+    def clauseRows(self, idx):
+        """
+        The LRA atoms of clause idx as dense rows A x <= b over the reals.
+        An equality gives the row and its negation, "!" atoms give none.
+
+        Returns:
+            (A, b) with A of shape (nbRows, nbReals)
+        """
+        lo, hi = self.atomOffsets[idx], self.atomOffsets[idx + 1]
+        ops = self.atomOps[lo:hi]
+        rows = np.zeros((hi - lo, self.nbReals))
+        termLo, termHi = self.termOffsets[lo], self.termOffsets[hi]
+        atomOfTerm = np.repeat(
+            np.arange(hi - lo), np.diff(self.termOffsets[lo : hi + 1])
+        )
+        rows[atomOfTerm, self.termVars[termLo:termHi] - self.nbBools] = (
+            self.termCoefs[termLo:termHi]
+        )
+        signs = _ROW_SIGNS[ops]
+
+        # Row k is repeated once per output row, negated the second time
+        repeats = np.where(ops == OP_EQ, 2, np.where(ops == OP_IGNORE, 0, 1))
+        rowIdx = np.repeat(np.arange(hi - lo), repeats)
+        rowSigns = signs[rowIdx]
+        rowSigns[1:][rowIdx[1:] == rowIdx[:-1]] *= -1
+        return (
+            rows[rowIdx] * rowSigns[:, None],
+            self.atomConsts[lo:hi][rowIdx] * rowSigns,
+        )
+
+    def clause(self, idx):
+        """Clause idx in list form (literals first, then atoms)."""
+        return [
+            int(lit) for lit in self.clauseLits(idx)
+        ] + self.clauseAtoms(idx)
+
+    def toClauseList(self):
+        return [self.clause(idx) for idx in range(self.nbClauses)]
+
+    def concatenate(self, other):
+        """New formula with the clauses of other after those of self."""
+        if (other.nbBools, other.nbReals) != (self.nbBools, self.nbReals):
+            raise ValueError("Formulas over different variables")
+        return CompiledFormula(
+            self.nbBools,
+            self.nbReals,
+            np.concatenate(
+                [self.litOffsets, other.litOffsets[1:] + len(self.lits)]
+            ),
+            np.concatenate([self.lits, other.lits]),
+            np.concatenate(
+                [self.atomOffsets, other.atomOffsets[1:] + self.nbAtoms]
+            ),
+            np.concatenate(
+                [
+                    self.termOffsets,
+                    other.termOffsets[1:] + len(self.termVars),
+                ]
+            ),
+            np.concatenate([self.termVars, other.termVars]),
+            np.concatenate([self.termCoefs, other.termCoefs]),
+            np.concatenate([self.atomOps, other.atomOps]),
+            np.concatenate([self.atomConsts, other.atomConsts]),
+        )
+
+    def boolMasks(self):
+        """
+        Packed Boolean masks of every clause, as compile_clause_masks, built
+        directly from the literal arrays.
+        """
+        nbWords = nb_words(self.nbBools)
+        pos = np.zeros((self.nbClauses, nbWords), dtype=np.uint64)
+        neg = np.zeros((self.nbClauses, nbWords), dtype=np.uint64)
+
+        lits = np.asarray(self.lits, dtype=np.int64)
+        clauseIdx = np.repeat(
+            np.arange(self.nbClauses), np.diff(self.litOffsets)
+        )
+        positive = lits < self.nbVariables
+        var = np.where(positive, lits, lits - self.nbVariables)
+        words = var // 64
+        bits = np.left_shift(np.uint64(1), (var % 64).astype(np.uint64))
+        np.bitwise_or.at(
+            pos, (clauseIdx[positive], words[positive]), bits[positive]
+        )
+        np.bitwise_or.at(
+            neg, (clauseIdx[~positive], words[~positive]), bits[~positive]
+        )
+        return pos, neg
+
+
+class FormulaBuilder:
+    """Incrementally builds a CompiledFormula, one clause at a time."""
+
+    def __init__(self, nbBools, nbReals):
+        self.nbBools = nbBools
+        self.nbReals = nbReals
+        self.litOffsets = [0]
+        self.lits = []
+        self.atomOffsets = [0]
+        self.termOffsets = [0]
+        self.termVars = []
+        self.termCoefs = []
+        self.atomOps = []
+        self.atomConsts = []
+
+    def addAtom(self, terms, op, const):
+        if op not in _OPERATOR_CODES:
+            raise ValueError("Unknown operator: " + repr(op))
+        for i, v in terms:
+            self.termVars.append(int(i))
+            self.termCoefs.append(float(v))
+        self.termOffsets.append(len(self.termVars))
+        self.atomOps.append(_OPERATOR_CODES[op])
+        self.atomConsts.append(float(const))
+
+    def addClause(self, clause):
+        """Add a clause in list form (int literals and LRA atoms)."""
+        for item in clause:
+            if isinstance(item, (list, tuple)):
+                if len(item) == 0 or len(item[-1]) != 2:
+                    raise ValueError("Malformed LRA atom: " + repr(item))
+                self.addAtom(item[:-1], item[-1][0], item[-1][1])
+            elif isinstance(item, (int, np.integer)) and not isinstance(
+                item, bool
+            ):
+                self.lits.append(int(item))
+            else:
+                raise ValueError("Malformed literal: " + repr(item))
+        self.litOffsets.append(len(self.lits))
+        self.atomOffsets.append(len(self.atomOps))
+
+    def build(self):
+        return CompiledFormula(
+            self.nbBools,
+            self.nbReals,
+            np.array(self.litOffsets, dtype=np.int64),
+            np.array(self.lits, dtype=np.int64),
+            np.array(self.atomOffsets, dtype=np.int64),
+            np.array(self.termOffsets, dtype=np.int64),
+            np.array(self.termVars, dtype=np.int64),
+            np.array(self.termCoefs, dtype=float),
+            np.array(self.atomOps, dtype=np.int8),
+            np.array(self.atomConsts, dtype=float),
+        )
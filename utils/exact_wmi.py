@@ -0,0 +1,285 @@
+import math
+import numpy as np
+from scipy.optimize import linprog
+from scipy.spatial import Delaunay, HalfspaceIntersection
+from utils.compiled_formula import CompiledFormula
+
+# Polytopes whose largest inscribed ball has a smaller radius are treated
+# as empty (they have no volume)
+MIN_RADIUS = 1e-9
+
+
+def universe_rows(universeReals):
+    """Universe bounds in A x <= b form, as (A, b)."""
+    return (
+        -universeReals.A.astype(float),
+        -universeReals.b.astype(float),
+    )
+
+
+def chebyshev_ball(A, b):
+    """
+    Center and radius of the largest ball inside the polytope A x <= b.
+
+    Returns:
+        (center, radius), or (None, 0.0) if the polytope is empty
+    """
+    norms = np.linalg.norm(A, axis=1)
+    c = np.zeros(A.shape[1] + 1)
+    c[-1] = -1
+    result = linprog(
+        c,
+        A_ub=np.hstack([A, norms[:, None]]),
+        b_ub=b,
+        bounds=[(None, None)] * A.shape[1] + [(0, None)],
+        method="highs",
+    )
+    if not result.success:
+        return None, 0.0
+    return result.x[:-1], result.x[-1]
+
+
+def polytope_simplices(A, b):
+    """
+    Triangulation of the bounded polytope A x <= b.
+
+    Returns:
+        An array of shape (nbSimplices, dim + 1, dim) of simplex vertices
+        (empty if the polytope has no volume)
+    """
+    dim = A.shape[1]
+    center, radius = chebyshev_ball(A, b)
+    if radius <= MIN_RADIUS:
+        return np.zeros((0, dim + 1, dim))
+    if dim == 1:
+        a = A[:, 0]
+        lower = (b[a < 0] / a[a < 0]).max()
+        upper = (b[a > 0] / a[a > 0]).min()
+        return np.array([[[lower], [upper]]])
+    vertices = HalfspaceIntersection(
+        np.hstack([A, -b[:, None]]), center
+    ).intersections
+    return vertices[Delaunay(vertices).simplices]
+
+
+def _poly_mul(p, q):
+    # Polynomials are dicts exponent tuple -> coefficient
+    product = {}
+    for ep, cp in p.items():
+        for eq, cq in q.items():
+            e = tuple(i + j for i, j in zip(ep, eq))
+            product[e] = product.get(e, 0.0) + cp * cq
+    return product
+
+
+def simplex_integral(vertices, monomials):
+    """
+    Exact integral of a polynomial over a simplex. The simplex is mapped to
+    the standard simplex, where every monomial integrates to
+    prod(a_i!) / (n + sum(a_i))!.
+
+    Args:
+        vertices: The n + 1 vertices of the simplex, shape (n + 1, n)
+        monomials: The polynomial, as a list of [coef, powers]
+
+    Returns:
+        The integral.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    n = vertices.shape[1]
+    origin = vertices[0]
+    edges = (vertices[1:] - origin).T
+    jacobian = abs(np.linalg.det(edges))
+    if jacobian == 0:
+        return 0.0
+
+    # x_j = origin_j + sum_i edges[j, i] * y_i, as a polynomial in y
+    zero = (0,) * n
+    linear = []
+    for j in range(n):
+        form = {zero: origin[j]}
+        for i in range(n):
+            unit = tuple(int(k == i) for k in range(n))
+            form[unit] = edges[j, i]
+        linear.append(form)
+
+    polynomial = {}
+    for coef, powers in monomials:
+        term = {zero: float(coef)}
+        for j, power in enumerate(powers):
+            for _ in range(power):
+                term = _poly_mul(term, linear[j])
+        for e, c in term.items():
+            polynomial[e] = polynomial.get(e, 0.0) + c
+
+    total = 0.0
+    for e, c in polynomial.items():
+        numerator = np.prod([math.factorial(a) for a in e])
+        total += c * numerator / math.factorial(n + sum(e))
+    return jacobian * total
+
+
+def polytope_integral(A, b, monomials, universeReals):
+    """
+    Exact integral of a polynomial over the polytope A x <= b intersected
+    with the universe, by triangulation. Meant for the few real variables
+    of test and benchmark instances (LattE does the real work).
+
+    Args:
+        A: Constraint matrix A x <= b over all reals (see clause_rows)
+        b: Right-hand side vector
+        monomials: The polynomial, as a list of [coef, powers]
+        universeReals: Universe bounds for real variables
+
+    Returns:
+        The integral.
+    """
+    universeA, universeB = universe_rows(universeReals)
+    simplices = polytope_simplices(
+        np.vstack([A, universeA]), np.concatenate([b, universeB])
+    )
+    return sum(simplex_integral(s, monomials) for s in simplices)
+
+
+def _literal_weight(pos, neg, boolWeights):
+    if pos & neg:
+        return 0.0
+    return float(
+        np.prod([boolWeights[v] for v in pos])
+        * np.prod([1 - boolWeights[v] for v in neg])
+    )
+
+
+def _clause_parts(formula, idx):
+    lits = formula.clauseLits(idx)
+    negated = lits >= formula.nbVariables
+    pos = frozenset(int(v) for v in lits[~negated])
+    neg = frozenset(int(v) - formula.nbVariables for v in lits[negated])
+    A, b = formula.clauseRows(idx)
+    return pos, neg, A, b
+
+
+def _compile(clauseList, nbBools, universeReals):
+    if isinstance(clauseList, CompiledFormula):
+        return clauseList
+    return CompiledFormula.fromClauseList(
+        clauseList, nbBools, universeReals.nbReals
+    )
+
+
+def exact_clause_weights(clauseList, nbBools, universeReals, weightFunction):
+    """
+    Exact weight of every clause, as the solver's computeClauseWeights
+    gets from LattE.
+
+    Returns:
+        The weights as an array.
+    """
+    formula = _compile(clauseList, nbBools, universeReals)
+    weights = []
+    for idx in range(formula.nbClauses):
+        pos, neg, A, b = _clause_parts(formula, idx)
+        boolWeight = _literal_weight(pos, neg, weightFunction.boolWeights)
+        weights.append(
+            boolWeight
+            * polytope_integral(A, b, weightFunction.f, universeReals)
+            if boolWeight > 0
+            else 0.0
+        )
+    return np.array(weights)
+
+
+def inclusion_exclusion(
+    nbClauses, join, empty, neighbours=None, maxTerms=None
+):
+    """
+    Sum over every non-empty set S of clauses of (-1)^(|S|+1) * WMI(S).
+    Sets are grown one clause at a time: join(state, idx) adds clause idx
+    to the set described by state and returns (WMI of the new set, its
+    state), or None if the new set is unsatisfiable. Such a set is never
+    grown, since no superset can contribute.
+
+    Args:
+        nbClauses: Number of clauses, numbered 0 .. nbClauses - 1
+        join: The callback above
+        empty: State of the empty set
+        neighbours: Optional, for every clause a bitmask (int) of the
+            clauses that may hold together with it; the others never join
+            a set containing it
+        maxTerms: Give up (ValueError) after this many non-empty terms
+
+    Returns:
+        The sum, as a float.
+    """
+    total = 0.0
+    nbTerms = 0
+    # Depth-first, clauses join in decreasing order:
+    # (sign of the terms, clauses that may still join, state)
+    stack = [(1.0, (1 << nbClauses) - 1, empty)]
+    while stack:
+        sign, candidates, state = stack.pop()
+        while candidates:
+            idx = candidates.bit_length() - 1
+            candidates &= ~(1 << idx)
+            joined = join(state, idx)
+            if joined is None:
+                continue
+            nbTerms += 1
+            if maxTerms is not None and nbTerms > maxTerms:
+                raise ValueError(
+                    "More than " + str(maxTerms) + " intersection terms"
+                )
+            weight, newState = joined
+            total += sign * weight
+            grow = candidates
+            if neighbours is not None:
+                grow &= neighbours[idx]
+            stack.append((-sign, grow, newState))
+    return float(total)
+
+
+def exact_wmi(
+    clauseList, nbBools, universeReals, weightFunction, maxTerms=100000
+):
+    """
+    Exact WMI of a DNF by inclusion-exclusion over clause intersections:
+    the sum over every non-empty set S of clauses of
+    (-1)^(|S|+1) * WMI(conjunction of S). Sets are grown one clause at a
+    time, and a set whose conjunction is unsatisfiable (clashing literals
+    or a polytope with no volume) is never grown, since no superset can
+    contribute. Only for small formulas: the number of terms can grow as
+    2^nbClauses.
+
+    Args:
+        clauseList: The DNF, as a clause list or a CompiledFormula
+        nbBools: Number of Boolean variables
+        universeReals: Universe bounds for real variables
+        weightFunction: The weight function
+        maxTerms: Give up (ValueError) after this many non-empty terms
+
+    Returns:
+        The WMI.
+    """
+    formula = _compile(clauseList, nbBools, universeReals)
+    clauses = [_clause_parts(formula, idx) for idx in range(formula.nbClauses)]
+    boolWeights = weightFunction.boolWeights
+
+    def join(state, idx):
+        pos, neg, A, b = state
+        clausePos, clauseNeg, clauseA, clauseB = clauses[idx]
+        newPos, newNeg = pos | clausePos, neg | clauseNeg
+        boolWeight = _literal_weight(newPos, newNeg, boolWeights)
+        if boolWeight == 0:
+            return None
+        newA = np.vstack([clauseA, A])
+        newB = np.concatenate([clauseB, b])
+        simplices = polytope_simplices(newA, newB)
+        if len(simplices) == 0:
+            return None
+        weight = boolWeight * sum(
+            simplex_integral(s, weightFunction.f) for s in simplices
+        )
+        return weight, (newPos, newNeg, newA, newB)
+
+    empty = (frozenset(), frozenset()) + universe_rows(universeReals)
+    return inclusion_exclusion(len(clauses), join, empty, maxTerms=maxTerms)
@@ -0,0 +1,221 @@
+import ast
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+from numpy.lib import format as npy_format
+from utils.compiled_formula import CompiledFormula, FormulaBuilder
+from utils.reals_universe import RealsUniverse
+from utils.weight_function import WeightFunction
+
+INSTANCE_VERSION = 1
+
+
+class Instance:
+    """
+    A WMI instance: the compiled formula, the box of the reals, an optional
+    weight function (None if the instance leaves it to the caller) and
+    free-form metadata (e.g. generation parameters).
+    """
+
+    def __init__(self, formula, universeReals, weightFunction=None, meta=None):
+        self.formula = formula
+        self.universeReals = universeReals
+        self.weightFunction = weightFunction
+        self.meta = {} if meta is None else meta
+
+    def header(self):
+        header = {
+            "version": INSTANCE_VERSION,
+            "nbBools": self.formula.nbBools,
+            "nbReals": self.formula.nbReals,
+            "nbClauses": self.formula.nbClauses,
+            "lowerBound": self.universeReals.lowerBound,
+            "upperBound": self.universeReals.upperBound,
+            "meta": self.meta,
+        }
+        if self.weightFunction is not None:
+            header["weightFunction"] = {
+                "monomials": [
+                    [_plain(coef), [int(p) for p in powers]]
+                    for coef, powers in self.weightFunction.f
+                ],
+                "boolWeights": [
+                    float(w) for w in self.weightFunction.boolWeights
+                ],
+            }
+        return header
+
+    def fingerprint(self):
+        """
+        Hex digest of the formula, the box of the reals and the weight
+        function, equal for instances that define the same WMI problem
+        (whatever their metadata).
+        """
+        header = self.header()
+        for name in ["version", "meta"]:
+            del header[name]
+        digest = hashlib.sha1(self.formula.fingerprint().encode())
+        digest.update(json.dumps(header, sort_keys=True).encode())
+        return digest.hexdigest()
+
+
+def _plain(x):
+    # numpy scalars are not JSON serializable
+    return x.item() if isinstance(x, np.generic) else x
+
+
+def _from_header(header, formula):
+    if header.get("version") != INSTANCE_VERSION:
+        raise ValueError("Unsupported instance version")
+    wf = header.get("weightFunction")
+    if wf is not None:
+        wf = WeightFunction(wf["monomials"], np.array(wf["boolWeights"]))
+    universe = RealsUniverse(
+        formula.nbReals,
+        lowerBound=header.get("lowerBound", 0),
+        upperBound=header.get("upperBound", 10),
+    )
+    return Instance(formula, universe, wf, header.get("meta"))
+
+
+def write_json_instance(path, instance):
+    """
+    Human-readable encoding: a JSON header object on the first line, then
+    one clause per line in list form, e.g. [0, 5, [[3, 1.5], ["<=", 2]]].
+    """
+    formula = instance.formula
+    with open(path, "w") as f:
+        f.write(json.dumps(instance.header()) + "\n")
+        for idx in range(formula.nbClauses):
+            f.write(json.dumps(formula.clause(idx)) + "\n")
+
+
+def read_json_instance(path):
+    """
+    Read a file written by write_json_instance. Clauses are parsed one line
+    at a time straight into the formula arrays.
+    """
+    with open(path, "r") as f:
+        header = json.loads(f.readline())
+        builder = FormulaBuilder(header["nbBools"], header["nbReals"])
+        for line in f:
+            if line.strip():
+                builder.addClause(json.loads(line))
+    formula = builder.build()
+    if formula.nbClauses != header.get("nbClauses", formula.nbClauses):
+        raise ValueError("Truncated instance file: " + path)
+    return _from_header(header, formula)
+
+
+def instance_arrays(instance):
+    """The arrays of the binary encoding: the formula and the header."""
+    arrays = instance.formula.toArrays()
+    arrays["header"] = np.array(json.dumps(instance.header()))
+    return arrays
+
+
+def instance_from_arrays(arrays):
+    """Inverse of instance_arrays (other arrays are ignored)."""
+    header = json.loads(str(arrays["header"]))
+    return _from_header(header, CompiledFormula.fromArrays(arrays))
+
+
+def write_binary_instance(path, instance):
+    """
+    Columnar encoding: the formula arrays and the JSON header in an
+    uncompressed npz, so that read_binary_instance can memory-map them.
+    """
+    with open(path, "wb") as f:
+        np.savez(f, **instance_arrays(instance))
+
+
+def read_binary_instance(path, mmap=True):
+    """
+    Read a file written by write_binary_instance. With mmap=True the
+    formula arrays are read-only views of the file rather than copies.
+    """
+    return instance_from_arrays(read_npz(path, mmap))
+
+
+def read_npz(path, mmap=True, writable=False):
+    """
+    Every member of an uncompressed npz, as a dict of arrays. With
+    mmap=True they are views of the file rather than copies: read-only,
+    or copy-on-write if writable (writes stay in memory).
+    """
+    if mmap:
+        return _mmap_npz(path, "c" if writable else "r")
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _mmap_npz(path, mode="r"):
+    """
+    Memory-map every member of an uncompressed npz. Members of an
+    uncompressed zip are stored contiguously, so each one is a .npy file
+    at a fixed offset of the archive.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("Compressed npz cannot be memory-mapped")
+            # Local file header: 30 fixed bytes, then name and extra field
+            f.seek(info.header_offset + 26)
+            nameLen, extraLen = np.frombuffer(f.read(4), dtype="<u2")
+            start = info.header_offset + 30 + int(nameLen) + int(extraLen)
+            f.seek(start)
+            version = npy_format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = npy_format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = npy_format.read_array_header_2_0(f)
+            name = info.filename[: -len(".npy")]
+            if dtype.hasobject:
+                raise ValueError("Object arrays are not supported")
+            if shape == () or 0 in shape:
+                # np.memmap cannot map scalars and empty arrays
+                f.seek(start)
+                arrays[name] = npy_format.read_array(f)
+                continue
+            arrays[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode=mode,
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran else "C",
+            )
+    return arrays
+
+
+def read_legacy_instance(path):
+    """
+    Read the first line of an instance file in the original format, a
+    Python literal [formula string, nbReals, nbBools, <generation
+    parameters>...]. Parsed with ast.literal_eval, so unlike eval it cannot
+    run code; prefer the JSON and binary encodings for large formulas.
+    """
+    with open(path, "r") as f:
+        test = ast.literal_eval(f.readline())
+    clauseList = test[0]
+    if isinstance(clauseList, str):
+        clauseList = ast.literal_eval(clauseList)
+    nbReals = int(test[1])
+    nbBools = int(test[2])
+    formula = CompiledFormula.fromClauseList(clauseList, nbBools, nbReals)
+    return Instance(
+        formula, RealsUniverse(nbReals), meta={"parameters": list(test[3:])}
+    )
+
+
+def load_instance(path, mmap=True):
+    """Read an instance in any of the encodings, chosen by extension."""
+    ext = os.path.splitext(path)[1]
+    if ext == ".npz":
+        return read_binary_instance(path, mmap)
+    if ext in [".json", ".jsonl"]:
+        return read_json_instance(path)
+    return read_legacy_instance(path)
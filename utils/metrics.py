@@ -0,0 +1,104 @@
+import json
+import time
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Counters and timers of the solve pipeline, keyed by phase name.
+
+    A timer accumulates the number of timed events and their total wall
+    time; a counter is a plain running sum (e.g. bytes written). Pass an
+    instance to SimpleWMISolver to collect them, query it with get or
+    snapshot during or after a run and export it with writeJSON.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add(self, name, seconds, events=1):
+        """Record events timed events that took seconds in total."""
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [events, seconds]
+        else:
+            timer[0] += events
+            timer[1] += seconds
+
+    def timer(self, name):
+        """Context manager timing its block as one event of name."""
+        return _Timer(self, name)
+
+    def get(self, name):
+        """A counter's value, or a timer's (count, seconds)."""
+        if name in self.timers:
+            return tuple(self.timers[name])
+        return self.counters.get(name, 0)
+
+    def reset(self):
+        self.counters = {}
+        self.timers = {}
+
+    def snapshot(self):
+        """The metrics as a JSON-friendly dict."""
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {
+                name: {"count": count, "seconds": seconds}
+                for name, (count, seconds) in sorted(self.timers.items())
+            },
+        }
+
+    def writeJSON(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+            f.write("\n")
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics(Metrics):
+    """
+    Metrics that record nothing, the default everywhere. Hot loops check
+    `enabled` and skip their timing code altogether.
+    """
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def count(self, name, value=1):
+        pass
+
+    def add(self, name, seconds, events=1):
+        pass
+
+    def timer(self, name):
+        return self._timer
+
+
+NULL_METRICS = NullMetrics()
@@ -3,18 +3,32 @@
 
 import numpy as np
 from scipy.optimize import linprog
+from utils.metrics import NULL_METRICS
 
 
-def hit_and_run(a, b, x, w, eps):
+def hit_and_run(
+    a, b, x, w, eps, directions=None, rng=None, metrics=NULL_METRICS
+):
     # Part of https://github.com/jonls/dikin_walk is used
-    """Generate points with Hit-and-run algorithm."""
+    """Generate points with Hit-and-run algorithm.
+
+    `directions`, if given, supplies the walk directions (see
+    utils.quasi_random.QuasiRandomDirections) instead of Gaussian draws.
+    `rng` is the source of randomness (utils.random_streams.BufferedRandom),
+    the global np.random state if None. Steps and weight evaluations are
+    counted in `metrics`.
+    """
+    rng = np.random if rng is None else rng
 
     if not (a.dot(x[:-1]) <= b).all():
         print(a.dot(x[:-1]) - b)
         raise Exception("Invalid state: {}".format(x))
 
-    d = np.random.normal(size=(a.shape[1] + 1))
-    d /= np.linalg.norm(d)
+    if directions is None:
+        d = rng.normal(size=(a.shape[1] + 1))
+        d /= np.linalg.norm(d)
+    else:
+        d = directions.direction(a.shape[1] + 1)
 
     dist = np.divide(b - a.dot(x[:-1]), a.dot(d[:-1]))
     positive_dist = dist[dist > 0]
@@ -27,17 +41,21 @@ def hit_and_run(a, b, x, w, eps):
     low = 0
     high = closest
     cnt = 32
+    evals = 0
 
     for _ in range(cnt):
         mid = (low + high) / 2.0
         curr = mid * d + x
-        if curr[-1] >= 0 and (w.eval(curr[:-1]) - curr[-1] < 0):
-            low = mid
-            closest = mid
-        else:
-            high = mid
-
-    x += d * closest * np.random.uniform()
+        if curr[-1] >= 0:
+            evals += 1
+            if w.eval(curr[:-1]) - curr[-1] < 0:
+                low = mid
+                closest = mid
+                continue
+        high = mid
+
+    metrics.count("weight_evals", evals)
+    x += d * closest * rng.uniform()
     return x
 
 
@@ -54,7 +72,9 @@ def chebyshev_center(a, b):
 
 
 # Actual hit and run sampling
-def sample_(a, b, w, x0, eps, delta):
+def sample_(
+    a, b, w, x0, eps, delta, directions=None, rng=None, metrics=NULL_METRICS
+):
     # Hit and run number of iterations heuristic:
     # Originally in the KR 2020 version of the paper, we used a
     # heuristic for the number of iterations based on the eps and
@@ -63,19 +83,34 @@ def sample_(a, b, w, x0, eps, delta):
     # which showed that even a small number of iterations was enough.
     c = 32
 
-    x0 = np.append(x0, np.array([np.random.uniform(w.eval(x0))]))
+    rng = np.random if rng is None else rng
+    x0 = np.append(x0, np.array([rng.uniform(w.eval(x0))]))
     for _ in range(c):
-        x0 = hit_and_run(a, b, x0, w, eps)
+        x0 = hit_and_run(a, b, x0, w, eps, directions, rng, metrics)
+    metrics.count("hit_and_run_steps", c)
+    metrics.count("weight_evals")
     return x0
 
 
 # Smarter sampling
-def sample(a, b, w, x0, eps, delta, reals_universe):
+def sample(
+    a,
+    b,
+    w,
+    x0,
+    eps,
+    delta,
+    reals_universe,
+    directions=None,
+    rng=None,
+    metrics=NULL_METRICS,
+):
     """
     Similarly to the volume computation, we will extract the "easy" constraints
     and then run hit-and-run only on a subset of the dimensions.
     """
 
+    rng = np.random if rng is None else rng
     n = len(a[0])
     m = len(a)
 
@@ -98,7 +133,9 @@ def sample(a, b, w, x0, eps, delta, reals_universe):
     new_b = b[important_rows]
 
     # Hit and run
-    new_sample = sample_(new_a, new_b, new_wf, new_x0, eps, delta)[:-1]
+    new_sample = sample_(
+        new_a, new_b, new_wf, new_x0, eps, delta, directions, rng, metrics
+    )[:-1]
     pos_new_sample = 0
 
     ret = np.array([0.0] * n)
@@ -107,9 +144,10 @@ def sample(a, b, w, x0, eps, delta, reals_universe):
             ret[i] = new_sample[pos_new_sample]
             pos_new_sample += 1
         else:
-            ret[i] = np.random.uniform(
+            ret[i] = rng.uniform(
                 reals_universe.lowerBound, reals_universe.upperBound
             )
 
-    ret = np.append(ret, np.array([np.random.uniform(w.eval(ret))]))
+    ret = np.append(ret, np.array([rng.uniform(w.eval(ret))]))
+    metrics.count("weight_evals")
     return ret
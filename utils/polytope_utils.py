@@ -91,87 +91,107 @@ def get_variables_for_latte_integration(
     return appearing_for_latte, appearing, active_vars, free_vars
 
 
-def find_interior_point_active_vars(lraAtoms, nbReals, nbBools, universeReals):
+def clause_rows(lraAtoms, nbReals, nbBools):
     """
-    Find an interior point for a polytope using the Chebyshev center approach.
-    Only solves LP for variables that appear in constraints (active variables).
-    Other variables (free variables) are set to the center of their universe bounds.
-
-    The Chebyshev center is the center of the largest sphere that fits inside the polytope,
-    making it the point that is maximally far from all constraint boundaries. This ensures
-    we get a point that is strictly inside the polytope, not on its boundary.
+    Dense rows A x <= b over all reals for a list of LRA atoms; an equality
+    gives the row and its negation. utils.compiled_formula builds the same
+    rows from the compiled arrays (CompiledFormula.clauseRows).
 
     Args:
         lraAtoms: List of LRA atoms (constraints)
         nbReals: Number of real variables
         nbBools: Number of boolean variables
-        universeReals: Universe bounds for real variables
 
     Returns:
-        point: Interior point as numpy array, or None if infeasible
+        A: Constraint matrix of shape (nbRows, nbReals)
+        b: Right-hand side vector
     """
-    _, active_vars, _ = separate_active_variables(lraAtoms, nbReals, nbBools)
-
-    if len(active_vars) == 0:
-        # No variables in constraints, return center point for all
-        center_point = (
-            universeReals.lowerBound + universeReals.upperBound
-        ) / 2.0
-        return np.full(nbReals, center_point)
-
-    # Build constraint matrix A and vector b for active variables only
-    A_active = []
-    b_active = []
-
-    for _, atom in enumerate(lraAtoms):
+    A = []
+    b = []
+    for atom in lraAtoms:
         operator = atom[-1][0]
         constant = atom[-1][1]
-
-        # Build constraint row for active variables only
-        row = np.zeros(len(active_vars))
-
+        row = np.zeros(nbReals)
         for i, v in atom[:-1]:
-            var_idx = i - nbBools  # Convert to 0-based real variable index
-            if var_idx in active_vars:
-                active_pos = np.where(active_vars == var_idx)[0][0]
-                if operator in ["<=", "<"]:
-                    row[active_pos] = v  # Ax <= b form
-                elif operator in [">=", ">"]:
-                    row[active_pos] = -v  # Convert to <= form: -Ax <= -b
+            row[i - nbBools] = v
 
         if operator in ["<=", "<"]:
-            A_active.append(row)
-            b_active.append(constant)
+            A.append(row)
+            b.append(constant)
         elif operator in [">=", ">"]:
-            A_active.append(row)
-            b_active.append(-constant)
+            A.append(-row)  # Convert to <= form: -Ax <= -b
+            b.append(-constant)
         elif operator == "=":
             # For equality, add both directions
-            A_active.append(row)
-            b_active.append(constant)
-            A_active.append(-row)
-            b_active.append(-constant)
+            A.append(row)
+            b.append(constant)
+            A.append(-row)
+            b.append(-constant)
 
-    # Add universe bounds for active variables
-    for i, var_idx in enumerate(active_vars):
-        # Variable bounds: lower_bound <= x <= upper_bound
-        # Convert to: x <= upper_bound and -x <= -lower_bound
-        upper_row = np.zeros(len(active_vars))
-        upper_row[i] = 1
-        A_active.append(upper_row)
-        b_active.append(universeReals.upperBound)
+    return np.array(A, dtype=float).reshape(len(A), nbReals), np.array(
+        b, dtype=float
+    )
+
+
+def build_active_constraints(A, b, universeReals):
+    """
+    Restrict clause rows A x <= b to the variables that appear in them, and
+    add the universe bounds of those variables.
+
+    Args:
+        A: Constraint matrix over all reals (see clause_rows)
+        b: Right-hand side vector
+        universeReals: Universe bounds for real variables
 
-        lower_row = np.zeros(len(active_vars))
-        lower_row[i] = -1
-        A_active.append(lower_row)
-        b_active.append(-universeReals.lowerBound)
+    Returns:
+        active_vars: Indices of variables that appear in constraints
+        A_active: Constraint matrix over the active variables
+        b_active: Right-hand side vector
+    """
+    active_vars = np.where(np.any(A != 0, axis=0))[0]
+    nbActive = len(active_vars)
+
+    # Variable bounds: lower_bound <= x <= upper_bound become
+    # x <= upper_bound and -x <= -lower_bound
+    bounds = np.zeros((2 * nbActive, nbActive))
+    bounds[0::2][np.arange(nbActive), np.arange(nbActive)] = 1
+    bounds[1::2][np.arange(nbActive), np.arange(nbActive)] = -1
+    boundsB = np.tile(
+        [universeReals.upperBound, -universeReals.lowerBound], nbActive
+    )
 
-    if len(A_active) == 0:
-        # No constraints, return upper bounds
-        return np.full(nbReals, universeReals.upperBound)
+    A_active = np.vstack([A[:, active_vars], bounds])
+    b_active = np.concatenate([b, boundsB]).astype(float)
+    return active_vars, A_active, b_active
+
+
+def interior_point(A, b, universeReals):
+    """
+    Find an interior point for a polytope using the Chebyshev center approach.
+    Only solves LP for variables that appear in constraints (active variables).
+    Other variables (free variables) are set to the center of their universe bounds.
 
-    A_active = np.array(A_active)
-    b_active = np.array(b_active)
+    The Chebyshev center is the center of the largest sphere that fits inside the polytope,
+    making it the point that is maximally far from all constraint boundaries. This ensures
+    we get a point that is strictly inside the polytope, not on its boundary.
+
+    Args:
+        A: Constraint matrix A x <= b over all reals (see clause_rows)
+        b: Right-hand side vector
+        universeReals: Universe bounds for real variables
+
+    Returns:
+        point: Interior point as numpy array, or None if infeasible
+    """
+    nbReals = A.shape[1]
+    center_point = (universeReals.lowerBound + universeReals.upperBound) / 2.0
+    active_vars, A_active, b_active = build_active_constraints(
+        A, b, universeReals
+    )
+
+    if len(active_vars) == 0:
+        # No variables in constraints, return center point for all
+        return np.full(nbReals, center_point)
 
     # Use Chebyshev center: find center of largest sphere that fits inside polytope
     # Formulation: max r subject to ||A_i||*r + A_i*x <= b_i for all i
@@ -185,21 +205,14 @@ def find_interior_point_active_vars(lraAtoms, nbReals, nbBools, universeReals):
         A_active, axis=1
     )  # ||A_i|| for each row
 
-    b_extended = b_active.copy()
-
-    # Add universe bounds for active variables
-    for i, var_idx in enumerate(active_vars):
-        # Variable bounds: lower_bound <= x <= upper_bound
-        # Convert to: x <= upper_bound and -x <= -lower_bound
-        upper_row = np.zeros(n_vars + 1)
-        upper_row[i] = 1
-        A_extended = np.vstack([A_extended, upper_row])
-        b_extended = np.append(b_extended, universeReals.upperBound)
-
-        lower_row = np.zeros(n_vars + 1)
-        lower_row[i] = -1
-        A_extended = np.vstack([A_extended, lower_row])
-        b_extended = np.append(b_extended, -universeReals.lowerBound)
+    # The universe bounds again, without the radius, so that the center
+    # stays in the universe even where the sphere may not
+    bounds = np.zeros((2 * n_vars, n_vars + 1))
+    bounds[:, :-1] = A_active[len(A_active) - 2 * n_vars :]
+    A_extended = np.vstack([A_extended, bounds])
+    b_extended = np.concatenate(
+        [b_active, b_active[len(b_active) - 2 * n_vars :]]
+    )
 
     # Objective: maximize r (minimize -r)
     c_extended = np.zeros(n_vars + 1)
@@ -217,8 +230,122 @@ def find_interior_point_active_vars(lraAtoms, nbReals, nbBools, universeReals):
     chebyshev_center = result.x[:-1]  # Remove the r variable
 
     # Construct full point: active variables from Chebyshev center, free variables at center of bounds
-    center_point = (universeReals.lowerBound + universeReals.upperBound) / 2.0
     full_point = np.full(nbReals, center_point)
     full_point[active_vars] = chebyshev_center
 
     return full_point
+
+
+def bounding_box(A, b, universeReals):
+    """
+    Compute the axis-aligned bounding box of a clause's polytope.
+    For every active variable two LPs (min and max of that coordinate) are
+    solved over the clause constraints; free variables keep the universe
+    bounds.
+
+    Args:
+        A: Constraint matrix A x <= b over all reals (see clause_rows)
+        b: Right-hand side vector
+        universeReals: Universe bounds for real variables
+
+    Returns:
+        (lower, upper): Arrays of per-variable bounds, or None if infeasible
+    """
+    nbReals = A.shape[1]
+    lower = np.full(nbReals, float(universeReals.lowerBound))
+    upper = np.full(nbReals, float(universeReals.upperBound))
+
+    active_vars, A_active, b_active = build_active_constraints(
+        A, b, universeReals
+    )
+    if len(active_vars) == 0:
+        return lower, upper
+
+    for i, var_idx in enumerate(active_vars):
+        for sign in [1, -1]:
+            c = np.zeros(len(active_vars))
+            c[i] = sign
+            result = linprog(
+                c,
+                A_ub=A_active,
+                b_ub=b_active,
+                bounds=(None, None),
+                method="highs",
+            )
+            if not result.success:
+                return None  # Infeasible
+            if sign == 1:
+                lower[var_idx] = result.x[i]
+            else:
+                upper[var_idx] = result.x[i]
+
+    return lower, upper
+
+
+def find_interior_point_active_vars(lraAtoms, nbReals, nbBools, universeReals):
+    """
+    interior_point for a clause given as a list of LRA atoms.
+
+    Args:
+        lraAtoms: List of LRA atoms (constraints)
+        nbReals: Number of real variables
+        nbBools: Number of boolean variables
+        universeReals: Universe bounds for real variables
+
+    Returns:
+        point: Interior point as numpy array, or None if infeasible
+    """
+    A, b = clause_rows(lraAtoms, nbReals, nbBools)
+    return interior_point(A, b, universeReals)
+
+
+def find_bounding_box_active_vars(lraAtoms, nbReals, nbBools, universeReals):
+    """
+    bounding_box for a clause given as a list of LRA atoms.
+
+    Args:
+        lraAtoms: List of LRA atoms (constraints)
+        nbReals: Number of real variables
+        nbBools: Number of boolean variables
+        universeReals: Universe bounds for real variables
+
+    Returns:
+        (lower, upper): Arrays of per-variable bounds, or None if infeasible
+    """
+    A, b = clause_rows(lraAtoms, nbReals, nbBools)
+    return bounding_box(A, b, universeReals)
+
+
+def monte_carlo_integral(A, b, monomials, lower, upper, nbSamples, rng):
+    """
+    Monte Carlo estimate of the integral of a polynomial over the polytope
+    A x <= b, from uniform points of a box [lower, upper] containing it.
+    Used where exact integration is too slow.
+
+    Args:
+        A: Constraint matrix A x <= b over all reals (see clause_rows)
+        b: Right-hand side vector
+        monomials: The polynomial, as a list of [coef, powers]
+        lower, upper: Bounds of the box (lower > upper if it is empty)
+        nbSamples: Number of points drawn
+        rng: Source of uniforms (np.random or a BufferedRandom)
+
+    Returns:
+        (estimate, standard error)
+    """
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    if np.any(lower > upper):
+        return 0.0, 0.0
+    volume = np.prod(upper - lower)
+    points = lower + (upper - lower) * rng.uniform(
+        0, 1, size=(nbSamples, len(lower))
+    )
+    values = np.zeros(nbSamples)
+    for coef, powers in monomials:
+        values += coef * np.prod(points ** np.asarray(powers), axis=1)
+    values *= np.all(points @ A.T <= b, axis=1)
+    return (
+        float(volume * values.mean()),
+        float(volume * values.std(ddof=1) / np.sqrt(nbSamples)),
+    )
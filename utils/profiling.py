@@ -0,0 +1,283 @@
+import cProfile
+import collections
+import os
+import pstats
+import signal
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Functions the solver's time is known to go to, as (file relative to the
+# repository, qualified name); always listed in the hot-function table
+HOT_FUNCTIONS = [
+    ("utils/polytope_sampling.py", "hit_and_run"),
+    ("utils/weight_function.py", "WeightFunction.eval"),
+    ("simple_wmi_solver.py", "SimpleWMISolver.checkClauseSAT"),
+    ("utils/run_latte.py", "integrate"),
+]
+
+_CLOCKS = {
+    "wall": (signal.ITIMER_REAL, signal.SIGALRM),
+    "cpu": (signal.ITIMER_PROF, signal.SIGPROF),
+}
+
+
+def _repo_path(filename):
+    """Path of filename relative to the repository, None if outside it."""
+    path = os.path.abspath(filename)
+    if not path.startswith(_REPO_ROOT + os.sep):
+        return None
+    return os.path.relpath(path, _REPO_ROOT).replace(os.sep, "/")
+
+
+def _library(filename):
+    # Top-level package of a library file, e.g. "numpy" or "tqdm"; the
+    # standard library is "python"
+    parts = os.path.abspath(filename).split(os.sep)
+    for marker in ["site-packages", "dist-packages"]:
+        if marker in parts:
+            i = parts.index(marker)
+            if i + 1 < len(parts):
+                return parts[i + 1].split(".")[0]
+    return "python"
+
+
+def _function_label(path, name):
+    # "utils/run_latte.py", "integrate" -> "utils.run_latte:integrate"
+    module = path[: -len(".py")] if path.endswith(".py") else path
+    return module.replace("/", ".") + ":" + name
+
+
+def _label(code):
+    path = _repo_path(code.co_filename)
+    if path is None:
+        return "[" + _library(code.co_filename) + "]"
+    return _function_label(path, code.co_qualname)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a timer signal interrupts the program every
+    `interval` seconds and the current Python stack is recorded. The cost
+    is one stack walk per sample, whatever the program does, so timings
+    are not distorted the way tracing profilers distort many small calls.
+
+    `clock` is "wall" (real time, so time spent waiting for LattE counts
+    towards integrate) or "cpu" (CPU time of this process). Uses setitimer,
+    so it works on Unix and from the main thread only.
+
+    Library code is folded: consecutive frames of the same library (NumPy
+    dispatch, tqdm, ...) show as one frame labelled e.g. "[numpy]".
+    """
+
+    def __init__(self, interval=0.005, clock="wall"):
+        if clock not in _CLOCKS:
+            raise ValueError("Unknown clock: " + str(clock))
+        self.interval = interval
+        self.clock = clock
+        self.stacks = collections.Counter()
+        self._labels = {}
+        self._previous = None
+
+    def _handler(self, signum, frame):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        self.stacks[tuple(reversed(codes))] += 1
+
+    def start(self):
+        timer, signum = _CLOCKS[self.clock]
+        self._previous = signal.signal(signum, self._handler)
+        signal.setitimer(timer, self.interval, self.interval)
+
+    def stop(self):
+        timer, signum = _CLOCKS[self.clock]
+        signal.setitimer(timer, 0)
+        signal.signal(signum, self._previous)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def nbSamples(self):
+        return sum(self.stacks.values())
+
+    def labelledStacks(self):
+        """Sample counts per stack of frame labels, libraries folded."""
+        stacks = collections.Counter()
+        for codes, count in self.stacks.items():
+            labels = []
+            for code in codes:
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _label(code)
+                if not (labels and label[0] == "[" and labels[-1] == label):
+                    labels.append(label)
+            # Drop the interpreter's own frames above the program
+            while len(labels) > 1 and labels[0] == "[python]":
+                labels.pop(0)
+            stacks[tuple(labels)] += count
+        return stacks
+
+    def collapsed(self):
+        """Lines "frame;frame;... count", the input format of flamegraph.pl."""
+        return [
+            ";".join(stack) + " " + str(count)
+            for stack, count in sorted(self.labelledStacks().items())
+        ]
+
+    def writeCollapsed(self, path):
+        with open(path, "w") as f:
+            for line in self.collapsed():
+                f.write(line + "\n")
+
+    def hotTable(self, top=10):
+        """
+        Rows for the known hot functions and the top repository functions
+        by inclusive samples, in decreasing order of inclusive time. Times
+        are estimated as samples * interval.
+        """
+        inclusive = collections.Counter()
+        own = collections.Counter()
+        for stack, count in self.labelledStacks().items():
+            for label in set(stack):
+                inclusive[label] += count
+            # Own time of the deepest repository frame, library calls
+            # included (a NumPy call is charged to its caller)
+            repo = [label for label in stack if label[0] != "["]
+            if repo:
+                own[repo[-1]] += count
+
+        hot = [_function_label(path, name) for path, name in HOT_FUNCTIONS]
+        ranked = [
+            label
+            for label, _ in inclusive.most_common()
+            if label[0] != "[" and label not in hot
+        ]
+        total = max(self.nbSamples, 1)
+        rows = [
+            {
+                "function": label,
+                "hot": label in hot,
+                "samples": inclusive[label],
+                "share": inclusive[label] / total,
+                "seconds": inclusive[label] * self.interval,
+                "ownSeconds": own[label] * self.interval,
+            }
+            for label in hot + ranked[:top]
+        ]
+        return sorted(rows, key=lambda row: -row["seconds"])
+
+
+class TracingProfiler:
+    """
+    cProfile with the interface of SamplingProfiler. Exact call counts, but
+    the per-call overhead inflates small hot functions; there are no call
+    stacks, so no collapsed output.
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def writeStats(self, path):
+        """pstats dump, for snakeviz and the like."""
+        self.profile.dump_stats(path)
+
+    def hotTable(self, top=10):
+        """As SamplingProfiler.hotTable, with call counts."""
+        stats = pstats.Stats(self.profile).stats
+        # cProfile only knows the plain function name
+        hot = {
+            (path, name.split(".")[-1]): _function_label(path, name)
+            for path, name in HOT_FUNCTIONS
+        }
+        found = {label: None for label in hot.values()}
+        others = []
+        total = 0.0
+        for (filename, _, funcname), entry in stats.items():
+            total = max(total, entry[3])
+            path = _repo_path(filename)
+            if path is None:
+                continue
+            label = hot.get((path, funcname))
+            if label is not None:
+                found[label] = entry
+            else:
+                others.append((_function_label(path, funcname), entry))
+        others.sort(key=lambda item: -item[1][3])
+
+        rows = []
+        for label, entry in list(found.items()) + others[:top]:
+            calls, ownSeconds, seconds = 0, 0.0, 0.0
+            if entry is not None:
+                calls, ownSeconds, seconds = entry[1], entry[2], entry[3]
+            rows.append(
+                {
+                    "function": label,
+                    "hot": label in found,
+                    "calls": calls,
+                    "share": seconds / total if total else 0.0,
+                    "seconds": seconds,
+                    "ownSeconds": ownSeconds,
+                }
+            )
+        return sorted(rows, key=lambda row: -row["seconds"])
+
+
+def format_hot_table(rows):
+    """
+    Text table of hotTable rows; known hot functions are marked with *.
+
+    Args:
+        rows: rows from SamplingProfiler.hotTable or TracingProfiler.hotTable.
+
+    Returns:
+        The table as a string.
+    """
+    lines = [
+        "{:>9} {:>9} {:>7} {:>10}  {}".format(
+            "seconds", "own", "share", "calls", "function"
+        )
+    ]
+    for row in rows:
+        lines.append(
+            "{:9.3f} {:9.3f} {:6.1f}% {:>10}  {}{}".format(
+                row["seconds"],
+                row["ownSeconds"],
+                100 * row["share"],
+                row.get("calls", "-"),
+                "*" if row["hot"] else " ",
+                row["function"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def make_profiler(kind, interval=0.005, clock="wall"):
+    """
+    Profiler by name: "sample" (SamplingProfiler) or "trace" (cProfile).
+    """
+    if kind == "sample":
+        return SamplingProfiler(interval, clock)
+    if kind == "trace":
+        return TracingProfiler()
+    raise ValueError("Unknown profiler: " + str(kind))
@@ -0,0 +1,67 @@
+import numpy as np
+from scipy.stats import qmc
+from scipy.special import ndtri
+
+
+class QuasiRandomStream:
+    """
+    Buffered stream of scrambled low-discrepancy points in [0, 1)^dim.
+    Sobol points are drawn so that the total drawn is always a power of 2,
+    which keeps the sequence balanced; Halton points have no such
+    restriction.
+    """
+
+    def __init__(self, dim, method="sobol", seed=None, blockLog2=10):
+        if method == "sobol":
+            self.engine = qmc.Sobol(d=dim, scramble=True, seed=seed)
+        elif method == "halton":
+            self.engine = qmc.Halton(d=dim, scramble=True, seed=seed)
+        else:
+            raise ValueError("Unknown quasi-random method: " + str(method))
+        self.method = method
+        self.blockLog2 = blockLog2
+        self.buffer = np.zeros((0, dim))
+        self.pos = 0
+        self.drawn = 0
+
+    def next(self):
+        if self.pos == len(self.buffer):
+            if self.method == "sobol":
+                # Doubling blocks keep the total drawn a power of 2
+                m = max(self.blockLog2, int(np.log2(max(self.drawn, 1))))
+                self.buffer = self.engine.random_base2(m)
+                self.drawn += len(self.buffer)
+            else:
+                self.buffer = self.engine.random(2**self.blockLog2)
+            # Keep away from 0 and 1 so that inverse CDFs stay finite
+            np.clip(self.buffer, 1e-12, 1 - 1e-12, out=self.buffer)
+            self.pos = 0
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+
+class QuasiRandomDirections:
+    """
+    Hit-and-run directions from scrambled low-discrepancy sequences: a
+    uniform point is pushed through the normal inverse CDF and normalised,
+    which gives a direction uniform on the sphere. One stream is kept per
+    dimension, since clauses restrict the walk to their own active variables.
+    """
+
+    def __init__(self, method="sobol", seed=None):
+        self.method = method
+        self.seedSequence = np.random.SeedSequence(seed)
+        self.streams = {}
+
+    def direction(self, dim):
+        stream = self.streams.get(dim)
+        if stream is None:
+            stream = QuasiRandomStream(
+                dim,
+                self.method,
+                np.random.default_rng(self.seedSequence.spawn(1)[0]),
+            )
+            self.streams[dim] = stream
+
+        d = ndtri(stream.next())
+        return d / np.linalg.norm(d)
@@ -0,0 +1,133 @@
+import json
+import math
+import numpy as np
+
+# Independent streams used by the solver, one per randomized component
+STREAM_NAMES = ["clauses", "checks", "bools", "walk", "qmc"]
+
+
+class BufferedRandom:
+    """
+    numpy.random.Generator wrapper that serves draws from pre-drawn
+    buffers. Hot loops draw one or a handful of values at a time, which is
+    dominated by per-call overhead; here a buffer of `bufferSize` uniforms
+    (and normals) is refilled in bulk and sliced instead.
+
+    The method names and signatures follow the legacy np.random module
+    (uniform, normal, randint, shuffle), so code can take either this or
+    np.random as its source of randomness.
+    """
+
+    def __init__(self, seed=None, bufferSize=4096):
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.bufferSize = bufferSize
+        self.uniformBuffer = np.zeros(0)
+        self.uniformPos = 0
+        self.normalBuffer = np.zeros(0)
+        self.normalPos = 0
+
+    def _uniforms(self, count):
+        if self.uniformPos + count > len(self.uniformBuffer):
+            rest = self.uniformBuffer[self.uniformPos :]
+            self.uniformBuffer = np.concatenate(
+                [rest, self.generator.random(max(self.bufferSize, count))]
+            )
+            self.uniformPos = 0
+        self.uniformPos += count
+        return self.uniformBuffer[self.uniformPos - count : self.uniformPos]
+
+    def _normals(self, count):
+        if self.normalPos + count > len(self.normalBuffer):
+            rest = self.normalBuffer[self.normalPos :]
+            self.normalBuffer = np.concatenate(
+                [
+                    rest,
+                    self.generator.standard_normal(
+                        max(self.bufferSize, count)
+                    ),
+                ]
+            )
+            self.normalPos = 0
+        self.normalPos += count
+        return self.normalBuffer[self.normalPos - count : self.normalPos]
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        if size is None:
+            return low + (high - low) * self._uniforms(1)[0]
+        u = self._draw(self._uniforms, size)
+        if np.isscalar(low) and np.isscalar(high) and (low, high) == (0, 1):
+            return u
+        return low + (high - low) * u
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        if size is None:
+            return loc + scale * self._normals(1)[0]
+        x = self._draw(self._normals, size)
+        if np.isscalar(loc) and np.isscalar(scale) and (loc, scale) == (0, 1):
+            return x
+        return loc + scale * x
+
+    def randint(self, low, high=None, size=None):
+        if high is None:
+            low, high = 0, low
+        if size is None:
+            return low + int(self._uniforms(1)[0] * (high - low))
+        u = self._draw(self._uniforms, size)
+        return low + (u * (high - low)).astype(int)
+
+    @staticmethod
+    def _draw(source, size):
+        # Copies out of the buffer; reshape only when actually needed
+        if type(size) is int:
+            return source(size).copy()
+        if len(size) == 1:
+            return source(size[0]).copy()
+        return source(math.prod(size)).reshape(size).copy()
+
+    def shuffle(self, x):
+        self.generator.shuffle(x)
+
+    def getState(self):
+        """State as plain arrays (see restore_streams)."""
+        state = json.dumps(self.generator.bit_generator.state)
+        return {
+            "state": np.array(state),
+            "uniforms": self.uniformBuffer[self.uniformPos :].copy(),
+            "normals": self.normalBuffer[self.normalPos :].copy(),
+        }
+
+    def setState(self, arrays):
+        self.generator.bit_generator.state = json.loads(str(arrays["state"]))
+        self.uniformBuffer = np.array(arrays["uniforms"], dtype=float)
+        self.uniformPos = 0
+        self.normalBuffer = np.array(arrays["normals"], dtype=float)
+        self.normalPos = 0
+
+
+def spawn_streams(seedSequence, names=STREAM_NAMES):
+    """One independent BufferedRandom per name, spawned from seedSequence."""
+    return {
+        name: BufferedRandom(child)
+        for name, child in zip(names, seedSequence.spawn(len(names)))
+    }
+
+
+def pack_streams(streams):
+    """Flatten the state of every stream into npz-friendly arrays."""
+    arrays = {}
+    for name, stream in streams.items():
+        for key, value in stream.getState().items():
+            arrays["rng_" + name + "_" + key] = value
+    return arrays
+
+
+def restore_streams(streams, arrays):
+    for name, stream in streams.items():
+        prefix = "rng_" + name + "_"
+        stream.setState(
+            {
+                key[len(prefix) :]: value
+                for key, value in arrays.items()
+                if key.startswith(prefix)
+            }
+        )
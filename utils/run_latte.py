@@ -1,6 +1,106 @@
 import subprocess
 import numpy as np
-import string, os
+import atexit, os, shutil, signal, tempfile, uuid
+from utils.metrics import NULL_METRICS
+
+# Environment variables overriding the LattE integrate binary and the
+# directory scratch directories are created in
+LATTE_BINARY_ENV = "LATTE_INTEGRATE"
+SCRATCH_DIR_ENV = "WMI_SCRATCH_DIR"
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_latte_binary = None
+_scratch = {"pid": None, "path": None}
+# LattE processes running in this process (see exit_on_terminate)
+_latte_processes = set()
+
+
+class LatteTimeout(Exception):
+    """A LattE call ran past its time budget and was killed."""
+
+
+def set_latte_binary(path):
+    """Use the LattE integrate binary at path (None: back to the default)."""
+    global _latte_binary
+    _latte_binary = path
+
+
+def latte_binary():
+    """
+    Path of the LattE integrate binary: the one given to set_latte_binary,
+    else $LATTE_INTEGRATE, else latte-distro/dest/bin/integrate inside or
+    next to the repository. Independent of the working directory.
+    """
+    if _latte_binary is not None:
+        return _latte_binary
+    if os.environ.get(LATTE_BINARY_ENV):
+        return os.environ[LATTE_BINARY_ENV]
+    candidates = [
+        os.path.join(root, "latte-distro", "dest", "bin", "integrate")
+        for root in [_REPO_ROOT, os.path.dirname(_REPO_ROOT)]
+    ]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return candidates[0]
+
+
+def scratch_dir():
+    """
+    Per-process scratch directory for LattE inputs and the files LattE
+    leaves in its working directory. Created on first use under
+    $WMI_SCRATCH_DIR, else /dev/shm (tmpfs) when available, else the
+    system temp directory, and removed with its contents at exit. A
+    forked child gets its own directory.
+    """
+    if _scratch["pid"] != os.getpid() or not os.path.isdir(_scratch["path"]):
+        base = os.environ.get(SCRATCH_DIR_ENV)
+        if not base:
+            base = "/dev/shm"
+            if not (os.path.isdir(base) and os.access(base, os.W_OK)):
+                base = tempfile.gettempdir()
+        _scratch["pid"] = os.getpid()
+        _scratch["path"] = tempfile.mkdtemp(prefix="wmi-latte-", dir=base)
+        atexit.register(_remove_scratch_dir, os.getpid(), _scratch["path"])
+    return _scratch["path"]
+
+
+def _remove_scratch_dir(pid, path):
+    # atexit handlers survive fork; only the owner removes its directory
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_scratch_dir():
+    """
+    Remove the scratch directory of this process now, for processes that
+    do not run atexit handlers (forked multiprocessing workers). A later
+    LattE call creates a new one.
+    """
+    if _scratch["pid"] == os.getpid():
+        _remove_scratch_dir(_scratch["pid"], _scratch["path"])
+        _scratch["pid"] = None
+
+
+def exit_on_terminate():
+    """
+    On SIGTERM, kill the LattE calls running in this process, remove its
+    scratch directory and exit. LattE runs in a session of its own, so it
+    would outlive a killed worker process, and so would the scratch
+    directory; workers that may be stopped mid-call install this and are
+    terminated before they are killed.
+    """
+    signal.signal(signal.SIGTERM, _terminate)
+
+
+def _terminate(signum, frame):
+    for proc in list(_latte_processes):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    remove_scratch_dir()
+    os._exit(128 + signum)
 
 
 def _write_latte_input_file(
@@ -101,17 +201,121 @@ def _write_latte_input_file(
     return appearing_for_latte, original_lines, scaling_factor, lines
 
 
-def integrate(lraAtoms_filter, weightFunction, nbBools, universeReals):
+def _run_latte(
+    polytope_path,
+    monomial_path,
+    lraAtoms,
+    weightFunction,
+    nbBools,
+    nbReals,
+    universeReals,
+    timeout=None,
+    metrics=NULL_METRICS,
+):
+    """
+    Write the LattE inputs and run LattE in the scratch directory, killing
+    it (and its process group) after timeout seconds.
+
+    Returns:
+        (unscaled integral, scaling factor, appearing_for_latte)
+    """
+    appearing_for_latte, _, scaling_factor, _ = _write_latte_input_file(
+        polytope_path, lraAtoms, nbBools, nbReals, universeReals
+    )
+
+    # Write monomial file
+    with open(monomial_path, "w") as f:
+        f.write(
+            str(
+                [
+                    [
+                        1,
+                        list(np.array(monomial[1])[appearing_for_latte[1:]]),
+                    ]
+                    for monomial in weightFunction
+                ]
+            )
+            + "\n"
+        )
+
+    metrics.count(
+        "latte_bytes_written",
+        os.path.getsize(polytope_path) + os.path.getsize(monomial_path),
+    )
+
+    # Call LattE executable
+    sub_command = [
+        latte_binary(),
+        polytope_path,
+        "--cone-decompose",
+        "--monomials=" + monomial_path,
+        "--valuation=integrate",
+    ]
+    if timeout is not None and timeout <= 0:
+        raise LatteTimeout("No time left in the LattE budget")
+    with open(os.devnull, "w") as devnull:
+        # In a session of its own, so that a timeout kills LattE together
+        # with any helper processes it started
+        proc = subprocess.Popen(
+            sub_command,
+            stdout=subprocess.PIPE,
+            stderr=devnull,
+            cwd=os.path.dirname(polytope_path),
+            start_new_session=True,
+        )
+        _latte_processes.add(proc)
+        try:
+            output, _ = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_group(proc)
+            raise LatteTimeout(
+                "LattE ran past its budget of " + str(timeout) + " sec"
+            )
+        except BaseException:
+            _kill_process_group(proc)
+            raise
+        finally:
+            _latte_processes.discard(proc)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode, sub_command, output
+        )
+    command_ret = output.split()
+    latte_ret = abs(float(command_ret[1 + command_ret.index(b"Decimal:")]))
+    return latte_ret, scaling_factor, appearing_for_latte
+
+
+def _kill_process_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+
+def integrate(
+    lraAtoms_filter,
+    weightFunction,
+    nbBools,
+    universeReals,
+    timeout=None,
+    metrics=NULL_METRICS,
+):
+    """
+    Integral of a monomial over the reals satisfying lraAtoms, inside the
+    universe. Polytopes with multi-variable constraints go to LattE, which
+    raises LatteTimeout if it runs for longer than timeout seconds. LattE
+    calls are timed as "latte" in metrics.
+    """
     nbReals = universeReals.nbReals
     lraAtoms = list(lraAtoms_filter)  # Convert filter object to list
 
-    random_hash = "".join(
-        np.random.choice([c for c in string.ascii_uppercase + string.digits])
-        for _ in range(30)
-    )
+    # Unique names without drawing from any numpy RNG, so LattE calls
+    # never shift the sampling streams
+    random_hash = uuid.uuid4().hex
 
-    polytope_path = "temp/polytope" + random_hash + ".hrep.latte"
-    monomial_path = "temp/monomial" + random_hash + ".txt"
+    polytope_name = "polytope" + random_hash + ".hrep.latte"
+    monomial_name = "monomial" + random_hash + ".txt"
 
     # Initialize integration result
     latte_ret = 1.0  # Default to 1.0 (multiplicative identity)
@@ -172,46 +376,22 @@ def integrate(lraAtoms_filter, weightFunction, nbBools, universeReals):
 
     # If we have complex constraints, use LattE for integration
     if has_complex_constraints and len(active_vars) > 0:
-        # Use the existing _write_latte_input_file function
-        appearing_for_latte, original_lines, scaling_factor, lines = _write_latte_input_file(
-            polytope_path, lraAtoms, nbBools, nbReals, universeReals
-        )
-
-        # Write monomial file
-        with open(monomial_path, "w") as f:
-            f.write(
-                str(
-                    [
-                        [
-                            1,
-                            list(
-                                np.array(monomial[1])[appearing_for_latte[1:]]
-                            ),
-                        ]
-                        for monomial in weightFunction
-                    ]
-                )
-                + "\n"
-            )
-
-        # Call LattE executable
-        polytope_path_abs = os.path.abspath(polytope_path)
-        monomial_path_abs = os.path.abspath(monomial_path)
-        sub_command = [
-            os.path.abspath("../latte-distro/dest/bin/integrate"),
-            polytope_path_abs,
-            "--cone-decompose",
-            "--monomials=" + monomial_path_abs,
-            "--valuation=integrate",
-        ]
+        scratch = scratch_dir()
+        polytope_path = os.path.join(scratch, polytope_name)
+        monomial_path = os.path.join(scratch, monomial_name)
         try:
-            with open(os.devnull, "w") as devnull:
-                command_ret = subprocess.check_output(
-                    sub_command, stderr=devnull, cwd="temp"
-                ).split()
-            latte_ret = abs(
-                float(command_ret[1 + command_ret.index(b"Decimal:")])
-            )
+            with metrics.timer("latte"):
+                latte_ret, scaling_factor, appearing_for_latte = _run_latte(
+                    polytope_path,
+                    monomial_path,
+                    lraAtoms,
+                    weightFunction,
+                    nbBools,
+                    nbReals,
+                    universeReals,
+                    timeout,
+                    metrics,
+                )
             sum_active_exponents = sum(
                 weightFunction[0][1][i] for i in active_vars if i < len(weightFunction[0][1])
             )
@@ -224,12 +404,14 @@ def integrate(lraAtoms_filter, weightFunction, nbBools, universeReals):
                 "LattE integration failed or LattE executable not found,"
                 " assume empty volume."
             )
+            metrics.count("latte_failures")
             latte_ret = 0.0
-        
-        # Clean up temporary files
-        os.remove(polytope_path)
-        os.remove(monomial_path)
-        
+        finally:
+            # Clean up the inputs whatever happened
+            for path in [polytope_path, monomial_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
     elif len(active_vars) > 0:
         # Manual integration for simple constraints only
         for i in active_vars:
@@ -260,6 +442,4 @@ def integrate(lraAtoms_filter, weightFunction, nbBools, universeReals):
             / p
         )
 
-    print("Computed volume: " + str(latte_ret * manual_integration))
-
     return latte_ret * manual_integration
\ No newline at end of file
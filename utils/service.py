@@ -0,0 +1,583 @@
+import collections
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from utils.batch import build_instance
+from utils.metrics import Metrics
+
+# Instance fields a compiled solver is built from (see
+# utils.batch.read_instances)
+_SOLVER_FIELDS = [
+    "formula",
+    "nbBools",
+    "nbReals",
+    "lowerBound",
+    "upperBound",
+    "weightFunction",
+]
+
+# Window of the recent throughput, in seconds
+RECENT_SECONDS = 60.0
+
+# Workers are started from threads (a dead one is replaced by its
+# receiver thread), where forking is unsafe
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def instance_key(instance, seed, latteBudget):
+    """
+    Key of the compiled solver of an instance: a hash of everything the
+    solver is built from. An instance read from a file is keyed by its
+    path and modification time, and one without a weight function also by
+    the seed its random weight function is drawn with.
+    """
+    fields = {name: instance.get(name) for name in _SOLVER_FIELDS}
+    fields["latteBudget"] = latteBudget
+    if "path" in instance:
+        fields["path"] = os.path.abspath(instance["path"])
+        fields["mtime"] = os.path.getmtime(instance["path"])
+    if instance.get("weightFunction") is None:
+        fields["seed"] = seed
+    return hashlib.sha1(
+        json.dumps(fields, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def latency_summary(latencies):
+    """Count, mean, percentiles and max of a list of seconds."""
+    if len(latencies) == 0:
+        return {"count": 0}
+    latencies = np.asarray(latencies, dtype=float)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        "count": len(latencies),
+        "mean_seconds": float(latencies.mean()),
+        "p50_seconds": float(p50),
+        "p90_seconds": float(p90),
+        "p99_seconds": float(p99),
+        "max_seconds": float(latencies.max()),
+    }
+
+
+class SolverCache:
+    """
+    Compiled solvers by instance key, the least recently used one dropped
+    past maxSize. With a directory, a solver is also saved there when it is
+    built (SimpleWMISolver.save) and loaded from there when it is not in
+    memory, so a restarted service starts warm. The exact WMI of a formula
+    does not depend on the seed or the accuracy asked for, so once
+    computed it is kept in exactValues and reused.
+    """
+
+    def __init__(self, maxSize=32, directory=None):
+        self.maxSize = maxSize
+        self.directory = directory
+        self.solvers = collections.OrderedDict()
+        self.exactValues = {}
+
+    def get(self, key, instance, seed, latteBudget):
+        """
+        The solver of an instance, built if needed.
+
+        Returns:
+            (solver, source), source being "memory", "disk" or "built"
+        """
+        from simple_wmi_solver import SimpleWMISolver
+
+        solver = self.solvers.get(key)
+        if solver is not None:
+            self.solvers.move_to_end(key)
+            return solver, "memory"
+
+        path = None
+        if self.directory is not None:
+            path = os.path.join(self.directory, key + ".npz")
+        if path is not None and os.path.exists(path):
+            solver, source = SimpleWMISolver.load(path), "disk"
+        else:
+            formula, nbBools, universe, wf = build_instance(instance, seed)
+            solver = SimpleWMISolver(
+                formula,
+                nbBools,
+                universe,
+                wf,
+                seed=seed,
+                latteBudget=latteBudget,
+            )
+            source = "built"
+            if path is not None:
+                solver.save(path)
+
+        self.solvers[key] = solver
+        if len(self.solvers) > self.maxSize:
+            dropped, _ = self.solvers.popitem(last=False)
+            self.exactValues.pop(dropped, None)
+        return solver, source
+
+
+def _error(instance, e):
+    return {
+        "id": instance.get("id"),
+        "status": "error",
+        "estimate": None,
+        "error": "".join(
+            traceback.format_exception_only(type(e), e)
+        ).strip(),
+    }
+
+
+def answer_request(cache, request):
+    """
+    Solve one request of WMIService with the solvers of cache.
+
+    Returns:
+        The result dict: the estimate, the route taken (see
+        SimpleWMISolver.solve), where the solver came from ("cache") and
+        the setup and solve times.
+    """
+    start = time.time()
+    instance = request["instance"]
+    result = {
+        "id": instance.get("id"),
+        "status": "error",
+        "estimate": None,
+        "route": None,
+        "epsilon": request["epsilon"],
+        "delta": request["delta"],
+        "seed": request["seed"],
+        "cache": None,
+        "setup_time": None,
+        "solve_time": None,
+    }
+    try:
+        solver, result["cache"] = cache.get(
+            request["key"], instance, request["seed"], request["latteBudget"]
+        )
+        result["setup_time"] = time.time() - start
+        exact = cache.exactValues.get(request["key"])
+        if exact is not None and request["exact"] is not False:
+            result["estimate"] = exact
+            result["route"] = "exact"
+        else:
+            # A cached solver keeps its hit-and-run chains, but every
+            # request gets the random streams of its seed
+            solver.reseed(request["seed"])
+            solver.metrics = Metrics()
+            estimate = solver.solve(
+                request["epsilon"],
+                request["delta"],
+                progress=False,
+                mode=request["mode"],
+                exact=request["exact"],
+            )
+            result["estimate"] = float(estimate)
+            result["route"] = solver.lastRoute
+            result["metrics"] = solver.metrics.snapshot()
+            if solver.lastRoute == "exact":
+                cache.exactValues[request["key"]] = result["estimate"]
+        result["solve_time"] = time.time() - start - result["setup_time"]
+        result["status"] = "ok"
+    except Exception as e:
+        result.update(_error(instance, e))
+    return result
+
+
+def _signature(request):
+    # Requests with the same signature get the same answer
+    return json.dumps(
+        [
+            request[name]
+            for name in ["key", "epsilon", "delta", "seed", "mode", "exact"]
+        ]
+    )
+
+
+def _service_worker(conn, cacheSize, cacheDir):
+    # Solver and LattE chatter would interleave between workers
+    cache = SolverCache(cacheSize, cacheDir)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+        devnull
+    ), contextlib.redirect_stderr(devnull):
+        while True:
+            try:
+                batch = conn.recv()
+            except EOFError:
+                break
+            if batch is None:
+                break
+            answers = {}
+            replies = []
+            for token, request in batch:
+                signature = _signature(request)
+                if signature in answers:
+                    result = dict(
+                        answers[signature],
+                        id=request["instance"].get("id"),
+                        coalesced=True,
+                    )
+                else:
+                    result = answer_request(cache, request)
+                    answers[signature] = result
+                replies.append((token, result))
+            conn.send(replies)
+    conn.close()
+
+
+class WMIService:
+    """
+    WMI queries answered by a pool of long-running worker processes.
+
+    Every worker keeps the compiled solvers of the formulas it has seen
+    (clause weights, bounding boxes, warm hit-and-run chains; see
+    SolverCache), and requests for a formula always go to the same worker,
+    so only the first query of a formula pays for LattE and the LPs.
+    Requests submitted within batchWindow seconds of each other are sent
+    to their workers as one batch (at most maxBatch requests), and the
+    identical requests of a batch are solved once.
+
+    The service records the latency of every request (from submit to its
+    result) and its throughput, see snapshot.
+    """
+
+    def __init__(
+        self,
+        nbWorkers=None,
+        cacheSize=32,
+        cacheDir=None,
+        epsilon=0.25,
+        delta=0.15,
+        seed=0,
+        latteBudget=None,
+        batchWindow=0.002,
+        maxBatch=64,
+        latencyWindow=4096,
+    ):
+        self.nbWorkers = nbWorkers or os.cpu_count() or 1
+        self.cacheSize = cacheSize
+        self.cacheDir = cacheDir
+        self.epsilon = epsilon
+        self.delta = delta
+        self.seed = seed
+        self.latteBudget = latteBudget
+        self.batchWindow = batchWindow
+        self.maxBatch = maxBatch
+
+        self.metrics = Metrics()
+        # (finish time, latency) of the latest requests
+        self.latencies = collections.deque(maxlen=latencyWindow)
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        # token -> [future, submit time, dispatch time, worker, id]
+        self.pending = {}
+        self.nextToken = 0
+        self.workers = [None] * self.nbWorkers
+        self.closing = False
+        self.started = None
+
+    def start(self):
+        if self.cacheDir is not None:
+            os.makedirs(self.cacheDir, exist_ok=True)
+        self.started = time.time()
+        for w in range(self.nbWorkers):
+            self.startWorker(w)
+        threading.Thread(target=self.dispatch, daemon=True).start()
+        return self
+
+    def startWorker(self, w):
+        conn, childConn = _CONTEXT.Pipe()
+        process = _CONTEXT.Process(
+            target=_service_worker,
+            args=(childConn, self.cacheSize, self.cacheDir),
+            daemon=True,
+        )
+        process.start()
+        childConn.close()
+        self.workers[w] = (process, conn)
+        threading.Thread(
+            target=self.receive, args=(w, conn), daemon=True
+        ).start()
+
+    def close(self):
+        """Stop the workers; requests still pending fail."""
+        self.closing = True
+        self.queue.put(None)
+        for process, conn in self.workers:
+            with contextlib.suppress(OSError):
+                conn.send(None)
+        for process, conn in self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            conn.close()
+        with self.lock:
+            tokens = list(self.pending)
+        for token in tokens:
+            self.finish(
+                token, {"status": "error", "error": "Service closed"}
+            )
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, instance):
+        """
+        Queue a request.
+
+        Args:
+            instance: an instance dict (see utils.batch.read_instances),
+                with optional "epsilon", "delta", "seed", "latteBudget",
+                "mode" (a sampling mode) and "exact" ("auto", true or
+                false, see SimpleWMISolver.solve)
+
+        Returns:
+            A Future of the result dict (see answer_request), with the
+            request's "latency" and "queue_time" in seconds.
+        """
+        future = Future()
+        submitted = time.time()
+        request = {
+            "instance": instance,
+            "epsilon": instance.get("epsilon", self.epsilon),
+            "delta": instance.get("delta", self.delta),
+            "seed": instance.get("seed", self.seed),
+            "mode": instance.get("mode", "random"),
+            "exact": instance.get("exact", "auto"),
+            "latteBudget": instance.get("latteBudget", self.latteBudget),
+        }
+        with self.lock:
+            token = self.nextToken
+            self.nextToken += 1
+            self.pending[token] = [
+                future,
+                submitted,
+                None,
+                None,
+                instance.get("id"),
+            ]
+            self.metrics.count("requests")
+        try:
+            request["key"] = instance_key(
+                instance, request["seed"], request["latteBudget"]
+            )
+        except Exception as e:
+            self.finish(token, _error(instance, e))
+            return future
+        self.queue.put((token, request))
+        return future
+
+    def solve(self, instance, timeout=None):
+        """Submit a request and wait for its result dict."""
+        return self.submit(instance).result(timeout)
+
+    def workerOf(self, key):
+        return int(key[:8], 16) % self.nbWorkers
+
+    def dispatch(self):
+        """Send the queued requests to the workers in batches."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.time() + self.batchWindow
+            while len(batch) < self.maxBatch:
+                try:
+                    item = self.queue.get(
+                        timeout=max(0.0, deadline - time.time())
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+
+            groups = {}
+            for token, request in batch:
+                groups.setdefault(self.workerOf(request["key"]), []).append(
+                    (token, request)
+                )
+            dispatched = time.time()
+            for w, group in groups.items():
+                with self.lock:
+                    for token, _ in group:
+                        entry = self.pending.get(token)
+                        if entry is not None:
+                            entry[2:4] = [dispatched, w]
+                    self.metrics.count("batches")
+                    self.metrics.count("batched_requests", len(group))
+                try:
+                    self.workers[w][1].send(group)
+                except (OSError, ValueError):
+                    for token, request in group:
+                        self.finish(
+                            token,
+                            _error(
+                                request["instance"],
+                                RuntimeError("Worker unavailable"),
+                            ),
+                        )
+
+    def receive(self, w, conn):
+        """Hand the results of worker w to their requests."""
+        while True:
+            try:
+                replies = conn.recv()
+            except (EOFError, OSError):
+                break
+            for token, result in replies:
+                self.finish(token, result)
+        if self.closing:
+            return
+        # The worker died (e.g. out of memory): fail its requests and
+        # start a fresh one
+        with self.lock:
+            self.metrics.count("worker_restarts")
+            tokens = [
+                token
+                for token, entry in self.pending.items()
+                if entry[3] == w
+            ]
+        for token in tokens:
+            self.finish(token, {"status": "crashed", "estimate": None})
+        self.startWorker(w)
+
+    def finish(self, token, result):
+        now = time.time()
+        with self.lock:
+            entry = self.pending.pop(token, None)
+            if entry is None:
+                return
+            future, submitted, dispatched, _, instanceId = entry
+            latency = now - submitted
+            self.latencies.append((now, latency))
+            self.metrics.count("completed")
+            self.metrics.count("status." + result.get("status", "error"))
+            if result.get("cache") is not None:
+                self.metrics.count("cache." + result["cache"])
+            if result.get("coalesced"):
+                self.metrics.count("coalesced")
+            self.metrics.add("latency", latency)
+        result = dict(
+            {"id": instanceId},
+            **result,
+            latency=latency,
+            queue_time=(
+                None if dispatched is None else dispatched - submitted
+            ),
+        )
+        future.set_result(result)
+
+    def snapshot(self):
+        """
+        Service metrics as a JSON-friendly dict: request counts, requests
+        in flight, overall and recent throughput (requests per second),
+        the latency distribution of the latest requests, the mean batch
+        size, and the counters of request statuses and of where the
+        solvers came from ("cache.memory", "cache.disk", "cache.built").
+        """
+        with self.lock:
+            now = time.time()
+            uptime = now - self.started
+            window = min(RECENT_SECONDS, uptime)
+            recent = [t for t, _ in self.latencies if now - t <= window]
+            batches = self.metrics.get("batches")
+            return {
+                "uptime_seconds": uptime,
+                "workers": self.nbWorkers,
+                "requests": self.metrics.get("requests"),
+                "completed": self.metrics.get("completed"),
+                "in_flight": len(self.pending),
+                "throughput_per_second": (
+                    self.metrics.get("completed") / uptime if uptime else 0.0
+                ),
+                "recent_throughput_per_second": (
+                    len(recent) / window if window else 0.0
+                ),
+                "latency": latency_summary(
+                    [latency for _, latency in self.latencies]
+                ),
+                "mean_batch_size": (
+                    self.metrics.get("batched_requests") / batches
+                    if batches
+                    else None
+                ),
+                "metrics": self.metrics.snapshot(),
+            }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of a WMIService (the server's service attribute):
+
+        POST /solve    a request object, or a list of them; answers with
+                       the result object, or the list of results
+        GET /metrics   the service snapshot
+        GET /health    {"status": "ok", "workers": ...}
+    """
+
+    def sendJSON(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/metrics":
+            self.sendJSON(200, service.snapshot())
+        elif self.path == "/health":
+            self.sendJSON(
+                200, {"status": "ok", "workers": service.nbWorkers}
+            )
+        else:
+            self.sendJSON(404, {"error": "Unknown path: " + self.path})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self.sendJSON(404, {"error": "Unknown path: " + self.path})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            requests = body if isinstance(body, list) else [body]
+            if not all(isinstance(request, dict) for request in requests):
+                raise ValueError("Requests must be JSON objects")
+        except ValueError as e:
+            self.sendJSON(400, {"error": str(e)})
+            return
+        # Submitted together, so they can share a batch
+        futures = [self.server.service.submit(r) for r in requests]
+        results = [future.result() for future in futures]
+        self.sendJSON(200, results if isinstance(body, list) else results[0])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host="127.0.0.1", port=8765, verbose=False):
+    """
+    An HTTP server for a started WMIService, one thread per connection.
+    Call serve_forever on it; port 0 picks a free port (server_address).
+    """
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
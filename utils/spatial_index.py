@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class BoxIndex:
+    """
+    Index over per-clause axis-aligned bounding boxes.
+
+    Every clause's real part is a polytope inside the universe, and a point
+    outside a clause's bounding box can not satisfy the clause. The index
+    keeps the boxes as dense (nbClauses, nbReals) bound matrices plus, per
+    dimension, the clause order sorted by lower and by upper bound. A
+    stabbing query picks the dimension whose sorted bounds leave the
+    fewest candidates and only checks the full boxes of those.
+
+    An infeasible clause is stored as an empty box (lower > upper).
+    """
+
+    def __init__(self, lower, upper, tol=1e-7):
+        self.tol = tol
+        self.lower = np.asarray(lower, dtype=float) - tol
+        self.upper = np.asarray(upper, dtype=float) + tol
+        self.nbBoxes = self.lower.shape[0]
+        self._buildOrder()
+
+    @classmethod
+    def fromArrays(cls, arrays):
+        """Inverse of toArrays (arrays may be memory-mapped)."""
+        index = cls.__new__(cls)
+        index.tol = float(arrays["tol"])
+        index.lower = arrays["lower"]
+        index.upper = arrays["upper"]
+        index.nbBoxes = index.lower.shape[0]
+        index._buildOrder()
+        return index
+
+    def toArrays(self):
+        """The bounds (widened by tol) and tol, as plain arrays."""
+        return {
+            "lower": self.lower,
+            "upper": self.upper,
+            "tol": np.float64(self.tol),
+        }
+
+    def _buildOrder(self):
+        self.lowerOrder = np.argsort(self.lower, axis=0, kind="stable")
+        self.upperOrder = np.argsort(self.upper, axis=0, kind="stable")
+        self.lowerSorted = np.take_along_axis(
+            self.lower, self.lowerOrder, axis=0
+        )
+        self.upperSorted = np.take_along_axis(
+            self.upper, self.upperOrder, axis=0
+        )
+
+    def append(self, lower, upper):
+        """
+        Add boxes for new clauses, indexed after the existing ones. The
+        new bounds are sorted on their own and merged into the sorted
+        orders, rather than sorting everything again.
+        """
+        shape = (len(lower), self.lower.shape[1])
+        lower = np.asarray(lower, dtype=float).reshape(shape) - self.tol
+        upper = np.asarray(upper, dtype=float).reshape(shape) + self.tol
+        first = self.nbBoxes
+        self.lowerOrder, self.lowerSorted = _merge_sorted(
+            self.lowerOrder, self.lowerSorted, lower, first
+        )
+        self.upperOrder, self.upperSorted = _merge_sorted(
+            self.upperOrder, self.upperSorted, upper, first
+        )
+        self.lower = np.vstack([self.lower, lower])
+        self.upper = np.vstack([self.upper, upper])
+        self.nbBoxes = self.lower.shape[0]
+
+    def remove(self, idx):
+        """
+        Empty the box of a removed clause. The sorted bounds are left
+        stale; queries still check the actual boxes, so the clause is
+        never returned again.
+        """
+        self.lower[idx] = np.inf
+        self.upper[idx] = -np.inf
+
+    def contains(self, idx, x):
+        """Whether x lies inside the box of clause idx."""
+        return bool(
+            (self.lower[idx] <= x).all() and (x <= self.upper[idx]).all()
+        )
+
+    def query(self, x):
+        """Indices of all clauses whose box contains x, in increasing order."""
+        if self.nbBoxes == 0:
+            return np.zeros(0, dtype=int)
+        if self.lower.shape[1] == 0:
+            return np.arange(self.nbBoxes)
+
+        # Per dimension, clauses with lower <= x[d] are a prefix of
+        # lowerOrder and clauses with upper >= x[d] a suffix of upperOrder
+        nbLow = np.array(
+            [
+                np.searchsorted(self.lowerSorted[:, d], x[d], side="right")
+                for d in range(len(x))
+            ]
+        )
+        nbHigh = self.nbBoxes - np.array(
+            [
+                np.searchsorted(self.upperSorted[:, d], x[d], side="left")
+                for d in range(len(x))
+            ]
+        )
+
+        d = np.argmin(np.minimum(nbLow, nbHigh))
+        if nbLow[d] <= nbHigh[d]:
+            candidates = self.lowerOrder[: nbLow[d], d]
+        else:
+            candidates = self.upperOrder[self.nbBoxes - nbHigh[d] :, d]
+
+        inside = np.all(
+            (self.lower[candidates] <= x) & (x <= self.upper[candidates]),
+            axis=1,
+        )
+        return np.sort(candidates[inside])
+
+
+def _merge_sorted(order, sortedBounds, bounds, first):
+    """
+    Merge the bounds of boxes first, first + 1, ... into the per-dimension
+    order and sorted bounds of the existing boxes. New boxes go after
+    existing ones with equal bounds, as a stable sort of all would put them.
+    """
+    newOrder = np.argsort(bounds, axis=0, kind="stable")
+    newSorted = np.take_along_axis(bounds, newOrder, axis=0)
+    nbBoxes = order.shape[0] + bounds.shape[0]
+    mergedOrder = np.empty((nbBoxes, bounds.shape[1]), dtype=order.dtype)
+    mergedSorted = np.empty((nbBoxes, bounds.shape[1]))
+    for d in range(bounds.shape[1]):
+        at = np.searchsorted(sortedBounds[:, d], newSorted[:, d], side="right")
+        mergedOrder[:, d] = np.insert(order[:, d], at, first + newOrder[:, d])
+        mergedSorted[:, d] = np.insert(sortedBounds[:, d], at, newSorted[:, d])
+    return mergedOrder, mergedSorted
@@ -27,3 +27,52 @@ class WeightFunction:
             monomials.append([coef, new_powers])
 
         return WeightFunction(monomials, self.boolWeights)
+
+
+def random_weight_function(nbReals, nbBools, rng=None):
+    """
+    Random polynomial weight function of the kind used in the experiments:
+    1-4 monomials of degree at most 5 plus a constant term large enough to
+    keep the polynomial positive on [0, 10]^nbReals (the default
+    RealsUniverse): a monomial of degree d with coefficient c is at most
+    |c| * 10^d there, and the constant is 2 plus the sum of these bounds.
+    The Boolean weights are uniform. Without reals the polynomial is the
+    constant 1.
+
+    Args:
+        nbReals: number of real variables.
+        nbBools: number of Boolean variables.
+        rng: a np.random.RandomState (defaults to the global np.random).
+
+    Returns:
+        The WeightFunction.
+    """
+    rng = np.random if rng is None else rng
+    if nbReals == 0:
+        return WeightFunction([[1, []]], rng.uniform(0, 1, size=nbBools))
+    cntTerms = rng.choice([1, 2, 3, 4])
+    monomials = []
+
+    C = 2
+    for _ in range(cntTerms):
+        curr = [0] * nbReals
+
+        deg = min(rng.geometric(0.6), 5)
+
+        currC = 1
+        for _ in range(deg):
+            xi = rng.choice(nbReals)
+            curr[xi] += 1
+            currC *= 10
+
+        cnst = 1 + rng.choice(10)
+        currC *= cnst
+
+        C += currC
+        if deg >= 2:
+            cnst *= -1
+
+        monomials.append([-cnst, curr])
+
+    monomials.append([C, [0] * nbReals])
+    return WeightFunction(monomials, rng.uniform(0, 1, size=nbBools))